@@ -1,10 +1,15 @@
 import os
 import json
+import threading
 import numpy as np
 from datetime import datetime
 from shutil import copyfile
 from .message import MsgType, Datatuple
 
+ANALOG_MAP_BLOCK_DUR = 60  # Initial size of analog data temp files, as seconds of samples.
+NPY_HEADER_LEN = 128  # Bytes, length of .npy header written at the start of analog data temp files.
+CHUNK_INDEX_HEADER_LEN = 8  # Bytes, length of sampling rate (float64) at the start of chunk index temp files.
+
 # ----------------------------------------------------------------------------------------
 #  Data_logger
 # ----------------------------------------------------------------------------------------
@@ -24,9 +29,11 @@ def ms_to_readable_time(milliseconds):
 class Data_logger:
     """Class for logging data from a pyControl setup to disk"""
 
-    def __init__(self, board, print_func=None):
+    def __init__(self, board, print_func=None, save_time_npy=True):
         self.board = board
         self.print_func = print_func
+        self.save_time_npy = save_time_npy  # Save analog sample times as .time.npy as well as .timebase.npz.
+        self.file_lock = threading.Lock()  # Held while writing to files, which may be done by board's reader thread.
         self.reset()
 
     def reset(self):
@@ -35,6 +42,7 @@ class Data_logger:
         self.subject_ID = None
         self.analog_writers = {}
         self.pre_run_prints = []
+        self.analog_close_thread = None
 
     def open_data_file(self, data_dir, experiment_name, setup_ID, subject_ID, datetime_now=None):
         """Open file tsv/txt file for event data and write header information.
@@ -64,9 +72,10 @@ class Data_logger:
         self.write_info_line("start_time", datetime.utcnow().isoformat(timespec="milliseconds"))
         self.write_to_file(self.pre_run_prints)
         self.pre_run_prints = []
-        self.analog_writers = {
-            ID: Analog_writer(ai["name"], ai["fs"], ai["dtype"], self.file_path)
+        self.analog_writers = {  # Envelope streams are for plotting only and are not saved.
+            ID: Analog_writer(ai["name"], ai["fs"], ai["dtype"], self.file_path, ai.get("channels"), self.save_time_npy)
             for ID, ai in self.board.sm_info.analog_inputs.items()
+            if "envelope_of" not in ai
         }
 
     def write_info_line(self, subtype, content, time=0):
@@ -88,19 +97,45 @@ class Data_logger:
             copyfile(task_file_path, os.path.join(exp_tasks_dir, task_save_name))
 
     def close_files(self):
+        """Close the data file.  Analog data files are closed in a background thread so this
+        returns immediately, use wait_closed to wait until they are complete."""
+        with self.file_lock:
+            self._close_files()
+
+    def _close_files(self):
         if self.data_file:
             self.write_info_line("end_time", self.end_datetime.isoformat(timespec="milliseconds"), self.end_timestamp)
             self.data_file.close()
             self.data_file = None
-        for analog_writer in self.analog_writers.values():
-            analog_writer.close_files()
+        if self.analog_writers:
+            self.analog_close_thread = threading.Thread(
+                target=close_analog_writers, args=(list(self.analog_writers.values()),), name="Analog writer close"
+            )
+            self.analog_close_thread.start()
         self.analog_writers = {}
 
+    def wait_closed(self, timeout=None):
+        """Wait until analog data files closed in the background are complete, returns True if
+        they are complete, False if timeout (seconds) elapsed first."""
+        if self.analog_close_thread:
+            self.analog_close_thread.join(timeout)
+            return not self.analog_close_thread.is_alive()
+        return True
+
     def process_data(self, new_data):
         """If data_file is open new data is written to file.  If print_func is specified
         human readable data strings are passed to it."""
-        if self.data_file:
-            self.write_to_file(new_data)
+        self.write_data(new_data)
+        self.print_data(new_data)
+
+    def write_data(self, new_data):
+        """Write new data to file if data_file is open."""
+        with self.file_lock:
+            if self.data_file:
+                self.write_to_file(new_data)
+
+    def print_data(self, new_data):
+        """Pass human readable data strings to print_func if specified."""
         if self.print_func:
             self.print_func(self.data_to_string(new_data, prettify=True), end="")
 
@@ -112,7 +147,8 @@ class Data_logger:
         for nd in new_data:
             if nd.type == MsgType.ANLOG:
                 writer_id, data = nd.content
-                self.analog_writers[writer_id].save_analog_chunk(timestamp=nd.time, data_array=data)
+                if writer_id in self.analog_writers:
+                    self.analog_writers[writer_id].save_analog_chunk(timestamp=nd.time, data_array=data)
 
     def data_to_string(self, new_data, prettify=False, max_len=60):
         """Convert list of data tuples into a string.  If prettify is True the string is formatted
@@ -142,6 +178,8 @@ class Data_logger:
                 data_string += self.tsv_row_str("variable", time, nd.subtype, content=var_str)
             elif nd.type == MsgType.WARNG:  # Warning
                 data_string += self.tsv_row_str("warning", time, content=nd.content)
+            elif nd.type == MsgType.PROFL:  # Main loop profile report.
+                data_string += self.tsv_row_str("profile", time, content=nd.content)
             elif nd.type in (MsgType.ERROR, MsgType.STOPF):  # Error or stop framework.
                 self.end_datetime = datetime.utcnow()
                 self.end_timestamp = nd.time
@@ -184,46 +222,131 @@ class Data_logger:
 # ----------------------------------------------------------------------------------------
 
 
+def close_analog_writers(analog_writers):
+    """Close the files of each analog writer, run in a background thread by Data_logger."""
+    for analog_writer in analog_writers:
+        analog_writer.close_files()
+
+
+def npy_header(data_type, n_samples):
+    """Return a NPY_HEADER_LEN byte .npy format version 1.0 header for a 1D array of n_samples
+    samples of data_type, padded to a fixed length so it can be rewritten when n_samples changes."""
+    header = repr({"descr": np.dtype(data_type).str, "fortran_order": False, "shape": (n_samples,)})
+    header = header.ljust(NPY_HEADER_LEN - 11) + "\n"
+    return b"\x93NUMPY\x01\x00" + (NPY_HEADER_LEN - 10).to_bytes(2, "little") + header.encode("latin1")
+
+
+def save_sample_times(file_path, chunk_index, sampling_rate, n_samples):
+    """Save a .npy file with the time (seconds) of each of n_samples samples, from a chunk index
+    with a row (sample_offset, start_ms) for each chunk.  Chunks which start within 1ms of the end
+    of the previous chunk are treated as continuous with it.  Times are written a chunk at a time
+    to a memory mapped file, so memory use does not grow with n_samples.  Gives the same times as
+    tools/data_import.save_sample_times, which the tools use, and is kept here as the GUI does not
+    depend on data_import's dependencies."""
+    times = np.lib.format.open_memmap(file_path, mode="w+", dtype="float64", shape=(n_samples,))
+    chunk_ends = np.append(chunk_index[1:, 0], n_samples)
+    next_chunk_start_time = 0
+    for (sample_offset, start_ms), chunk_end in zip(chunk_index.tolist(), chunk_ends.tolist()):
+        if abs(next_chunk_start_time - start_ms / 1000) < 0.001:
+            chunk_start_time = next_chunk_start_time
+        else:
+            chunk_start_time = start_ms / 1000
+        chunk_length = chunk_end - sample_offset
+        times[sample_offset:chunk_end] = np.arange(chunk_length, dtype="float64") / sampling_rate + chunk_start_time
+        next_chunk_start_time = chunk_start_time + chunk_length / sampling_rate
+    times.flush()
+
+
 class Analog_writer:
-    """Class for writing data from one analog input to disk."""
+    """Class for writing data from one analog input to disk.  If channels is a list of channel
+    names the input is an analog group whose data is interleaved across channels, the data
+    is de-interleaved and each channel written to its own files, named as for an analog input
+    with the channel's name.  Samples are copied from each message straight into a memory
+    mapped temp file per channel, which is extended in blocks as it fills.  Rather than a
+    time for every sample, a chunk index temp file holds (sample_offset, start_ms, n_samples)
+    for each chunk, after the sampling rate.  Data temp files start with a .npy header, when the
+    files are closed the header is updated with the number of samples and the file renamed
+    .data.npy, so the data is not reloaded.  The timebase is saved as .timebase.npz, holding
+    the chunk_index with a row (sample_offset, start_ms) for each chunk, the sampling_rate and
+    n_samples.  If save_time_npy is True the time of each sample is also saved to .time.npy as
+    by earlier versions, once per input, named with the group name for an analog group as its
+    channels have the same sample times.  tools/data_import.timebase_to_time_npy creates the
+    .time.npy file from a .timebase.npz file for data saved with save_time_npy False."""
 
-    def __init__(self, name, sampling_rate, data_type, session_filepath):
+    def __init__(self, name, sampling_rate, data_type, session_filepath, channels=None, save_time_npy=True):
         self.name = name
         self.sampling_rate = sampling_rate
         self.data_type = data_type
+        self.channels = channels if channels else [name]
+        self.save_time_npy = save_time_npy
         self.open_data_files(session_filepath)
 
     def open_data_files(self, session_filepath):
         ses_path_stem, file_ext = os.path.splitext(session_filepath)
-        self.path_stem = ses_path_stem + f"_{self.name}"
-        self.t_tempfile_path = self.path_stem + ".time.temp"
-        self.d_tempfile_path = self.path_stem + f".data-1{self.data_type}.temp"
-        self.time_tempfile = open(self.t_tempfile_path, "wb")
-        self.data_tempfile = open(self.d_tempfile_path, "wb")
-        self.next_chunk_start_time = 0
+        self.path_stems = [ses_path_stem + f"_{channel}" for channel in self.channels]
+        self.times_path = ses_path_stem + f"_{self.name}.time.npy"
+        self.c_tempfile_paths = [path_stem + ".chunks.temp" for path_stem in self.path_stems]
+        self.d_tempfile_paths = [path_stem + f".data-1{self.data_type}.temp" for path_stem in self.path_stems]
+        self.chunk_tempfiles = [open(path, "wb") for path in self.c_tempfile_paths]
+        self.data_tempfiles = [open(path, "w+b") for path in self.d_tempfile_paths]
+        for chunk_tempfile in self.chunk_tempfiles:
+            chunk_tempfile.write(np.array(self.sampling_rate, dtype="<f8").tobytes())
+        for data_tempfile in self.data_tempfiles:
+            data_tempfile.write(npy_header(self.data_type, 0))
+        self.n_samples = 0  # Samples written per channel.
+        self.map_data_files(int(ANALOG_MAP_BLOCK_DUR * self.sampling_rate))
+
+    def map_data_files(self, capacity):
+        """Extend the data temp files to hold capacity samples and memory map them."""
+        self.data_maps = []  # Existing maps must be released before files are resized.
+        self.data_arrays = []
+        for data_tempfile in self.data_tempfiles:
+            data_tempfile.truncate(NPY_HEADER_LEN + capacity * np.dtype(self.data_type).itemsize)
+        self.data_maps = [
+            np.memmap(f, dtype=self.data_type, mode="r+", offset=NPY_HEADER_LEN, shape=(capacity,))
+            for f in self.data_tempfiles
+        ]
+        self.data_arrays = [data_map.view(np.ndarray) for data_map in self.data_maps]  # Faster to index than memmap.
+        self.capacity = capacity
 
     def close_files(self):
-        """Close data files. Convert temp files to numpy."""
-        self.time_tempfile.close()
-        self.data_tempfile.close()
-        with open(self.t_tempfile_path, "rb") as f:
-            times = np.frombuffer(f.read(), dtype="float64")
-            np.save(self.path_stem + ".time.npy", times)
-        with open(self.d_tempfile_path, "rb") as f:
-            data = np.frombuffer(f.read(), dtype=self.data_type)
-            np.save(self.path_stem + ".data.npy", data)
-        os.remove(self.t_tempfile_path)
-        os.remove(self.d_tempfile_path)
+        """Close data files, set the number of samples in the data files' headers and trim them
+        to length, then rename them .data.npy.  Save timebase and sample times from chunk index."""
+        self.data_maps = []  # Release maps so files can be resized, data is written to disk by the OS.
+        self.data_arrays = []
+        for chunk_tempfile in self.chunk_tempfiles:
+            chunk_tempfile.close()
+        chunk_index = np.fromfile(self.c_tempfile_paths[0], dtype="<i8", offset=CHUNK_INDEX_HEADER_LEN)
+        chunk_index = chunk_index.reshape(-1, 3)[:, :2]
+        for path_stem, d_tempfile_path, data_tempfile in zip(
+            self.path_stems, self.d_tempfile_paths, self.data_tempfiles
+        ):
+            data_tempfile.seek(0)
+            data_tempfile.write(npy_header(self.data_type, self.n_samples))
+            data_tempfile.truncate(NPY_HEADER_LEN + self.n_samples * np.dtype(self.data_type).itemsize)
+            data_tempfile.close()
+            os.replace(d_tempfile_path, path_stem + ".data.npy")
+            np.savez(
+                path_stem + ".timebase.npz",
+                chunk_index=chunk_index,
+                sampling_rate=self.sampling_rate,
+                n_samples=self.n_samples,
+            )
+        if self.save_time_npy:
+            save_sample_times(self.times_path, chunk_index, self.sampling_rate, self.n_samples)
+        for path in self.c_tempfile_paths:
+            os.remove(path)
 
     def save_analog_chunk(self, timestamp, data_array):
-        """Save a chunk of analog data to .pca data file."""
-        if np.abs(self.next_chunk_start_time - timestamp / 1000) < 0.001:
-            chunk_start_time = self.next_chunk_start_time
-        else:
-            chunk_start_time = timestamp / 1000
-        times = (np.arange(len(data_array), dtype="float64") / self.sampling_rate) + chunk_start_time  # Seconds
-        self.time_tempfile.write(times.tobytes())
-        self.data_tempfile.write(data_array.tobytes())
-        self.time_tempfile.flush()
-        self.data_tempfile.flush()
-        self.next_chunk_start_time = chunk_start_time + len(data_array) / self.sampling_rate
+        """Save a chunk of analog data to the memory mapped data files and chunk index."""
+        n_samples = len(data_array) // len(self.channels)  # Samples per channel.
+        if self.n_samples + n_samples > self.capacity:
+            self.map_data_files(max(2 * self.capacity, self.n_samples + n_samples))
+        channel_data = np.frombuffer(data_array, dtype=self.data_type).reshape(n_samples, len(self.channels))
+        for i, channel_array in enumerate(self.data_arrays):
+            channel_array[self.n_samples : self.n_samples + n_samples] = channel_data[:, i]
+        chunk_bytes = np.array([self.n_samples, timestamp, n_samples], dtype="<i8").tobytes()
+        for chunk_tempfile in self.chunk_tempfiles:
+            chunk_tempfile.write(chunk_bytes)
+            chunk_tempfile.flush()
+        self.n_samples += n_samples
@@ -16,40 +16,44 @@ class MsgType(Enum):
     ERROR = b"!!"  # Error
     STOPF = b"X"  # Stop framework
     ANLOG = b"A"  # Analog
+    PROFL = b"R"  # Profile report
+    MONIT = b"M"  # Main loop monitor
 
     @classmethod
     def from_byte(cls, byte_value):
         """Get member given value byte"""
-        for member in cls:
-            if member.value == byte_value:
-                return member
-        return byte_value
+        return _byte2msg_type.get(byte_value, byte_value)
 
     def get_subtype(self, subtype_char):
         """Get subtype name from character"""
         if subtype_char == "_":
             return None
         else:
-            return {
-                MsgType.VARBL: {
-                    "g": "get",
-                    "s": "user_set",
-                    "a": "api_set",
-                    "p": "print",
-                    "t": "run_start",
-                    "e": "run_end",
-                },
-                MsgType.EVENT: {
-                    "i": "input",
-                    "t": "timer",
-                    "p": "publish",
-                    "u": "user",
-                    "a": "api",
-                    "s": "sync",
-                },
-                MsgType.PRINT: {
-                    "t": "task",
-                    "a": "api",
-                    "u": "user",
-                },
-            }[self][subtype_char]
+            return _subtype_names[self][subtype_char]
+
+
+_byte2msg_type = {member.value: member for member in MsgType}  # {value_byte: MsgType}
+
+_subtype_names = {  # {MsgType: {subtype_char: subtype_name}}
+    MsgType.VARBL: {
+        "g": "get",
+        "s": "user_set",
+        "a": "api_set",
+        "p": "print",
+        "t": "run_start",
+        "e": "run_end",
+    },
+    MsgType.EVENT: {
+        "i": "input",
+        "t": "timer",
+        "p": "publish",
+        "u": "user",
+        "a": "api",
+        "s": "sync",
+    },
+    MsgType.PRINT: {
+        "t": "task",
+        "a": "api",
+        "u": "user",
+    },
+}
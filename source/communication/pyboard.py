@@ -36,34 +36,63 @@ class PyboardError(BaseException):
 class Pyboard:
     def __init__(self, serial_device, baudrate=115200):
         self.serial = serial.Serial(serial_device, baudrate=baudrate, interCharTimeout=1)
+        self.read_buffer = bytearray()  # Bytes received after the ending of the last read_until.
+        self.use_raw_paste = True  # Try to use raw-paste mode (micropython >= 1.14) to send commands.
 
     def close(self):
         self.serial.close()
 
+    def read(self, size=1):
+        """Read size bytes, bytes left over from read_until are returned first."""
+        if not self.read_buffer:
+            return self.serial.read(size)
+        data = bytes(self.read_buffer[:size])
+        del self.read_buffer[:size]
+        if len(data) < size:
+            data += self.serial.read(size - len(data))
+        return data
+
+    def reset_input_buffer(self):
+        self.read_buffer.clear()
+        self.serial.reset_input_buffer()
+
     def read_until(self, min_num_bytes, ending, timeout=10, data_consumer=None):
-        data = self.serial.read(min_num_bytes)
-        if data_consumer:
-            data_consumer(data)
-        timeout_count = 0
-        while True:
-            if data.endswith(ending):
-                break
-            elif self.serial.in_waiting > 0:
-                new_data = self.serial.read(1)
-                data = data + new_data
-                if data_consumer:
-                    data_consumer(new_data)
-                timeout_count = 0
-            else:
-                timeout_count += 1
-                if timeout is not None and timeout_count >= 10 * timeout:
+        """Read until at least min_num_bytes have been read and the data ends with ending,
+        or no bytes are received for timeout seconds.  Blocks on the serial port until
+        bytes arrive then reads all available bytes, scanning only new bytes for ending.
+        Bytes received after ending are kept in read_buffer for the next read."""
+        data = self.read_buffer
+        self.read_buffer = bytearray()
+        if len(data) < min_num_bytes:
+            data += self.serial.read(min_num_bytes - len(data))
+        n_consumed = 0  # Bytes passed to data_consumer.
+        scan_start = max(0, min_num_bytes - len(ending))  # Position from which to look for ending.
+        serial_timeout = self.serial.timeout
+        self.serial.timeout = timeout
+        try:
+            while True:
+                i = data.find(ending, scan_start)
+                if i != -1:
+                    self.read_buffer[:0] = data[i + len(ending) :]
+                    del data[i + len(ending) :]
+                scan_start = max(scan_start, len(data) - len(ending) + 1)
+                if data_consumer and len(data) > n_consumed:
+                    data_consumer(bytes(data[n_consumed:]))
+                    n_consumed = len(data)
+                if i != -1:
                     break
-                time.sleep(0.1)
-        return data
+                new_data = self.serial.read(max(1, self.serial.in_waiting))
+                if not new_data:  # Timeout.
+                    break
+                data += new_data
+        finally:
+            self.serial.timeout = serial_timeout
+        return bytes(data)
 
     def enter_raw_repl(self):
         self.serial.write(b"\r\x03\x03")  # ctrl-C twice: interrupt any running program
         # flush input (without relying on serial.flushInput())
+        self.read_buffer.clear()
         n = self.serial.in_waiting
         while n > 0:
             self.serial.read(n)
@@ -98,20 +127,70 @@ class Pyboard:
         # return normal and error output
         return data, data_err
 
+    def raw_paste_write(self, command_bytes):
+        # Read initial header, with window size.
+        data = self.read(2)
+        window_size = int.from_bytes(data, "little")
+        window_remain = window_size
+
+        # Write out the command_bytes data.
+        i = 0
+        while i < len(command_bytes):
+            while window_remain == 0 or self.serial.in_waiting:
+                data = self.read(1)
+                if data == b"\x01":
+                    # Device indicated that a new window of data can be sent.
+                    window_remain += window_size
+                elif data == b"\x04":
+                    # Device indicated abrupt end.  Acknowledge it and finish.
+                    self.serial.write(b"\x04")
+                    return
+                else:
+                    # Unexpected data from device.
+                    raise PyboardError("unexpected read during raw paste: {}".format(data))
+            # Send out as much data as possible that fits within the allowed window.
+            b = command_bytes[i : min(i + window_remain, len(command_bytes))]
+            self.serial.write(b)
+            window_remain -= len(b)
+            i += len(b)
+
+        # Indicate end of data.
+        self.serial.write(b"\x04")
+
+        # Wait for device to acknowledge end of data.
+        data = self.read_until(1, b"\x04")
+        if not data.endswith(b"\x04"):
+            raise PyboardError("could not complete raw paste: {}".format(data))
+
     def exec_raw_no_follow(self, command):
         if isinstance(command, bytes):
             command_bytes = command
         else:
             command_bytes = bytes(command, encoding="utf8")
 
-        # write command
+        # Try to enter raw-paste mode, which uses flow control so the command can be sent without delays.
+        if self.use_raw_paste:
+            self.serial.write(b"\x05A\x01")
+            data = self.read(2)
+            if data == b"R\x01":
+                # Device supports raw-paste mode, write out the command using this mode.
+                return self.raw_paste_write(command_bytes)
+            elif data != b"R\x00":
+                # Device doesn't understand raw-paste, wait for it to return to raw REPL.
+                data = self.read_until(1, b"w REPL; CTRL-B to exit\r\n>")
+                if not data.endswith(b"w REPL; CTRL-B to exit\r\n>"):
+                    raise PyboardError("could not enter raw repl")
+            # Don't try to use raw-paste mode again for this connection.
+            self.use_raw_paste = False
+
+        # write command, 256 bytes every 10ms.
         for i in range(0, len(command_bytes), 256):
             self.serial.write(command_bytes[i : min(i + 256, len(command_bytes))])
             time.sleep(0.01)
         self.serial.write(b"\x04")
 
         # check if we could exec command
-        data = self.serial.read(2)
+        data = self.read(2)
         if data != b"OK":
             raise PyboardError("could not exec command")
 
@@ -2,20 +2,74 @@ import os
 import re
 import time
 import json
+import zlib
 import inspect
+import threading
+import numpy as np
+from collections import deque
 from serial import SerialException
-from array import array
 from .pyboard import Pyboard, PyboardError
 from .data_logger import Data_logger
 from .message import MsgType, Datatuple
 from source.gui.settings import VERSION, user_folder
 from dataclasses import dataclass
 
+TRANSFER_ERROR_MESSAGE = (
+    "\n\nError: Unable to transfer file. See the troubleshooting docs:\n"
+    "https://pycontrol.readthedocs.io/en/latest/user-guide/troubleshooting/"
+)
+BINARY_IDS_VERSION = (2, 1, 0)  # First framework version that can send event and state IDs as binary integers.
+VIPER_CHECKSUMS_VERSION = (2, 1, 0)  # First framework version that can compute analog checksums with viper.
+READER_QUEUE_LEN = 64  # Max number of batches of parsed data held between reader thread and GUI thread.
+READER_STOP_TIMEOUT = 0.2  # Max seconds GUI thread waits for reader thread to stop when run is stopped by user.
+TRANSFER_WINDOW = 8  # Max number of file transfer blocks sent but not yet acknowledged by board.
+MAX_TRANSFER_BLOCK_SIZE = 4096  # Bytes.
+MANIFEST_CACHE_PATH = os.path.join("config", "file_manifests.json")  # Board file manifests saved between sessions.
+MANIFEST_CACHE_BOARDS = 64  # Max number of boards whose file manifests are cached, least recently saved are evicted.
+# Analog messages with at least this many samples are checksummed with numpy, below this sum() is as fast,
+# which includes all messages with the default 256 byte maximum chunk size (see checksum_benchmark.py).
+NUMPY_CHECKSUM_MIN_SAMPLES = 384
+
 # ----------------------------------------------------------------------------------------
 #  Helper functions.
 # ----------------------------------------------------------------------------------------
 
 
+def _version_tuple(version_str):
+    """Convert version string e.g. '2.1.0' to tuple of ints, returns (0,) if string is not a valid version."""
+    try:
+        return tuple(int(x) for x in version_str.split("."))
+    except ValueError:
+        return (0,)
+
+
+def _load_manifest_cache():
+    """Load board file manifests {unique_ID_hex: {file_path: (size, mtime, hash)}} saved at
+    MANIFEST_CACHE_PATH, returns an empty dict if there is no valid saved cache."""
+    try:
+        with open(MANIFEST_CACHE_PATH, "r", encoding="utf-8") as f:
+            saved_cache = json.load(f)
+        return {
+            board_ID: {file_path: tuple(file_info) for file_path, file_info in manifest.items()}
+            for board_ID, manifest in saved_cache.items()
+        }
+    except (OSError, ValueError, AttributeError, TypeError):
+        return {}
+
+
+def _save_manifest_cache(manifest_cache):
+    """Save board file manifests to MANIFEST_CACHE_PATH, writing to a temporary file which then
+    replaces the saved cache so an interrupted save cannot leave a partial file."""
+    try:
+        os.makedirs(os.path.dirname(MANIFEST_CACHE_PATH), exist_ok=True)
+        temp_path = MANIFEST_CACHE_PATH + ".temp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest_cache, f)
+        os.replace(temp_path, MANIFEST_CACHE_PATH)
+    except OSError:
+        pass  # Cache is only an optimisation, manifests are rebuilt from the board if not saved.
+
+
 # djb2 hashing algorithm used to check integrity of transfered files.
 def _djb2_file(file_path):
     with open(file_path, "rb") as f:
@@ -28,6 +82,22 @@ def _djb2_file(file_path):
     return h
 
 
+# Used on pyboard to get manifest {file_path: (file_size, file_mtime, file_hash)} of all files in
+# a folder and its subfolders, the root folder if folder_path is empty.  Only files in hash_files
+# are hashed, file_hash is None for other files.
+def _file_manifest(folder_path="", hash_files=()):
+    manifest = {}
+    for file_name in os.listdir(folder_path) if folder_path else os.listdir():
+        file_path = folder_path + "/" + file_name if folder_path else file_name
+        file_stat = os.stat(file_path)
+        if file_stat[0] & 0x4000:  # Directory.
+            manifest.update(_file_manifest(file_path, hash_files))
+        else:
+            file_hash = _djb2_file(file_path) if file_path in hash_files else None
+            manifest[file_path] = (file_stat[6], file_stat[8], file_hash)
+    return manifest
+
+
 # Used on pyboard for file transfer.
 def _receive_file(file_path, file_size):
     usb = pyb.USB_VCP()
@@ -53,6 +123,79 @@ def _receive_file(file_path, file_size):
             usb.write(b"ER")
 
 
+# Used on pyboard for windowed file transfer.  The file is sent as blocks of up to block_size
+# bytes, each framed as: block index (2 bytes), block length (2 bytes), data, CRC32 of the
+# preceding bytes (4 bytes).  The board responds to each frame with a status byte and the
+# block index (2 bytes), status is A: block OK, R: bad CRC resend block, T: timeout or lost
+# sync resend all unacknowledged blocks, N: out of space, E: error.  Blocks can arrive in any
+# order and are written at their offset in the file.  If any R or T was sent, once all blocks
+# are received the board discards further input until the host stops sending, then sends D.
+def _receive_file_windowed(file_path, file_size, block_size):
+    usb = pyb.USB_VCP()
+    usb.setinterrupt(-1)
+    buf = bytearray(block_size + 8)
+    buf_mv = memoryview(buf)
+    n_blocks = (file_size + block_size - 1) // block_size
+    block_ok = bytearray(n_blocks)  # 1 if block written to file.
+    n_ok = 0
+    n_timeouts = 0
+    resent = False  # True if host was asked to resend any blocks.
+
+    def recv_into(mv):
+        i = 0
+        while i < len(mv):
+            n = usb.recv(mv[i:], timeout=500)
+            if not n:
+                return False
+            i += n
+        return True
+
+    def drain():  # Discard input until host stops sending.
+        while usb.recv(buf, timeout=50):
+            pass
+
+    try:
+        with open(file_path, "wb") as f:
+            while n_ok < n_blocks:
+                if not recv_into(buf_mv[:4]):
+                    n_timeouts += 1
+                    if n_timeouts > 5:
+                        raise OSError
+                    drain()
+                    usb.write(b"T\xff\xff")
+                    resent = True
+                    continue
+                n_timeouts = 0
+                length = buf[2] | (buf[3] << 8)
+                if length > block_size or not recv_into(buf_mv[4 : 8 + length]):
+                    drain()
+                    usb.write(b"T\xff\xff")
+                    resent = True
+                    continue
+                index = buf[0] | (buf[1] << 8)
+                if binascii.crc32(buf_mv[: 4 + length]) != int.from_bytes(buf[4 + length : 8 + length], "little"):
+                    usb.write(b"R" + buf[:2])
+                    resent = True
+                    continue
+                if not block_ok[index]:
+                    f.seek(index * block_size)
+                    f.write(buf_mv[4 : 4 + length])
+                    block_ok[index] = 1
+                    n_ok += 1
+                usb.write(b"A" + buf[:2])
+        if resent:  # Host may have resent blocks that were already received.
+            drain()
+            usb.write(b"D\xff\xff")
+    except:
+        drain()
+        fs_stat = os.statvfs("/flash")
+        fs_free_space = fs_stat[0] * fs_stat[3]
+        if fs_free_space < (n_blocks - n_ok) * block_size:
+            usb.write(b"N\xff\xff")  # Out of space.
+        else:
+            usb.write(b"E\xff\xff")
+
+
 @dataclass
 class State_machine_info:
     name: str
@@ -77,21 +220,33 @@ class Pycboard(Pyboard):
     """
 
     device_class2file = {}  # Dict mapping device classes to file where they are defined {class_name: device_file}
+    manifest_cache = None  # File manifests of boards seen {unique_ID: {file_path: (size, mtime, hash)}}
+    manifest_cache_lock = threading.Lock()
 
-    def __init__(self, serial_port, baudrate=115200, verbose=True, print_func=print, data_consumers=None):
+    def __init__(
+        self,
+        serial_port,
+        baudrate=115200,
+        verbose=True,
+        print_func=print,
+        data_consumers=None,
+        reader_thread=False,
+        save_time_npy=True,
+    ):
         self.serial_port = serial_port
         self.print = print_func  # Function used for print statements.
-        self.data_logger = Data_logger(board=self, print_func=print_func)
+        self.data_logger = Data_logger(board=self, print_func=print_func, save_time_npy=save_time_npy)
         self.data_consumers = data_consumers
+        self.use_reader_thread = reader_thread  # Read serial data in background thread while framework running.
+        self.reader = None
         self.status = {"serial": None, "framework": None, "usb_mode": None}
-        self.device_files_on_pyboard = {}  # Dict {file_name:file_hash} of files in devices folder on pyboard.
+        self.file_manifest = {}  # {file_path: (size, mtime, hash)} of files on pyboard, hash None if unknown.
         if not Pycboard.device_class2file:  # Scan devices folder to find files where device classes are defined.
             self.make_device_class2file_map()
         try:
             super().__init__(self.serial_port, baudrate=baudrate)
             self.status["serial"] = True
             self.reset()
-            self.unique_ID = eval(self.eval("pyb.unique_id()").decode())
             v_tuple = eval(
                 self.eval("sys.implementation.version if hasattr(sys, 'implementation') else (0,0,0)").decode()
             )
@@ -123,16 +278,22 @@ class Pycboard(Pyboard):
         """Enter raw repl (soft reboots pyboard), import modules."""
         self.enter_raw_repl()  # Soft resets pyboard.
         self.exec(inspect.getsource(_djb2_file))  # define djb2 hashing function.
+        self.exec(inspect.getsource(_file_manifest))  # define file manifest function.
         self.exec(inspect.getsource(_receive_file))  # define receive file function.
+        self.exec(inspect.getsource(_receive_file_windowed))  # define windowed receive file function.
         self.exec("import os; import gc; import sys; import pyb")
+        self.unique_ID = eval(self.eval("pyb.unique_id()").decode())
+        self.update_file_manifest()
+        self.transfer_block_size = self.get_transfer_block_size()
         self.framework_running = False
+        self.binary_IDs = False
+        self.rx_buffer = bytearray()  # Received bytes not yet processed.
         error_message = None
         self.status["usb_mode"] = self.eval("pyb.usb_mode()").decode()
         self.data_logger.reset()
         try:
             self.exec("from pyControl import *; import devices")
             self.status["framework"] = True  # Framework imported OK.
-            self.device_files_on_pyboard = self.get_folder_contents("devices", get_hash=True)
         except PyboardError as e:
             error_message = e.args[2].decode()
             if ("ImportError: no module named 'pyControl'" in error_message) or (
@@ -147,6 +308,12 @@ class Pycboard(Pyboard):
             self.framework_version = "<1.8"
         return error_message
 
+    def close(self):
+        """Save file manifest to the manifest cache and close serial connection."""
+        if self.file_manifest:
+            self.save_file_manifest()
+        super().close()
+
     def hard_reset(self, reconnect=True):
         self.print("\nResetting pyboard.")
         try:
@@ -200,6 +367,7 @@ class Pycboard(Pyboard):
     def write_file(self, target_path, data):
         """Write data to file at specified path on pyboard, any data already
         in the file will be deleted."""
+        self.file_manifest.pop(target_path, None)
         try:
             self.exec("with open('{}','w') as f: f.write({})".format(target_path, repr(data)))
         except PyboardError as e:
@@ -213,41 +381,188 @@ class Pycboard(Pyboard):
             return -1
         return file_hash
 
+    def get_file_info(self, target_path):
+        """Get the modification time and djb2 hash of a file on the pyboard using a single
+        call to the board, returns (None, -1) if the file does not exist."""
+        try:
+            return eval(self.eval("(os.stat('{0}')[8],_djb2_file('{0}'))".format(target_path)).decode())
+        except PyboardError:  # File does not exist.
+            return None, -1
+
+    def update_file_manifest(self, hash_files=()):
+        """Update the manifest of files on the pyboard using a single call to the board, files
+        in hash_files are hashed on the board.  The manifest is cached for each board by
+        unique_ID and saved to MANIFEST_CACHE_PATH, so it is kept between sessions.  Hashes of
+        files whose size and modification time are unchanged are taken from the cached manifest."""
+        board_manifest = eval(self.eval("_file_manifest('',{})".format(repr(tuple(hash_files)))).decode())
+        with Pycboard.manifest_cache_lock:
+            if Pycboard.manifest_cache is None:
+                Pycboard.manifest_cache = _load_manifest_cache()
+            cached_manifest = Pycboard.manifest_cache.get(self.unique_ID.hex(), {})
+        self.file_manifest = {}
+        for file_path, (file_size, file_mtime, file_hash) in board_manifest.items():
+            cached_size, cached_mtime, cached_hash = cached_manifest.get(file_path, (None, None, None))
+            if file_hash is None and (file_size, file_mtime) == (cached_size, cached_mtime):
+                file_hash = cached_hash
+            self.file_manifest[file_path] = (file_size, file_mtime, file_hash)
+        self.save_file_manifest()
+
+    def save_file_manifest(self):
+        """Store the file manifest in the manifest cache and save the cache to disk.  The cache
+        is ordered by when each board's manifest was saved, the manifests of the least recently
+        saved boards are evicted to keep at most MANIFEST_CACHE_BOARDS."""
+        with Pycboard.manifest_cache_lock:
+            if Pycboard.manifest_cache is None:
+                Pycboard.manifest_cache = _load_manifest_cache()
+            Pycboard.manifest_cache.pop(self.unique_ID.hex(), None)  # Move board to end of cache.
+            Pycboard.manifest_cache[self.unique_ID.hex()] = dict(self.file_manifest)
+            while len(Pycboard.manifest_cache) > MANIFEST_CACHE_BOARDS:
+                del Pycboard.manifest_cache[next(iter(Pycboard.manifest_cache))]
+            _save_manifest_cache(Pycboard.manifest_cache)
+
+    def get_unknown_hashes(self, file_paths):
+        """Hash files in file_paths whose size on the pyboard matches that on the computer
+        but whose hash on the pyboard is unknown, using a single call to the board.
+        file_paths is a dict {target_path: file_path}."""
+        hash_files = [
+            target_path
+            for target_path, file_path in file_paths.items()
+            if target_path in self.file_manifest
+            and self.file_manifest[target_path][0] == os.path.getsize(file_path)
+            and self.file_manifest[target_path][2] is None
+        ]
+        if hash_files:
+            self.update_file_manifest(hash_files)
+
+    def get_folder_manifest(self, folder_path):
+        """Return dict {file_name: (file_size, file_mtime, file_hash)} of files in a folder on the pyboard
+        from the file manifest, excluding files in subfolders."""
+        prefix = folder_path + "/"
+        return {
+            file_path[len(prefix) :]: file_info
+            for file_path, file_info in self.file_manifest.items()
+            if file_path.startswith(prefix) and "/" not in file_path[len(prefix) :]
+        }
+
+    def get_transfer_block_size(self):
+        """Return the block size for windowed file transfer, chosen given the board's free
+        memory, or None if the board cannot compute CRCs, in which case files are transferred
+        using stop-and-wait transfer of 512 byte chunks."""
+        try:
+            self.exec("import binascii")
+            if self.eval("hasattr(binascii, 'crc32')") != b"True":
+                return None
+            mem_free = int(self.eval("gc.mem_free()").decode())
+        except (PyboardError, ValueError):
+            return None
+        block_size = MAX_TRANSFER_BLOCK_SIZE
+        while block_size > 512 and 16 * block_size > mem_free:
+            block_size //= 2
+        return block_size
+
     def transfer_file(self, file_path, target_path=None):
         """Copy file at file_path to location target_path on pyboard."""
         if not target_path:
             target_path = os.path.split(file_path)[-1]
         file_size = os.path.getsize(file_path)
         file_hash = _djb2_file(file_path)
-        error_message = (
-            "\n\nError: Unable to transfer file. See the troubleshooting docs:\n"
-            "https://pycontrol.readthedocs.io/en/latest/user-guide/troubleshooting/"
-        )
+        board_size, board_mtime, board_hash = self.file_manifest.pop(target_path, (None, None, None))
+        if board_size == file_size and board_hash is None:
+            board_mtime, board_hash = self.get_file_info(target_path)
         # Try to load file, return once file hash on board matches that on computer.
         for i in range(10):
-            if file_hash == self.get_file_hash(target_path):
+            if file_hash == board_hash:
+                self.file_manifest[target_path] = (file_size, board_mtime, file_hash)
                 return
-            self.exec_raw_no_follow("_receive_file('{}',{})".format(target_path, file_size))
-            with open(file_path, "rb") as f:
-                while True:
-                    chunk = f.read(512)
-                    if not chunk:
-                        break
-                    self.serial.write(chunk)
-                    response_bytes = self.serial.read(2)
-                    if response_bytes != b"OK":
-                        if response_bytes == b"NS":
-                            self.print("\n\nInsufficient space on pyboard filesystem to transfer file.")
-                        else:
-                            self.print(error_message)
-                        time.sleep(0.01)
-                        self.serial.reset_input_buffer()
-                        raise PyboardError
-                self.follow(3)
+            if self.transfer_block_size:
+                if not self._send_file_windowed(file_path, target_path, file_size):
+                    self.transfer_block_size = None  # Fall back to stop-and-wait transfer.
+            else:
+                self._send_file_stop_and_wait(file_path, target_path, file_size)
+            board_mtime, board_hash = self.get_file_info(target_path)
         # Unable to transfer file.
-        self.print(error_message)
+        self.print(TRANSFER_ERROR_MESSAGE)
         raise PyboardError
 
+    def _send_file_stop_and_wait(self, file_path, target_path, file_size):
+        """Send file in 512 byte chunks, waiting for board to acknowledge each chunk."""
+        self.exec_raw_no_follow("_receive_file('{}',{})".format(target_path, file_size))
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(512)
+                if not chunk:
+                    break
+                self.serial.write(chunk)
+                response_bytes = self.read(2)
+                if response_bytes != b"OK":
+                    if response_bytes == b"NS":
+                        self.print("\n\nInsufficient space on pyboard filesystem to transfer file.")
+                    else:
+                        self.print(TRANSFER_ERROR_MESSAGE)
+                    time.sleep(0.01)
+                    self.reset_input_buffer()
+                    raise PyboardError
+            self.follow(3)
+
+    def _send_file_windowed(self, file_path, target_path, file_size):
+        """Send file in CRC checked blocks with up to TRANSFER_WINDOW blocks awaiting
+        acknowledgement, resending only blocks the board reports as corrupted or missing.
+        Returns False if the transfer failed."""
+        block_size = self.transfer_block_size
+        with open(file_path, "rb") as f:
+            file_data = f.read()
+        n_blocks = (len(file_data) + block_size - 1) // block_size
+        to_send = deque(range(n_blocks))  # Indices of blocks to send.
+        in_flight = set()  # Indices of blocks sent but not acknowledged.
+        acknowledged = set()  # Indices of blocks received OK by board.
+        resent = False  # True if board asked for any blocks to be resent.
+        max_sends = 2 * n_blocks + 10
+        n_sends = 0
+        self.exec_raw_no_follow("_receive_file_windowed('{}',{},{})".format(target_path, file_size, block_size))
+        serial_timeout = self.serial.timeout
+        self.serial.timeout = 5
+        try:
+            while len(acknowledged) < n_blocks or resent:
+                while to_send and len(in_flight) < TRANSFER_WINDOW and n_sends < max_sends:
+                    i = to_send.popleft()
+                    if i in acknowledged:
+                        continue
+                    block = file_data[i * block_size : (i + 1) * block_size]
+                    frame = i.to_bytes(2, "little") + len(block).to_bytes(2, "little") + block
+                    self.serial.write(frame + zlib.crc32(frame).to_bytes(4, "little"))
+                    in_flight.add(i)
+                    n_sends += 1
+                response = self.read(3)
+                status, i = response[:1], int.from_bytes(response[1:], "little")
+                if status == b"A":  # Block received OK.
+                    in_flight.discard(i)
+                    acknowledged.add(i)
+                    if len(acknowledged) == n_blocks:
+                        to_send.clear()  # Wait for board to finish without sending more.
+                elif status == b"R":  # Frame corrupted, index may also be corrupted.
+                    resent = True
+                    if i in in_flight:
+                        in_flight.discard(i)
+                        to_send.append(i)
+                elif status == b"T":  # Board timed out waiting for data.
+                    resent = True
+                    to_send.extend(sorted(in_flight))
+                    in_flight.clear()
+                elif status == b"D":  # Board finished after resends.
+                    break
+                elif status == b"N":
+                    self.read_until(2, b"\x04>", timeout=5)
+                    self.print("\n\nInsufficient space on pyboard filesystem to transfer file.")
+                    raise PyboardError
+                else:  # Error or no response.
+                    self.read_until(2, b"\x04>", timeout=5)
+                    self.reset_input_buffer()
+                    return False
+        finally:
+            self.serial.timeout = serial_timeout
+        self.follow(3)
+        return True
+
     def transfer_folder(
         self, folder_path, target_folder=None, file_type="all", files="all", remove_files=True, show_progress=False
     ):
@@ -261,16 +576,19 @@ class Pycboard(Pyboard):
             files = os.listdir(folder_path)
             if file_type != "all":
                 files = [f for f in files if f.split(".")[-1] == file_type]
-        try:
-            self.exec("os.mkdir({})".format(repr(target_folder)))
-        except PyboardError:
-            # Folder already exists.
-            if remove_files:  # Remove any files not in sending folder.
+        target_files = list(self.get_folder_manifest(target_folder))
+        if not target_files:
+            try:
+                self.exec("os.mkdir({})".format(repr(target_folder)))
+            except PyboardError:
+                # Folder already exists.
                 target_files = self.get_folder_contents(target_folder)
-                remove_files = list(set(target_files) - set(files))
-                for f in remove_files:
-                    target_path = target_folder + "/" + f
-                    self.remove_file(target_path)
+        if remove_files:  # Remove any files not in sending folder.
+            remove_files = list(set(target_files) - set(files))
+            for f in remove_files:
+                target_path = target_folder + "/" + f
+                self.remove_file(target_path)
+        self.get_unknown_hashes({target_folder + "/" + f: os.path.join(folder_path, f) for f in files})
         for f in files:
             file_path = os.path.join(folder_path, f)
             target_path = target_folder + "/" + f
@@ -280,6 +598,7 @@ class Pycboard(Pyboard):
 
     def remove_file(self, file_path):
         """Remove a file from the pyboard."""
+        self.file_manifest.pop(file_path, None)
         try:
             self.exec("os.remove({})".format(repr(file_path)))
         except PyboardError:
@@ -336,14 +655,13 @@ class Pycboard(Pyboard):
         Driver file that are already on the pyboard are only transferred if they have changed
         on the computer."""
         used_device_files = self._get_used_device_files(ref_file_path)
+        device_paths = {"devices/" + f: os.path.join(user_folder("devices"), f) for f in used_device_files}
+        self.get_unknown_hashes(device_paths)
         files_to_transfer = []
-        for device_file in used_device_files:  # File not on pyboard.
-            if device_file not in self.device_files_on_pyboard.keys():
-                files_to_transfer.append(device_file)
-            else:
-                file_hash = _djb2_file(os.path.join(user_folder("devices"), device_file))
-                if file_hash != self.device_files_on_pyboard[device_file]:  # File has changed.
-                    files_to_transfer.append(device_file)
+        for target_path, file_path in device_paths.items():
+            board_size, board_mtime, board_hash = self.file_manifest.get(target_path, (None, None, None))
+            if (board_size, board_hash) != (os.path.getsize(file_path), _djb2_file(file_path)):  # New or changed.
+                files_to_transfer.append(os.path.split(file_path)[-1])
         if files_to_transfer:
             self.print(f"\nTransfering device driver files {files_to_transfer} to pyboard", end="")
             self.transfer_folder(
@@ -415,7 +733,7 @@ class Pycboard(Pyboard):
             states=states,  # {name:ID}
             events=events,  # {name:ID}
             ID2name={ID: name for name, ID in {**states, **events}.items()},  # {ID:name}
-            analog_inputs=self.get_analog_inputs(),  # {ID: {'name':, 'fs':, 'dtype': 'plot':}}
+            analog_inputs=self.get_analog_inputs(),  # {ID: {'name':, 'fs':, 'dtype':, 'plot':}}
             variables=self.get_variables(),
             framework_version=self.framework_version,
             micropython_version=self.micropython_version,
@@ -431,18 +749,57 @@ class Pycboard(Pyboard):
         return eval(self.eval("sm.events").decode())
 
     def get_analog_inputs(self):
-        """Return analog_inputs as a dictionary: {ID: {'name':, 'fs':, 'dtype': 'plot':}}"""
+        """Return analog_inputs as a dictionary: {ID: {'name':, 'fs':, 'dtype':, 'plot':}}.  Analog groups
+        also have 'channels', inputs with an envelope stream have the envelope's ID as 'envelope',
+        and envelope streams have the ID of the input they summarise as 'envelope_of'."""
         return eval(self.exec("hw.get_analog_inputs()").decode().strip())
 
-    def start_framework(self, data_output=True):
-        """Start pyControl framwork running on pyboard."""
+    def start_framework(
+        self,
+        data_output=True,
+        profile=False,
+        monitor_interval=0,
+        idle_gc_margin=0,
+        idle_gc_threshold=8192,
+        event_queue_capacity=None,
+        output_queue_capacity=None,
+        queue_overflow=None,
+    ):
+        """Start pyControl framwork running on pyboard.  If profile is True the board records
+        main loop service counts and queue latencies, and reports them at the end of the run.
+        If monitor_interval is non-zero the board outputs main loop monitor messages with the
+        loop iterations per clock tick, worst case clock tick latency and missed clock ticks
+        every monitor_interval ms.  If idle_gc_margin is non-zero the board collects garbage
+        when its main loop is idle, no timer is due within idle_gc_margin ms, and at least
+        idle_gc_threshold bytes have been allocated since the last collection.  The event and data
+        output queue capacities and the overflow policy applied when a queue is full ("grow",
+        "raise", "drop" or "warn") override any set in the task file if not None."""
         self.gc_collect()
-        self.exec("fw.data_output = " + repr(data_output))
-        self.serial.reset_input_buffer()
+        self.exec(
+            f"fw.data_output = {data_output!r}; fw.profile = {profile!r}; fw.monitor_interval = {monitor_interval!r}; "
+            f"fw.idle_gc_margin = {idle_gc_margin!r}; fw.idle_gc_threshold = {idle_gc_threshold!r}"
+        )
+        queue_settings = {
+            "event_queue_capacity": event_queue_capacity,
+            "output_queue_capacity": output_queue_capacity,
+            "queue_overflow": queue_overflow,
+        }
+        for name, value in queue_settings.items():
+            if value is not None:
+                self.exec(f"fw.{name} = {value!r}")
+        self.binary_IDs = _version_tuple(self.framework_version) >= BINARY_IDS_VERSION
+        if self.binary_IDs:
+            self.exec("fw.binary_IDs = True")
+        if _version_tuple(self.framework_version) >= VIPER_CHECKSUMS_VERSION:
+            self.exec("fw.viper_checksums = True")
+        self.reset_input_buffer()
+        self.rx_buffer = bytearray()
         self.last_message_time = time.time()
         self.timestamp = 0
         self.exec_raw_no_follow("fw.run()")
         self.framework_running = True
+        if self.use_reader_thread:
+            self.start_reader()
 
     def stop_framework(self):
         """Stop framework running on pyboard by sending stop command."""
@@ -451,73 +808,198 @@ class Pycboard(Pyboard):
 
     def process_data(self):
         """Read data from serial line, generate list new_data of data tuples,
-        pass new_data to data_logger and print_func if specified, return new_data."""
+        pass new_data to data_logger and print_func if specified, and to data_consumers.
+        If the reader thread is running, data that has already been read, parsed and
+        saved to disk by the thread is taken from the reader queue instead."""
+        if self.reader:
+            new_data, error_message = self._get_reader_data()
+            if new_data:
+                self.data_logger.print_data(new_data)
+        else:
+            new_data, error_message, run_ended = self.read_data()
+            if run_ended:
+                self.framework_running = False
+            if new_data:
+                self.data_logger.process_data(new_data)
+        if new_data and self.data_consumers:
+            for data_consumer in self.data_consumers:
+                data_consumer.process_data(new_data)
+        if error_message:
+            raise PyboardError(error_message)
+
+    def read_data(self):
+        """Read available bytes from serial line and parse them into a list of data tuples.
+        All available bytes are read from the serial line in one call and appended to
+        rx_buffer, bytes of incomplete messages are kept in rx_buffer until the rest
+        of the message is received. Returns (new_data, error_message, run_ended)."""
         new_data = []
+        run_ended = False
         error_message = None
-        unexpected_input = []
-        while self.serial.in_waiting > 0:
-            new_byte = self.serial.read(1)
-            if new_byte == b"\x07":  # Start of pyControl message.
+        unexpected_input = bytearray()
+        if self.read_buffer:
+            self.rx_buffer += self.read_buffer
+            self.read_buffer.clear()
+        if self.serial.in_waiting > 0:
+            self.rx_buffer += self.serial.read(self.serial.in_waiting)
+        buf = self.rx_buffer
+        i = 0  # Index of next unprocessed byte in buf.
+        while i < len(buf):
+            if buf[i] == 7:  # Start of pyControl message.
+                if len(buf) - i < 5:
+                    break  # Message header incomplete.
+                message_len = int.from_bytes(buf[i + 3 : i + 5], "little")
+                if len(buf) - i < 5 + message_len:
+                    break  # Message incomplete.
                 # Output any unexpected characters recived prior to message start.
                 if unexpected_input:
-                    new_data.append(
-                        Datatuple(
-                            time=self.get_timestamp(),
-                            type=MsgType.WARNG,
-                            content="Unexpected input received from board: " + "".join(unexpected_input),
-                        )
-                    )
-                    unexpected_input = []
-                # Read message.
-                checksum = int.from_bytes(self.serial.read(2), "little")
-                message_len = int.from_bytes(self.serial.read(2), "little")
-                message = self.serial.read(message_len)
-                msg_type = MsgType.from_byte(message[4:5])
-                subtype_byte = message[5:6]
-                msg_subtype = msg_type.get_subtype(subtype_byte.decode())
-                content_bytes = message[6:]
-                # Compute checksum
-                if msg_type == MsgType.ANLOG:  # Need to extract analog data to compute checksum.
-                    ID = int.from_bytes(content_bytes[:2], "little")
-                    data = array(self.sm_info.analog_inputs[ID]["dtype"], content_bytes[2:])
-                    content = (ID, data)
-                    msg_sum = sum(message[:8]) + sum(data)
-                else:
-                    msg_sum = sum(message)
-                # Process message.
-                if checksum == (msg_sum & 0xFFFF):  # Checksum OK.
-                    msg_timestamp = int.from_bytes(message[:4], "little")
-                    if msg_timestamp > self.timestamp:
-                        self.last_message_time = time.time()
-                        self.timestamp = msg_timestamp
-                    if msg_type in (MsgType.EVENT, MsgType.STATE):
-                        content = int(content_bytes.decode())  # Event/state ID.
-                    elif msg_type in (MsgType.PRINT, MsgType.WARNG):
-                        content = content_bytes.decode()  # Print or error string.
-                    elif msg_type == MsgType.VARBL:
-                        content = content_bytes.decode()  # JSON string
-                        self.sm_info.variables.update(json.loads(content))
-                    new_data.append(Datatuple(time=msg_timestamp, type=msg_type, subtype=msg_subtype, content=content))
-                else:  # Bad checksum
-                    new_data.append(
-                        Datatuple(time=self.get_timestamp(), type=MsgType.WARNG, content="Bad data checksum.")
-                    )
-            elif new_byte == b"\x04":  # End of framework run.
-                self.framework_running = False
-                data_err = self.read_until(2, b"\x04>", timeout=10)
+                    new_data.append(self._unexpected_input_warning(unexpected_input))
+                    unexpected_input = bytearray()
+                checksum = int.from_bytes(buf[i + 1 : i + 3], "little")
+                new_data.append(self._process_message(bytes(buf[i + 5 : i + 5 + message_len]), checksum))
+                i += 5 + message_len
+            elif buf[i] == 4:  # End of framework run.
+                if unexpected_input:
+                    new_data.append(self._unexpected_input_warning(unexpected_input))
+                    unexpected_input = bytearray()
+                run_ended = True
+                data_err = bytes(buf[i + 1 :])
+                if data_err.endswith(b"\x04"):
+                    data_err += self.read_until(1, b">", timeout=10)
+                elif not data_err.endswith(b"\x04>"):
+                    data_err += self.read_until(2, b"\x04>", timeout=10)
                 if len(data_err) > 2:  # Error during framework run.
                     error_message = data_err[:-3].decode()
                     new_data.append(Datatuple(time=self.get_timestamp(), type=MsgType.ERROR, content=error_message))
+                i = len(buf)
                 break
+            else:  # Unexpected input, find next message or end of run byte.
+                j = min([k for k in (buf.find(b"\x07", i), buf.find(b"\x04", i)) if k != -1], default=len(buf))
+                unexpected_input += buf[i:j]
+                i = j
+        if unexpected_input:  # Output unexpected characters already removed from buffer.
+            new_data.append(self._unexpected_input_warning(unexpected_input))
+        del buf[:i]
+        return new_data, error_message, run_ended
+
+    def _unexpected_input_warning(self, unexpected_input):
+        """Return warning Datatuple reporting unexpected bytes received from board."""
+        return Datatuple(
+            time=self.get_timestamp(),
+            type=MsgType.WARNG,
+            content="Unexpected input received from board: " + unexpected_input.decode(errors="replace"),
+        )
+
+    # ------------------------------------------------------------------------------------
+    # Background reader thread.
+    # ------------------------------------------------------------------------------------
+
+    def start_reader(self):
+        """Start thread which reads and parses data from the serial line and writes it to
+        disk while the framework is running, independent of the GUI update interval."""
+        if self.reader:  # Reader from previous run has been told to stop but is still finishing a read.
+            self.reader.join()
+        self.reader_queue = deque()  # Batches of parsed data awaiting collection by process_data.
+        self.reader_error = None  # Exception raised in reader thread.
+        self.reader_stop = threading.Event()
+        self.reader = threading.Thread(target=self._reader_loop, name=f"Reader {self.serial_port}", daemon=True)
+        self.reader.start()
+
+    def stop_reader(self, timeout=READER_STOP_TIMEOUT):
+        """Wait up to timeout seconds for reader thread to process data up to end of run, then
+        tell it to stop.  Waits up to timeout seconds more for it to stop, so the calling
+        thread is not blocked if the reader is waiting on the serial line."""
+        if self.reader:
+            self.reader.join(timeout)
+            self.reader_stop.set()
+            self.reader.join(timeout)
+
+    def _reader_loop(self):
+        """Read data until the end of the framework run.  Parsed data is written to disk,
+        then appended to reader_queue for the GUI thread.  If the GUI thread falls behind
+        and the queue is full, new data is held back and merged into the next batch, so
+        no data is lost but the number of queued batches is bounded."""
+        held_data, held_error, run_ended = [], None, False
+        while not self.reader_stop.is_set():
+            if not run_ended:
+                try:
+                    if self.read_buffer or self.serial.in_waiting > 0:
+                        new_data, error_message, run_ended = self.read_data()
+                    else:
+                        new_data, error_message = [], None
+                except Exception as e:  # Serial connection lost, reported as error during framework run.
+                    self.reader_error = e
+                    error_message = f"Error reading data from board: {e!r}"
+                    new_data = [Datatuple(time=self.get_timestamp(), type=MsgType.ERROR, content=error_message)]
+                    run_ended = True
+                if new_data:
+                    self.data_logger.write_data(new_data)
+                held_data += new_data
+                held_error = held_error or error_message
+            if (held_data or run_ended) and len(self.reader_queue) < READER_QUEUE_LEN:
+                self.reader_queue.append((held_data, held_error, run_ended))
+                if run_ended:
+                    return
+                held_data, held_error = [], None
+            time.sleep(0.001)
+
+    def _get_reader_data(self):
+        """Collect all data from the reader queue, returns (new_data, error_message)."""
+        if not self.framework_running:  # Run stopped by user, wait for board's remaining data.
+            self.stop_reader()
+        reader_alive = self.reader.is_alive()
+        new_data, error_message = [], None
+        while self.reader_queue:
+            data, data_error, run_ended = self.reader_queue.popleft()
+            new_data += data
+            error_message = error_message or data_error
+            if run_ended:
+                self.framework_running = False
+        if not reader_alive:
+            self.reader = None
+        return new_data, error_message
+
+    def _process_message(self, message, checksum):
+        """Convert a pyControl message into a Datatuple."""
+        msg_type = MsgType.from_byte(message[4:5])
+        subtype_byte = message[5:6]
+        msg_subtype = msg_type.get_subtype(subtype_byte.decode())
+        content_bytes = message[6:]
+        content = None
+        # Compute checksum
+        if msg_type == MsgType.ANLOG:  # Need to extract analog data to compute checksum.
+            ID = int.from_bytes(content_bytes[:2], "little")
+            dtype = self.sm_info.analog_inputs[ID]["dtype"]
+            data = np.frombuffer(message, dtype, offset=8)  # View of samples in message, not a copy.
+            content = (ID, data)
+            if len(data) >= NUMPY_CHECKSUM_MIN_SAMPLES:  # Faster than sum() except for short messages.
+                data_sum = int(data.sum(dtype=np.int64))
             else:
-                unexpected_input.append(new_byte.decode())
-        if new_data:
-            self.data_logger.process_data(new_data)
-            if self.data_consumers:
-                for data_consumer in self.data_consumers:
-                    data_consumer.process_data(new_data)
-        if error_message:
-            raise PyboardError(error_message)
+                data_sum = sum(memoryview(message)[8:].cast(dtype))
+            msg_sum = sum(message[:8]) + data_sum
+        else:
+            msg_sum = sum(message)
+        # Process message.
+        if checksum != (msg_sum & 0xFFFF):  # Bad checksum
+            return Datatuple(time=self.get_timestamp(), type=MsgType.WARNG, content="Bad data checksum.")
+        msg_timestamp = int.from_bytes(message[:4], "little")
+        if msg_timestamp > self.timestamp:
+            self.last_message_time = time.time()
+            self.timestamp = msg_timestamp
+        if msg_type in (MsgType.EVENT, MsgType.STATE):  # Event/state ID.
+            if self.binary_IDs:
+                content = int.from_bytes(content_bytes, "little")
+            else:
+                content = int(content_bytes.decode())
+        elif msg_type in (MsgType.PRINT, MsgType.WARNG):
+            content = content_bytes.decode()  # Print or error string.
+        elif msg_type == MsgType.PROFL:
+            content = content_bytes.decode()  # JSON string
+        elif msg_type == MsgType.MONIT:
+            content = json.loads(content_bytes)  # {"loops_per_tick":, "max_latency_us":, "missed_ticks":}
+        elif msg_type == MsgType.VARBL:
+            content = content_bytes.decode()  # JSON string
+            self.sm_info.variables.update(json.loads(content))
+        return Datatuple(time=msg_timestamp, type=msg_type, subtype=msg_subtype, content=content)
 
     def trigger_event(self, event_name, source="u"):
         """Trigger specified task event on the pyboard."""
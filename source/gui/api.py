@@ -85,9 +85,10 @@ class Api:
         self.board = board
         self.print_to_log = print_to_log
         self.ID2name = self.board.sm_info.ID2name
-        self.ID2analog = {}  # Convert analog ID to name
+        self.ID2analog = {}  # Convert analog ID to list of channel names, analog groups have several channels.
         for ID, info in self.board.sm_info.analog_inputs.items():
-            self.ID2analog[ID] = info["name"]
+            if "envelope_of" not in info:  # Envelope streams are only used for plotting.
+                self.ID2analog[ID] = info.get("channels", [info["name"]])
 
         # Declare the named tuples for the user friendly data
         # structure, so they are not newly declared with
@@ -121,7 +122,9 @@ class Api:
             elif nd.type == MsgType.EVENT:
                 name = self.ID2name[nd.content]
                 data["events"].append(self.event_tup(name, nd.time))
-            elif nd.type == MsgType.ANLOG:
-                data["analog"].append(self.analog_tup(self.ID2analog[nd.content[0]], nd.content[1], nd.time))
+            elif nd.type == MsgType.ANLOG and nd.content[0] in self.ID2analog:
+                names = self.ID2analog[nd.content[0]]
+                for i, name in enumerate(names):  # Group data is interleaved across channels.
+                    data["analog"].append(self.analog_tup(name, nd.content[1][i :: len(names)], nd.time))
 
         self.process_data_user(data)
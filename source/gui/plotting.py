@@ -4,7 +4,7 @@ import numpy as np
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtGui, QtWidgets, QtCore
 from source.gui.settings import get_setting
-from source.gui.utility import detachableTabWidget
+from source.gui.utility import detachableTabWidget, loop_monitor_text
 from source.communication.pycboard import MsgType
 
 # ----------------------------------------------------------------------------------------
@@ -23,6 +23,7 @@ class Task_plot(QtWidgets.QWidget):
         self.events_plot = Events_plot(self, data_len=get_setting("plotting", "event_history_len"))
         self.analog_plot = Analog_plot(self, data_dur=get_setting("plotting", "analog_history_dur"))
         self.run_clock = Run_clock(self.states_plot.axis)
+        self.loop_monitor = Loop_monitor(self.states_plot.axis)
 
         # Setup plots
         self.pause_button = QtWidgets.QPushButton()
@@ -78,12 +79,14 @@ class Task_plot(QtWidgets.QWidget):
     def run_stop(self):
         self.pause_button.setEnabled(False)
         self.run_clock.run_stop()
+        self.loop_monitor.run_stop()
 
     def process_data(self, new_data):
         """Store new data from board."""
         self.states_plot.process_data(new_data)
         self.events_plot.process_data(new_data)
         self.analog_plot.process_data(new_data)
+        self.loop_monitor.process_data(new_data)
 
     def update(self):
         """Update plots."""
@@ -229,24 +232,44 @@ class Analog_plot:
         self.inputs = {}
 
     def set_state_machine(self, sm_info):
-        self.inputs = {ID: ai for ID, ai in sm_info.analog_inputs.items() if ai["plot"]}
+        # Inputs with an envelope stream are plotted from the envelope rather than every sample.
+        self.inputs = {ID: ai for ID, ai in sm_info.analog_inputs.items() if ai["plot"] and "envelope" not in ai}
         if not self.inputs:
             return  # State machine may not have analog inputs.
         self.axis.clear()
         self.legend = self.axis.addLegend(offset=(10, 10))
+        # Channels to plot as (ID, channel index, name), analog groups have a channel for each pin.
+        self.channels = [
+            (ID, i, name)
+            for ID, ai in sorted(self.inputs.items())
+            for i, name in enumerate(ai.get("channels", [ai["name"]]))
+        ]
         self.plots = {
-            ID: self.axis.plot(name=ai["name"], pen=pg.mkPen(pg.intColor(i, len(self.inputs))))
-            for i, (ID, ai) in enumerate(sorted(self.inputs.items()))
+            (ID, i): self.axis.plot(name=name, pen=pg.mkPen(pg.intColor(j, len(self.channels))))
+            for j, (ID, i, name) in enumerate(self.channels)
         }
+        # Envelope streams plot the bin mean as above, and the bin minimum and maximum as fainter
+        # curves with the area between them filled.
+        self.envelope_plots = {}  # {(ID, channel index): (min curve, max curve)}
+        for j, (ID, i, name) in enumerate(self.channels):
+            if "envelope_of" in self.inputs[ID]:
+                pen = pg.mkPen(pg.intColor(j, len(self.channels), alpha=100))
+                curves = (self.axis.plot(pen=pen), self.axis.plot(pen=pen))
+                brush = pg.mkBrush(pg.intColor(j, len(self.channels), alpha=50))
+                self.axis.addItem(pg.FillBetweenItem(*curves, brush=brush))
+                self.envelope_plots[ID, i] = curves
         self.axis.getAxis("bottom").setLabel("Time (seconds)")
         self.axis.getAxis("right").setWidth(self.task_plot.axiswidth)
 
     def run_start(self):
         if not self.inputs:
             return  # State machine may not have analog inputs.
-        for plot in self.plots.values():
+        for plot in list(self.plots.values()) + [c for curves in self.envelope_plots.values() for c in curves]:
             plot.clear()
-        self.data = {ID: np.zeros([ai["fs"] * self.data_dur, 2]) for ID, ai in self.inputs.items()}
+        self.data = {  # Columns are time and sample, or time, min, max and mean for envelope streams.
+            (ID, i): np.zeros([int(self.inputs[ID]["fs"] * self.data_dur), 4 if (ID, i) in self.envelope_plots else 2])
+            for ID, i, name in self.channels
+        }
         self.updated_inputs = []
 
     def process_data(self, new_data):
@@ -256,18 +279,27 @@ class Analog_plot:
         new_analog = [nd for nd in new_data if nd.type == MsgType.ANLOG]
         for na in new_analog:
             ID, data = na.content
-            if ID in self.plots.keys():
-                new_len = len(data)
+            if ID in self.inputs.keys():
+                n_channels = len(self.inputs[ID].get("channels", [None]))
+                n_values = 3 if "envelope_of" in self.inputs[ID] else 1  # Envelope bins are [min, max, mean].
+                stride = n_channels * n_values
+                new_len = len(data) // stride
                 t = na.time / 1000 + np.arange(new_len) / self.inputs[ID]["fs"]
-                self.data[ID] = np.roll(self.data[ID], -new_len, axis=0)
-                self.data[ID][-new_len:, :] = np.vstack([t, data]).T
+                for i in range(n_channels):  # Group data is interleaved across channels.
+                    self.data[ID, i] = np.roll(self.data[ID, i], -new_len, axis=0)
+                    self.data[ID, i][-new_len:, :] = np.vstack(
+                        [t] + [data[i * n_values + k :: stride] for k in range(n_values)]
+                    ).T
 
     def update(self, run_time):
         """Update plots."""
         if not self.inputs:
             return  # State machine may not have analog inputs.
-        for ID in self.inputs.keys():
-            self.plots[ID].setData(x=self.data[ID][:, 0] - run_time, y=self.data[ID][:, 1])
+        for key, plot in self.plots.items():
+            plot.setData(x=self.data[key][:, 0] - run_time, y=self.data[key][:, -1])
+        for key, (min_curve, max_curve) in self.envelope_plots.items():
+            min_curve.setData(x=self.data[key][:, 0] - run_time, y=self.data[key][:, 1])
+            max_curve.setData(x=self.data[key][:, 0] - run_time, y=self.data[key][:, 2])
 
 
 # -----------------------------------------------------
@@ -299,6 +331,26 @@ class Run_clock:
         self.recording_text.setText("")
 
 
+class Loop_monitor:
+    # Class for displaying the board's main loop load and clock tick latency.
+
+    def __init__(self, axis):
+        self.monitor_text = pg.TextItem(text="")
+        self.monitor_text.setFont(QtGui.QFont("arial", 9))
+        axis.getViewBox().addItem(self.monitor_text, ignoreBounds=True)
+        self.monitor_text.setParentItem(axis.getViewBox())
+        self.monitor_text.setPos(180, -3)
+
+    def process_data(self, new_data):
+        new_monitor = next((nd.content for nd in reversed(new_data) if nd.type == MsgType.MONIT), None)
+        if new_monitor:
+            monitor_str, overloaded = loop_monitor_text(new_monitor)
+            self.monitor_text.setText(monitor_str, color=(255, 0, 0) if overloaded else (150, 150, 150))
+
+    def run_stop(self):
+        self.monitor_text.setText("")
+
+
 # --------------------------------------------------------------------------------
 # Experiment plotter
 # --------------------------------------------------------------------------------
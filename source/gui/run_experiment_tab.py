@@ -304,6 +304,7 @@ class Subjectbox(QtWidgets.QGroupBox):
         self.time_text.setReadOnly(True)
         self.time_text.setFixedWidth(50)
         self.task_info = TaskInfo()
+        self.task_info.load_text.setFixedWidth(220)
         self.controls_button = QtWidgets.QPushButton("Controls")
         self.controls_button.setIcon(QtGui.QIcon("source/gui/icons/filter.svg"))
         self.controls_button.setEnabled(False)
@@ -327,6 +328,8 @@ class Subjectbox(QtWidgets.QGroupBox):
         self.Hlayout2 = QtWidgets.QHBoxLayout()
         self.Hlayout2.addWidget(self.task_info.print_label)
         self.Hlayout2.addWidget(self.task_info.print_text)
+        self.Hlayout2.addWidget(self.task_info.load_label)
+        self.Hlayout2.addWidget(self.task_info.load_text)
         self.Vlayout.addLayout(self.Hlayout1)
         self.Vlayout.addLayout(self.Hlayout2)
         self.Vlayout.addWidget(self.log_textbox)
@@ -360,6 +363,8 @@ class Subjectbox(QtWidgets.QGroupBox):
                 self.serial_port,
                 print_func=self.print_to_log,
                 data_consumers=[self.run_exp_tab.experiment_plot.subject_plots[self.subject], self.task_info],
+                reader_thread=get_setting("serial", "reader_thread"),
+                save_time_npy=get_setting("data_files", "save_time_npy"),
             )
         except SerialException:
             self.print_to_log("\nConnection failed.")
@@ -502,7 +507,15 @@ class Subjectbox(QtWidgets.QGroupBox):
         ex = self.run_exp_tab.experiment
         self.print_to_log("\nStarting experiment.\n")
         self.board.data_logger.open_data_file(ex.data_dir, ex.name, self.setup_name, self.subject, datetime.now())
-        self.board.start_framework()
+        self.board.start_framework(
+            profile=get_setting("framework", "profile"),
+            monitor_interval=get_setting("framework", "monitor_interval"),
+            idle_gc_margin=get_setting("framework", "idle_gc_margin"),
+            idle_gc_threshold=get_setting("framework", "idle_gc_threshold"),
+            event_queue_capacity=get_setting("framework", "event_queue_capacity"),
+            output_queue_capacity=get_setting("framework", "output_queue_capacity"),
+            queue_overflow=get_setting("framework", "queue_overflow"),
+        )
         if self.user_API:
             self.user_API.run_start()
         self.start_stop_button.setText("Stop")
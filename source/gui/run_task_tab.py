@@ -297,7 +297,11 @@ class Run_task_tab(QtWidgets.QWidget):
             self.repaint()
             self.serial_port = self.GUI_main.setups_tab.get_port(self.board_select.currentText())
             self.board = Pycboard(
-                self.serial_port, print_func=self.print_to_log, data_consumers=[self.task_plot, self.task_info]
+                self.serial_port,
+                print_func=self.print_to_log,
+                data_consumers=[self.task_plot, self.task_info],
+                reader_thread=get_setting("serial", "reader_thread"),
+                save_time_npy=get_setting("data_files", "save_time_npy"),
             )
             self.connected = True
             self.config_dropdown.setEnabled(True)
@@ -457,7 +461,15 @@ class Run_task_tab(QtWidgets.QWidget):
             self.board.data_logger.copy_task_file(self.data_dir, self.GUI_main.task_directory, "run_task-task_files")
         self.fresh_task = False
         self.running = True
-        self.board.start_framework()
+        self.board.start_framework(
+            profile=get_setting("framework", "profile"),
+            monitor_interval=get_setting("framework", "monitor_interval"),
+            idle_gc_margin=get_setting("framework", "idle_gc_margin"),
+            idle_gc_threshold=get_setting("framework", "idle_gc_threshold"),
+            event_queue_capacity=get_setting("framework", "event_queue_capacity"),
+            output_queue_capacity=get_setting("framework", "output_queue_capacity"),
+            queue_overflow=get_setting("framework", "queue_overflow"),
+        )
         self.task_plot.run_start(recording)
         if self.user_API:
             self.user_API.run_start()
@@ -1,7 +1,7 @@
 import os
 import json
 
-VERSION = "2.0.2"
+VERSION = "2.1.0"
 
 
 def get_setting(setting_type, setting_name, want_default=False):
@@ -30,13 +30,28 @@ def get_setting(setting_type, setting_name, want_default=False):
             "ui_font_size": 11,
             "log_font_size": 9,
         },
+        "serial": {
+            "reader_thread": False,
+        },
+        "data_files": {
+            "save_time_npy": True,  # Save analog sample times as .time.npy as well as .timebase.npz.
+        },
+        "framework": {
+            "profile": False,
+            "monitor_interval": 0,  # ms, 0 for off.
+            "idle_gc_margin": 0,
+            "idle_gc_threshold": 8192,
+            "event_queue_capacity": None,  # None to use task file or framework default.
+            "output_queue_capacity": None,
+            "queue_overflow": None,
+        },
     }
 
     json_path = os.path.join("config", "settings.json")
     if os.path.exists(json_path) and not want_default:  # user has a settings.json
         with open(json_path, "r", encoding="utf-8") as f:
             custom_settings = json.loads(f.read())
-        if setting_name in custom_settings[setting_type]:
+        if setting_name in custom_settings.get(setting_type, {}):
             return custom_settings[setting_type][setting_name]
         else:
             return default_user_settings[setting_type][setting_name]
@@ -380,9 +380,23 @@ class NestedMenu(QtWidgets.QPushButton):
 # Task Info
 # ----------------------------------------------------------------------------------
 
+TICK_LATENCY_WARNING_US = 1000  # Clock tick latency above which the board is shown as overloaded.
+
+
+def loop_monitor_text(monitor):
+    """Return (text, overloaded) summarising the content of a main loop monitor message,
+    overloaded is True if clock ticks were missed or processed late."""
+    text = f"{monitor['loops_per_tick']:.0f} loops/ms, max lag {monitor['max_latency_us'] / 1000:.1f} ms"
+    if monitor["missed_ticks"]:
+        text += f", {monitor['missed_ticks']} missed ticks"
+    if monitor.get("gc_collections"):
+        text += f", gc {monitor['max_gc_pause_us'] / 1000:.1f} ms"
+    overloaded = monitor["missed_ticks"] > 0 or monitor["max_latency_us"] > TICK_LATENCY_WARNING_US
+    return text, overloaded
+
 
 class TaskInfo:
-    """Class for displaying the current state and most recent event and printed line.
+    """Class for displaying the current state, most recent event and printed line, and board load.
     Instantiates the GUI elements and has their process data method, but does not
     handle layout of the elements.
     """
@@ -403,6 +417,11 @@ class TaskInfo:
         self.print_text = QtWidgets.QLineEdit("")
         self.print_text.setReadOnly(True)
 
+        self.load_label = QtWidgets.QLabel("Load:")
+        self.load_label.setAlignment(QtCore.Qt.AlignmentFlag.AlignRight | QtCore.Qt.AlignmentFlag.AlignVCenter)
+        self.load_text = QtWidgets.QLineEdit("")
+        self.load_text.setReadOnly(True)
+
     def process_data(self, new_data):
         """Update the state, event and print line info."""
         try:
@@ -433,12 +452,21 @@ class TaskInfo:
             self.print_text.home(False)
         except StopIteration:
             pass
+        try:
+            new_monitor = next(nd.content for nd in reversed(new_data) if nd.type == MsgType.MONIT)
+            load_str, overloaded = loop_monitor_text(new_monitor)
+            self.load_text.setText(load_str)
+            self.load_text.setStyleSheet("color: red;" if overloaded else "color: black;")
+            self.load_text.home(False)
+        except StopIteration:
+            pass
 
     def set_state_machine(self, sm_info):
         self.sm_info = sm_info
         self.state_text.setText("")
         self.event_text.setText("")
         self.print_text.setText("")
+        self.load_text.setText("")
 
 
 # ----------------------------------------------------------------------------------
@@ -446,15 +474,25 @@ class TaskInfo:
 # ----------------------------------------------------------------------------------
 
 
+_executor = None  # ThreadPoolExecutor reused across calls to parallel_call.
+_executor_workers = 0
+
+
 def parallel_call(method_name, setups):
-    """Call specified method of each setup in in parallel using
-    ThreadPoolExecutor. Print output is delayed during multithreaded
-    operations to avoid error message when trying to call PyQt method
-    from annother thread."""
+    """Call specified method of each setup in in parallel using a
+    ThreadPoolExecutor that is reused across calls. Print output is delayed
+    during multithreaded operations to avoid error message when trying to
+    call PyQt method from annother thread."""
+    global _executor, _executor_workers
+    setups = list(setups)
+    if len(setups) > _executor_workers:  # Executor needs more workers.
+        if _executor:
+            _executor.shutdown()
+        _executor_workers = max(len(setups), 8)
+        _executor = ThreadPoolExecutor(max_workers=_executor_workers, thread_name_prefix="parallel_call")
     func = lambda setup: getattr(setup, method_name)()
     for setup in setups:
         setup.start_delayed_print()
-    with ThreadPoolExecutor(max_workers=len(setups)) as executor:
-        list(executor.map(func, setups))
+    list(_executor.map(func, setups))
     for setup in setups:
         setup.end_delayed_print()
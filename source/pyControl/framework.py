@@ -1,184 +1,500 @@
-import pyb
-import ujson
-from ucollections import namedtuple
-from . import timer
-from . import state_machine as sm
-from . import hardware as hw
-from . import utility as ut
-
-VERSION = "2.0.2"
-
-
-class pyControlError(BaseException):  # Exception for pyControl errors.
-    pass
-
-
-Datatuple = namedtuple("Datatuple", ["time", "type", "subtype", "content"])
-
-# Constants used to indicate data types, corresponding data tuple indicated in comment.
-
-EVENT_TYP = b"E"  # Event            : (time, EVENT_TYP, [i]nput/[t]imer/[s]ync/[p]ublish/[u]ser/[a]pi, event_ID)
-STATE_TYP = b"S"  # State transition : (time, STATE_TYP, "", state_ID)
-PRINT_TYP = b"P"  # User print       : (time, PRINT_TYP, "", print_string)
-HARDW_TYP = b"H"  # Harware callback : (time, HARDW_TYP, "", hardware_ID)
-VARBL_TYP = b"V"  # Variable change  : (time, VARBL_TYP, [g]et/user_[s]et/[a]pi_set/[p]rint/s[t]art/[e]nd, json_str)
-WARNG_TYP = b"!"  # Warning          : (time, WARNG_TYP, "", print_string)
-STOPF_TYP = b"X"  # Stop framework   : (time, STOPF_TYP, "", "")
-
-# Event_queue -----------------------------------------------------------------
-
-
-class Event_queue:
-    # First-in first-out event queue.
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        # Empty queue.
-        self.Q = []
-        self.available = False
-
-    def put(self, event_tuple):
-        # Put event in queue.
-        self.Q.append(event_tuple)
-        self.available = True
-
-    def get(self):
-        # Get event tuple from queue
-        self.available = len(self.Q) > 1
-        return self.Q.pop(0)
-
-
-# Framework variables and objects ---------------------------------------------
-
-event_queue = Event_queue()  # Instantiate event que object.
-
-data_output_queue = Event_queue()  # Queue used for outputing events to serial line.
-
-data_output = True  # Whether to output data to the serial line.
-
-current_time = None  # Time since run started (milliseconds).
-
-running = False  # Set to True when framework is running, set to False to stop run.
-
-usb_serial = pyb.USB_VCP()  # USB serial port object.
-
-clock = pyb.Timer(1)  # Timer which generates clock tick.
-
-check_timers = False  # Flag to say timers need to be checked, set True by clock tick.
-
-start_time = 0  # Time at which framework run is started.
-
-# Framework functions ---------------------------------------------------------
-
-
-def _clock_tick(t):
-    # Set flag to check timers, called by hardware timer once each millisecond.
-    global check_timers, current_time
-    current_time = pyb.elapsed_millis(start_time)
-    check_timers = True
-
-
-def output_data(event):
-    # Output data to computer.
-    if not data_output:
-        return
-    timestamp = event.time.to_bytes(4, "little")
-    subtype_byte = event.subtype.encode() if event.subtype else b"_"
-    content_bytes = str(event.content).encode() if event.content else b""
-    message = timestamp + event.type + subtype_byte + content_bytes
-    message_len = len(message).to_bytes(2, "little")
-    checksum = (sum(message) & 0xFFFF).to_bytes(2, "little")
-    usb_serial.send(b"\x07" + checksum + message_len + message)
-
-
-def receive_data():
-    # Read and process data from computer.
-    global running
-    new_byte = usb_serial.read(1)
-    if new_byte == b"\x03":  # Serial command to stop run.
-        running = False
-    elif new_byte in (VARBL_TYP, EVENT_TYP):
-        data_len = int.from_bytes(usb_serial.read(2), "little")
-        data_and_checksum = usb_serial.recv(data_len + 2, timeout=1)
-        checksum = int.from_bytes(data_and_checksum[-2:], "little")
-        if checksum != (sum(data_and_checksum[:-2]) & 0xFFFF):
-            return  # Bad checksum, data was corrupted or recieve timedout.
-        data_str = data_and_checksum[:-2].decode()
-        if new_byte == VARBL_TYP:  # Get/set variables command.
-            if data_str[0] in ("s", "a"):  # Set variable.
-                v_name, v_value = eval(data_str[1:])
-                if sm.set_variable(v_name, v_value):
-                    data_output_queue.put(
-                        Datatuple(current_time, VARBL_TYP, data_str[0], ujson.dumps({v_name: v_value}))
-                    )
-            elif data_str[0] == "g":  # Get variable.
-                v_name = data_str[1:]
-                v_value = sm.get_variable(v_name)
-                data_output_queue.put(Datatuple(current_time, VARBL_TYP, "g", ujson.dumps({v_name: v_value})))
-        elif new_byte == EVENT_TYP:  # Trigger event command.
-            subtype = data_str[0]
-            event_ID = int(data_str[1:])
-            event_queue.put(Datatuple(current_time, EVENT_TYP, subtype, event_ID))
-
-
-def run():
-    # Run framework for specified number of seconds.
-    # Pre run
-    global current_time, start_time, running
-    timer.reset()
-    event_queue.reset()
-    data_output_queue.reset()
-    if not hw.initialised:
-        hw.initialise()
-    usb_serial.setinterrupt(-1)  # Disable 'ctrl+c' on serial raising KeyboardInterrupt.
-    current_time = 0
-    ut.print_variables(when="t")
-    start_time = pyb.millis()
-    clock.init(freq=1000)
-    clock.callback(_clock_tick)
-    sm.start()
-    hw.run_start()
-    running = True
-    # Run
-    while running:
-        # Priority 1: Process hardware interrupts.
-        if hw.interrupt_queue.available:
-            hw.IO_dict[hw.interrupt_queue.get()]._process_interrupt()
-        # Priority 2: Process event from queue.
-        elif event_queue.available:
-            event = event_queue.get()
-            data_output_queue.put(event)
-            sm.process_event(event.content)
-        # Priority 3: Check for elapsed timers.
-        elif check_timers:
-            timer.check()
-        # Priority 4: Process timer event.
-        elif timer.elapsed:
-            event = timer.get()
-            if event.type == EVENT_TYP:
-                if event.subtype:
-                    data_output_queue.put(event)
-                sm.process_event(event.content)
-            elif event.type == HARDW_TYP:
-                hw.IO_dict[event.content]._timer_callback()
-            elif event.type == STATE_TYP:
-                sm.goto_state(event.content)
-        # Priority 5: Check for serial input from computer.
-        elif usb_serial.any():
-            receive_data()
-        # Priority 6: Stream analog data.
-        elif hw.stream_data_queue.available:
-            hw.IO_dict[hw.stream_data_queue.get()].send_buffer()
-        # Priority 7: Output framework data.
-        elif data_output_queue.available:
-            output_data(data_output_queue.get())
-    # Post run
-    ut.print_variables(when="e")
-    data_output_queue.put(Datatuple(current_time, STOPF_TYP, "", ""))
-    usb_serial.setinterrupt(3)  # Enable 'ctrl+c' on serial raising KeyboardInterrupt.
-    clock.deinit()
-    hw.run_stop()
-    sm.stop()
-    while data_output_queue.available:
-        output_data(data_output_queue.get())
+import gc
+import pyb
+import ujson
+from ucollections import namedtuple
+from . import timer
+from . import state_machine as sm
+from . import hardware as hw
+from . import utility as ut
+
+VERSION = "2.1.0"
+
+
+class pyControlError(BaseException):  # Exception for pyControl errors.
+    pass
+
+
+Datatuple = namedtuple("Datatuple", ["time", "type", "subtype", "content"])
+
+# Constants used to indicate data types, corresponding data tuple indicated in comment.
+
+EVENT_TYP = b"E"  # Event            : (time, EVENT_TYP, [i]nput/[t]imer/[s]ync/[p]ublish/[u]ser/[a]pi, event_ID)
+STATE_TYP = b"S"  # State transition : (time, STATE_TYP, "", state_ID)
+PRINT_TYP = b"P"  # User print       : (time, PRINT_TYP, "", print_string)
+HARDW_TYP = b"H"  # Harware callback : (time, HARDW_TYP, "", hardware_ID)
+VARBL_TYP = b"V"  # Variable change  : (time, VARBL_TYP, [g]et/user_[s]et/[a]pi_set/[p]rint/s[t]art/[e]nd, json_str)
+WARNG_TYP = b"!"  # Warning          : (time, WARNG_TYP, "", print_string)
+STOPF_TYP = b"X"  # Stop framework   : (time, STOPF_TYP, "", "")
+PROFL_TYP = b"R"  # Profile report   : (time, PROFL_TYP, "", json_str)
+MONIT_TYP = b"M"  # Loop monitor     : (time, MONIT_TYP, "", json_str)
+
+N_HIST_BINS = 20  # Number of bins in latency histograms, bin i counts latencies in [2**(i-1), 2**i) us.
+
+# Event_queue -----------------------------------------------------------------
+
+
+class Event_queue:
+    # First-in first-out event queue, implemented as a ring buffer.
+    # The overflow argument sets what happens when an item is put in a full queue:
+    #     "grow"  : double the queue capacity, so no item is lost and the run is not stopped.
+    #     "raise" : raise a pyControlError, stopping the run, so no item is lost without notice.
+    #     "drop"  : discard the oldest item in the queue.
+    #     "warn"  : discard the oldest item, output a warning the first time this happens in a run,
+    #               and output the number of items discarded at the end of the run.
+    # high_water_mark records the largest number of items held in the queue during a run.
+    # If reset with profile=True, the time each item spends in the queue is recorded in
+    # latency_hist and the number of items already in the queue when each item is put is
+    # summed in depth_sum, to give the mean queue depth.
+    def __init__(self, name, capacity=64, overflow="grow"):
+        self.name = name
+        self.capacity = 0
+        self.configure(capacity, overflow)
+
+    def configure(self, capacity, overflow):
+        # Set capacity and overflow policy, the queue is reallocated if the capacity changes,
+        # discarding any queued items.
+        assert overflow in ("grow", "raise", "drop", "warn"), "Invalid overflow policy."
+        self.overflow = overflow
+        if capacity != self.capacity:
+            self.capacity = capacity
+            self.Q = [None] * capacity
+            self.reset()
+
+    def reset(self, profile=False):
+        # Empty queue.
+        for i in range(self.capacity):
+            self.Q[i] = None
+        self.read_ind = 0
+        self.write_ind = 0
+        self.n_items = 0
+        self.n_dropped = 0
+        self.high_water_mark = 0
+        self.available = False
+        self.put_times = [0] * self.capacity if profile else None  # pyb.micros() when each item was put.
+        self.latency_hist = [0] * N_HIST_BINS
+        self.n_puts = 0
+        self.depth_sum = 0
+
+    def put(self, event_tuple):
+        # Put event in queue.
+        while self.n_items == self.capacity:
+            self._overflow()
+        if self.put_times:
+            self.put_times[self.write_ind] = pyb.micros()
+            self.n_puts += 1
+            self.depth_sum += self.n_items
+        self.Q[self.write_ind] = event_tuple
+        self.write_ind = (self.write_ind + 1) % self.capacity
+        self.n_items += 1
+        if self.n_items > self.high_water_mark:
+            self.high_water_mark = self.n_items
+        self.available = True
+
+    def peek(self):
+        # Return next event tuple without removing it from queue.
+        return self.Q[self.read_ind]
+
+    def get(self):
+        # Get event tuple from queue
+        event_tuple = self.Q[self.read_ind]
+        if self.put_times:
+            _histogram_add(self.latency_hist, pyb.elapsed_micros(self.put_times[self.read_ind]))
+        self.Q[self.read_ind] = None
+        self.read_ind = (self.read_ind + 1) % self.capacity
+        self.n_items -= 1
+        self.available = self.n_items > 0
+        return event_tuple
+
+    def _overflow(self):
+        # Apply overflow policy when queue is full.
+        if self.overflow == "grow":
+            self._grow()
+            return
+        if self.overflow == "raise":
+            raise pyControlError(self.name + " overflow, capacity: " + str(self.capacity))
+        self.get()  # Discard oldest item.
+        self.n_dropped += 1
+        if self.overflow == "warn" and self.n_dropped == 1:
+            data_output_queue.put(
+                Datatuple(current_time, WARNG_TYP, "", self.name + " overflow, oldest items are being discarded.")
+            )
+
+    def _grow(self):
+        # Double capacity of full queue, moving queued items to the start of the new buffer.
+        n = self.capacity
+        self.Q = [self.Q[(self.read_ind + i) % n] for i in range(n)] + [None] * n
+        if self.put_times:
+            self.put_times = [self.put_times[(self.read_ind + i) % n] for i in range(n)] + [0] * n
+        self.read_ind = 0
+        self.write_ind = n
+        self.capacity = 2 * n
+
+    def profile_dict(self, latency_name):
+        # Return dict of queue statistics recorded during run, latency_name is the key for the latency histogram.
+        return {
+            "high_water_mark": self.high_water_mark,
+            "puts": self.n_puts,
+            "mean_depth": self.depth_sum / self.n_puts if self.n_puts else 0,
+            "dropped": self.n_dropped,
+            latency_name: self.latency_hist,
+        }
+
+
+def _histogram_add(histogram, value):
+    # Increment the bin of a latency histogram containing value, values beyond the last bin go in the last bin.
+    i = 0
+    while value and i < N_HIST_BINS - 1:
+        value >>= 1
+        i += 1
+    histogram[i] += 1
+
+
+# Framework variables and objects ---------------------------------------------
+
+event_queue_capacity = 64  # Capacity of event queue, set by host or task file.
+
+output_queue_capacity = 256  # Capacity of data output queue, set by host or task file.
+
+queue_overflow = "grow"  # Overflow policy of event and data output queues, see Event_queue, set by host or task file.
+
+event_queue = Event_queue("Event queue", event_queue_capacity, queue_overflow)  # Instantiate event que object.
+
+# Queue used for outputing events to serial line.
+data_output_queue = Event_queue("Data output queue", output_queue_capacity, queue_overflow)
+
+data_output = True  # Whether to output data to the serial line.
+
+batch_output = True  # Whether to pack multiple messages into each serial write.
+
+binary_IDs = False  # Whether to send event and state IDs as 2 byte integers rather than text, set by host.
+
+viper_checksums = False  # Whether analog data checksums are computed by hw.sum_samples rather than sum(), set by host.
+
+profile = False  # Whether to record main loop profiling data and output a report at the end of the run, set by host.
+
+service_counts = [0] * 8  # Main loop iterations which serviced each priority level, index 0 is iterations with no work.
+
+monitor_interval = 0  # Interval (ms) between main loop monitor outputs, 0 for no monitoring, set by host.
+
+idle_gc_margin = 0  # Collect garbage when main loop idle and no timer due within this many ms, 0 for off, set by host.
+
+idle_gc_threshold = 8192  # Heap allocated (bytes) since the last idle collection before collecting again, set by host.
+
+output_buffer = bytearray(512)  # Buffer used to pack messages for batched output.
+
+output_buffer_mv = memoryview(output_buffer)
+
+current_time = None  # Time since run started (milliseconds).
+
+running = False  # Set to True when framework is running, set to False to stop run.
+
+usb_serial = pyb.USB_VCP()  # USB serial port object.
+
+clock = pyb.Timer(1)  # Timer which generates clock tick.
+
+check_timers = False  # Flag to say timers need to be checked, set True by clock tick.
+
+start_time = 0  # Time at which framework run is started.
+
+tick_us = 0  # pyb.micros() at most recent clock tick.
+
+missed_ticks = 0  # Clock ticks which occured before the previous tick had been processed.
+
+max_tick_latency = 0  # Longest time (us) from a clock tick to timers being checked since last monitor output.
+
+last_monitor_time = 0  # Time of last monitor output.
+
+gc_base_alloc = 0  # gc.mem_alloc() after last idle garbage collection.
+
+gc_collections = 0  # Idle garbage collections since last monitor output.
+
+max_gc_pause = 0  # Longest idle garbage collection (us) since last monitor output.
+
+gc_pause_hist = [0] * N_HIST_BINS  # Histogram of idle garbage collection durations during run.
+
+gc_overrun_warned = False  # Whether a garbage collection longer than idle_gc_margin has been warned about this run.
+
+# Framework functions ---------------------------------------------------------
+
+
+def _clock_tick(t):
+    # Set flag to check timers, called by hardware timer once each millisecond.
+    global check_timers, current_time, tick_us, missed_ticks
+    current_time = pyb.elapsed_millis(start_time)
+    tick_us = pyb.micros()
+    if check_timers:
+        missed_ticks += 1
+    check_timers = True
+
+
+def _monitor_tick(n_loops):
+    # Record latency from clock tick to timers being checked.  If monitor_interval has elapsed since
+    # the last monitor output, output main loop iterations per tick, maximum tick latency, missed
+    # ticks, idle garbage collections and longest collection over the interval.  Returns the number
+    # of loop iterations to count from.
+    global max_tick_latency, missed_ticks, last_monitor_time, gc_collections, max_gc_pause
+    tick_latency = pyb.elapsed_micros(tick_us)
+    if tick_latency > max_tick_latency:
+        max_tick_latency = tick_latency
+    if current_time - last_monitor_time < monitor_interval:
+        return n_loops
+    monitor_str = ujson.dumps(
+        {
+            "loops_per_tick": n_loops / (current_time - last_monitor_time),
+            "max_latency_us": max_tick_latency,
+            "missed_ticks": missed_ticks,
+            "gc_collections": gc_collections,
+            "max_gc_pause_us": max_gc_pause,
+        }
+    )
+    data_output_queue.put(Datatuple(current_time, MONIT_TYP, "", monitor_str))
+    max_tick_latency = 0
+    missed_ticks = 0
+    gc_collections = 0
+    max_gc_pause = 0
+    last_monitor_time = current_time
+    return 0
+
+
+def _idle_gc():
+    # Called when the main loop has no work.  Collect garbage if at least idle_gc_threshold bytes have
+    # been allocated since the last collection and no timer is due within idle_gc_margin ms, so the
+    # collection is unlikely to delay processing.  Collection time is recorded, and a warning output
+    # the first time in a run that a collection takes longer than idle_gc_margin.
+    global gc_base_alloc, gc_collections, max_gc_pause, gc_overrun_warned
+    if gc.mem_alloc() - gc_base_alloc < idle_gc_threshold:
+        return
+    if timer.active_timers and timer.active_timers[0][0] - current_time <= idle_gc_margin:
+        return
+    t0 = pyb.micros()
+    gc.collect()
+    gc_pause = pyb.elapsed_micros(t0)
+    gc_base_alloc = gc.mem_alloc()
+    gc_collections += 1
+    if gc_pause > max_gc_pause:
+        max_gc_pause = gc_pause
+    _histogram_add(gc_pause_hist, gc_pause)
+    if gc_pause > idle_gc_margin * 1000 and not gc_overrun_warned:
+        gc_overrun_warned = True
+        data_output_queue.put(
+            Datatuple(
+                current_time,
+                WARNG_TYP,
+                "",
+                "Garbage collection took {} us, longer than idle_gc_margin.".format(gc_pause),
+            )
+        )
+
+
+def _content_bytes(event):
+    # Encode message content, event and state IDs are sent as fixed width integers if binary_IDs is True.
+    if binary_IDs and (event.type == EVENT_TYP or event.type == STATE_TYP):
+        return event.content.to_bytes(2, "little")
+    return str(event.content).encode() if event.content else b""
+
+
+def output_data(event):
+    # Output data to computer.
+    if not data_output:
+        return
+    timestamp = event.time.to_bytes(4, "little")
+    subtype_byte = event.subtype.encode() if event.subtype else b"_"
+    content_bytes = _content_bytes(event)
+    message = timestamp + event.type + subtype_byte + content_bytes
+    message_len = len(message).to_bytes(2, "little")
+    checksum = (sum(message) & 0xFFFF).to_bytes(2, "little")
+    usb_serial.send(b"\x07" + checksum + message_len + message)
+
+
+def output_data_batch():
+    # Pack as many messages from the data output queue as fit in the output buffer and
+    # send them with a single serial write.  Each message has the same format and
+    # checksum as those sent by output_data.
+    i = 0  # Index of next message in output buffer.
+    while data_output_queue.available:
+        event = data_output_queue.peek()
+        if not data_output:
+            data_output_queue.get()
+            continue
+        content_bytes = _content_bytes(event)
+        message_len = 6 + len(content_bytes)
+        j = i + 5 + message_len  # End of message in output buffer.
+        if j > len(output_buffer):
+            if i == 0:  # Message larger than output buffer.
+                output_data(data_output_queue.get())
+                continue
+            break
+        data_output_queue.get()
+        output_buffer[i] = 7  # Message start byte.
+        output_buffer[i + 3 : i + 5] = message_len.to_bytes(2, "little")
+        output_buffer[i + 5 : i + 9] = event.time.to_bytes(4, "little")
+        output_buffer[i + 9] = event.type[0]
+        output_buffer[i + 10] = ord(event.subtype) if event.subtype else 95  # 95 is "_"
+        output_buffer[i + 11 : j] = content_bytes
+        output_buffer[i + 1 : i + 3] = (sum(output_buffer_mv[i + 5 : j]) & 0xFFFF).to_bytes(2, "little")
+        i = j
+    if i:
+        usb_serial.send(output_buffer_mv[:i])
+
+
+def receive_data():
+    # Read and process data from computer.
+    global running
+    new_byte = usb_serial.read(1)
+    if new_byte == b"\x03":  # Serial command to stop run.
+        running = False
+    elif new_byte in (VARBL_TYP, EVENT_TYP):
+        data_len = int.from_bytes(usb_serial.read(2), "little")
+        data_and_checksum = usb_serial.recv(data_len + 2, timeout=1)
+        checksum = int.from_bytes(data_and_checksum[-2:], "little")
+        if checksum != (sum(data_and_checksum[:-2]) & 0xFFFF):
+            return  # Bad checksum, data was corrupted or recieve timedout.
+        data_str = data_and_checksum[:-2].decode()
+        if new_byte == VARBL_TYP:  # Get/set variables command.
+            if data_str[0] in ("s", "a"):  # Set variable.
+                v_name, v_value = eval(data_str[1:])
+                if sm.set_variable(v_name, v_value):
+                    data_output_queue.put(
+                        Datatuple(current_time, VARBL_TYP, data_str[0], ujson.dumps({v_name: v_value}))
+                    )
+            elif data_str[0] == "g":  # Get variable.
+                v_name = data_str[1:]
+                v_value = sm.get_variable(v_name)
+                data_output_queue.put(Datatuple(current_time, VARBL_TYP, "g", ujson.dumps({v_name: v_value})))
+        elif new_byte == EVENT_TYP:  # Trigger event command.
+            subtype = data_str[0]
+            event_ID = int(data_str[1:])
+            event_queue.put(Datatuple(current_time, EVENT_TYP, subtype, event_ID))
+
+
+def _profile_report():
+    # Return JSON string with the main loop and queue statistics recorded during the run.  The
+    # event queue histogram is of latency from event being queued to being processed, the data
+    # output queue histogram of latency from data being queued to being sent to the computer,
+    # the gc pause histogram of the duration of idle garbage collections.
+    return ujson.dumps(
+        {
+            "service_counts": service_counts,
+            "hist_bin_edges_us": [0] + [1 << i for i in range(N_HIST_BINS - 1)],
+            "event_queue": event_queue.profile_dict("dispatch_latency_hist"),
+            "data_output_queue": data_output_queue.profile_dict("transmit_latency_hist"),
+            "gc_pause_hist": gc_pause_hist,
+        }
+    )
+
+
+def run():
+    # Run framework for specified number of seconds.
+    # Pre run
+    global current_time, start_time, running, check_timers, missed_ticks, max_tick_latency, last_monitor_time
+    global gc_base_alloc, gc_collections, max_gc_pause, gc_overrun_warned
+    profiling = profile
+    monitoring = monitor_interval > 0
+    idle_gc = idle_gc_margin > 0
+    n_loops = 0  # Main loop iterations since last monitor output.
+    timer.reset()
+    event_queue.configure(event_queue_capacity, queue_overflow)
+    data_output_queue.configure(output_queue_capacity, queue_overflow)
+    event_queue.reset(profiling)
+    data_output_queue.reset(profiling)
+    for i in range(len(service_counts)):
+        service_counts[i] = 0
+    for i in range(N_HIST_BINS):
+        gc_pause_hist[i] = 0
+    if not hw.initialised:
+        hw.initialise()
+    usb_serial.setinterrupt(-1)  # Disable 'ctrl+c' on serial raising KeyboardInterrupt.
+    current_time = 0
+    check_timers = False
+    missed_ticks = 0
+    max_tick_latency = 0
+    last_monitor_time = 0
+    gc_collections = 0
+    max_gc_pause = 0
+    gc_overrun_warned = False
+    gc_base_alloc = gc.mem_alloc()
+    ut.print_variables(when="t")
+    start_time = pyb.millis()
+    clock.init(freq=1000)
+    clock.callback(_clock_tick)
+    sm.start()
+    hw.run_start()
+    running = True
+    # Run
+    while running:
+        n_loops += 1
+        # Priority 1: Process hardware interrupts.
+        if hw.interrupt_queue.available:
+            level = 1
+            hw.IO_dict[hw.interrupt_queue.get()]._process_interrupt()
+        # Priority 2: Process event from queue.
+        elif event_queue.available:
+            level = 2
+            event = event_queue.get()
+            data_output_queue.put(event)
+            sm.process_event(event.content)
+        # Priority 3: Check for elapsed timers.
+        elif check_timers:
+            level = 3
+            if monitoring:
+                n_loops = _monitor_tick(n_loops)
+            timer.check()
+        # Priority 4: Process timer event.
+        elif timer.elapsed:
+            level = 4
+            event = timer.get()
+            if event.type == EVENT_TYP:
+                if event.subtype:
+                    data_output_queue.put(event)
+                sm.process_event(event.content)
+            elif event.type == HARDW_TYP:
+                hw.IO_dict[event.content]._timer_callback()
+            elif event.type == STATE_TYP:
+                sm.goto_state(event.content)
+        # Priority 5: Check for serial input from computer.
+        elif usb_serial.any():
+            level = 5
+            receive_data()
+        # Priority 6: Stream analog data.
+        elif hw.stream_data_queue.available:
+            level = 6
+            hw.IO_dict[hw.stream_data_queue.get()].send_buffer()
+        # Priority 7: Output framework data.
+        elif data_output_queue.available:
+            level = 7
+            if batch_output:
+                output_data_batch()
+            else:
+                output_data(data_output_queue.get())
+        else:
+            level = 0
+            if idle_gc:
+                _idle_gc()
+        if profiling:
+            service_counts[level] += 1
+    # Post run
+    overflow_policies = (event_queue.overflow, data_output_queue.overflow)
+    event_queue.overflow = "grow"  # Outputs at end of run must not raise or be discarded.
+    data_output_queue.overflow = "grow"
+    try:
+        ut.print_variables(when="e")
+        for q, overflow in zip((event_queue, data_output_queue), overflow_policies):
+            if q.n_dropped and overflow == "warn":
+                data_output_queue.put(
+                    Datatuple(
+                        current_time, WARNG_TYP, "", q.name + " overflow, {} items were discarded.".format(q.n_dropped)
+                    )
+                )
+        if profiling:
+            data_output_queue.put(Datatuple(current_time, PROFL_TYP, "", _profile_report()))
+        data_output_queue.put(Datatuple(current_time, STOPF_TYP, "", ""))
+    finally:
+        usb_serial.setinterrupt(3)  # Enable 'ctrl+c' on serial raising KeyboardInterrupt.
+        clock.deinit()
+        hw.run_stop()
+        sm.stop()
+    while data_output_queue.available:
+        if batch_output:
+            output_data_batch()
+        else:
+            output_data(data_output_queue.get())
@@ -0,0 +1,16 @@
+# State and event handles, imported explicitly by task files that use them:
+#     from pyControl.handles import S, E
+#  States and events can be specified by name, e.g. goto_state("reward"), or by handle,
+#  e.g. goto_state(S.reward).  A handle is the state or event ID, which is looked up in the same
+#  dict as names, so names and handles are interchangeable and equally fast.  The handles are not
+#  exported by 'from pyControl.utility import *', so they do not replace names defined by the task.
+
+
+class _Handles:
+    # Namespace whose attributes are the IDs of the task's states or events, set when the state machine is set up.
+    pass
+
+
+S = _Handles()  # State handles, e.g. S.reward
+
+E = _Handles()  # Event handles, e.g. E.poke_in
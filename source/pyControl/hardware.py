@@ -48,6 +48,10 @@ available_timers = [3, 5, 7, 8, 9, 10, 11, 12, 13, 14]  # Hardware timers not in
 
 initialised = False  # Set to True once hardware has been intiialised.
 
+ANALOG_CHUNK_LATENCY = 100  # Default duration (ms) of analog data chunks.
+
+ANALOG_MAX_CHUNK_BYTES = 256  # Default maximum size (bytes) of analog data chunks.
+
 interrupt_queue = Ring_buffer()  # Queue for processing hardware interrupts.
 
 stream_data_queue = Ring_buffer()  # Queue for streaming data to computer.
@@ -93,14 +97,20 @@ def off():
 
 
 def get_analog_inputs():
-    # Print dict of analog input info.
-    print(
-        {
-            ai.ID: {"name": ai.name, "fs": ai.sampling_rate, "dtype": ai.data_type, "plot": ai.plot}
-            for ai in IO_dict.values()
-            if isinstance(ai, Analog_channel)
-        }
-    )
+    # Print dict of analog input info, the channel names of analog groups are included as "channels".
+    analog_inputs = {}
+    for ai in IO_dict.values():
+        if isinstance(ai, Analog_channel):
+            analog_inputs[ai.ID] = {"name": ai.name, "fs": ai.sampling_rate, "dtype": ai.data_type, "plot": ai.plot}
+            if ai.channels:
+                analog_inputs[ai.ID]["channels"] = ai.channels
+            if ai.envelope:  # Envelope stream, plotted instead of the full rate stream.
+                env_info = analog_inputs[ai.ID].copy()
+                env_info["fs"] = ai.envelope.sampling_rate
+                env_info["envelope_of"] = ai.ID
+                analog_inputs[ai.envelope.ID] = env_info
+                analog_inputs[ai.ID]["envelope"] = ai.envelope.ID
+    print(analog_inputs)
 
 
 # IO_object -------------------------------------------------------------------
@@ -230,22 +240,145 @@ class Digital_input(IO_object):
 # Analog data ----------------------------------------------------------------
 
 
+@micropython.viper
+def sum_samples(buffer, n_samples: int, bytes_per_sample: int, signed_bytes: int) -> int:
+    # Return the sum of the first n_samples samples of array buffer modulo 2**16, as used in analog
+    # data checksums.  Reads the samples as unsigned machine integers, which gives the same sum
+    # modulo 2**16 for 16 and 32 bit types, 8 bit signed samples are sign extended.  Faster than
+    # sum(buffer) as samples are not converted to Python integers.
+    total = 0
+    if bytes_per_sample == 1:
+        p8 = ptr8(buffer)
+        for i in range(n_samples):
+            x = p8[i]
+            if signed_bytes and x > 127:
+                x -= 256
+            total += x
+    elif bytes_per_sample == 2:
+        p16 = ptr16(buffer)
+        for i in range(n_samples):
+            total += p16[i]
+    else:
+        p32 = ptr32(buffer)
+        for i in range(n_samples):
+            total += p32[i]
+    return total & 0xFFFF
+
+
+@micropython.viper
+def envelope_bins(chunk, state, envelope, bin_sums) -> int:
+    # Add frames of array chunk to the current bins of an Analog_envelope, returns the number of
+    # bins completed.  state is an array("i") holding bin_size, n_channels, bytes_per_sample,
+    # sign_bit, frames in current bin and frames in chunk, followed by the min, max and sum of
+    # each channel's current bin.  For each completed bin the min and max of each channel are
+    # written to array envelope and the sum to array bin_sums.  Samples are read as unsigned
+    # machine integers with the sign bit of signed types flipped, which preserves their order
+    # and keeps sums non-negative, so sums are offset by sign_bit per sample.  Each channel is
+    # processed in turn so its bin values are held in local variables.
+    s = ptr32(state)
+    bin_size = s[0]
+    n_channels = s[1]
+    bytes_per_sample = s[2]
+    sign_bit = s[3]
+    n_frames = s[5]
+    p8 = ptr8(chunk)
+    p16 = ptr16(chunk)
+    e8 = ptr8(envelope)
+    e16 = ptr16(envelope)
+    sums = ptr32(bin_sums)
+    bin_count = 0
+    n_bins = 0
+    for c in range(n_channels):
+        bin_count = s[4]
+        n_bins = 0
+        lo = s[6 + 3 * c]
+        hi = s[7 + 3 * c]
+        total = s[8 + 3 * c]
+        i = c  # Chunk buffer index.
+        k = c  # Bin sums index.
+        for f in range(n_frames):
+            if bytes_per_sample == 1:
+                x = p8[i] ^ sign_bit
+            else:
+                x = p16[i] ^ sign_bit
+            i += n_channels
+            if bin_count == 0:
+                lo = x
+                hi = x
+                total = x
+            else:
+                if x < lo:
+                    lo = x
+                elif x > hi:
+                    hi = x
+                total += x
+            bin_count += 1
+            if bin_count == bin_size:  # Bin complete.
+                if bytes_per_sample == 1:
+                    e8[3 * k] = lo ^ sign_bit
+                    e8[3 * k + 1] = hi ^ sign_bit
+                else:
+                    e16[3 * k] = lo ^ sign_bit
+                    e16[3 * k + 1] = hi ^ sign_bit
+                sums[k] = total
+                k += n_channels
+                n_bins += 1
+                bin_count = 0
+        s[6 + 3 * c] = lo
+        s[7 + 3 * c] = hi
+        s[8 + 3 * c] = total
+    s[4] = bin_count
+    return n_bins
+
+
 class Analog_input(IO_object):
     # Analog_input samples analog voltage from specified pin at specified frequency and
     # streams data to computer. Optionally can generate framework events when voltage
-    #  goes above / below specified value theshold.
-
-    def __init__(self, pin, name, sampling_rate, threshold=None, rising_event=None, falling_event=None, data_type="H"):
+    #  goes above / below specified value theshold.  If block_threshold is True, threshold
+    # crossings are found by checking each chunk of samples in the main loop before it is
+    # sent, rather than checking each sample in the sampling interrupt.  This reduces the
+    # time spent in the interrupt, but events are generated up to a chunk duration later,
+    # with timestamps of the samples at which the crossings occurred, and a noisy chunk with
+    # more crossings than fit in the event queue generates only its net crossing, see
+    # Analog_threshold.check_block.  If envelope_rate is
+    # specified a low rate envelope stream is also sent for plotting, see Analog_envelope.
+
+    def __init__(
+        self,
+        pin,
+        name,
+        sampling_rate,
+        threshold=None,
+        rising_event=None,
+        falling_event=None,
+        data_type="H",
+        chunk_latency=None,
+        max_chunk_bytes=None,
+        n_buffers=2,
+        block_threshold=False,
+        envelope_rate=None,
+    ):
         if rising_event or falling_event:
             self.threshold = Analog_threshold(threshold, rising_event, falling_event)
         else:
             self.threshold = False
+        self.ISR_threshold = False if block_threshold else self.threshold  # Threshold checked in interrupt.
         self.timer = pyb.Timer(available_timers.pop())
         if pin:  # pin argument can be None when Analog_input subclassed.
             self.ADC = pyb.ADC(pin)
             self.read_sample = self.ADC.read
         self.name = name
-        self.Analog_channel = Analog_channel(name, sampling_rate, data_type)
+        self.Analog_channel = Analog_channel(
+            name,
+            sampling_rate,
+            data_type,
+            chunk_latency=chunk_latency,
+            max_chunk_bytes=max_chunk_bytes,
+            n_buffers=n_buffers,
+            envelope_rate=envelope_rate,
+        )
+        if block_threshold:
+            self.Analog_channel.block_threshold = self.threshold
         assign_ID(self)
 
     def _run_start(self):
@@ -264,8 +397,8 @@ class Analog_input(IO_object):
         # Read a sample to the buffer, update write index.
         sample = self.read_sample()
         self.Analog_channel.put(sample)
-        if self.threshold:
-            self.threshold.check(sample)
+        if self.ISR_threshold:
+            self.ISR_threshold.check(sample)
 
     def record(self):  # For backward compatibility.
         pass
@@ -274,8 +407,68 @@ class Analog_input(IO_object):
         pass
 
 
+class Analog_group(IO_object):
+    # Analog_group samples analog voltage from several pins on a single timer and streams
+    # the samples to computer interleaved in one data stream, [pin_1, pin_2, ..., pin_1, ...],
+    # which is separated into channels named by the names argument on the computer.  Uses
+    # one hardware timer and one message header per chunk for all the pins.
+
+    def __init__(
+        self,
+        pins,
+        names,
+        sampling_rate,
+        name=None,
+        data_type="H",
+        chunk_latency=None,
+        max_chunk_bytes=None,
+        n_buffers=2,
+        envelope_rate=None,
+    ):
+        assert len(pins) == len(names), "pins and names must be the same length."
+        self.timer = pyb.Timer(available_timers.pop())
+        self.ADCs = tuple(pyb.ADC(pin) for pin in pins)
+        self.name = name if name else "_".join(names)
+        self.Analog_channel = Analog_channel(
+            self.name,
+            sampling_rate,
+            data_type,
+            chunk_latency=chunk_latency,
+            max_chunk_bytes=max_chunk_bytes,
+            n_buffers=n_buffers,
+            channels=list(names),
+            envelope_rate=envelope_rate,
+        )
+        assign_ID(self)
+
+    def _run_start(self):
+        # Start sampling timer, aquire first samples.
+        self.timer.init(freq=self.Analog_channel.sampling_rate)
+        self.timer.callback(self._timer_ISR)
+        self._timer_ISR(0)
+
+    def _run_stop(self):
+        self.timer.deinit()
+
+    @micropython.native
+    def _timer_ISR(self, t):
+        # Read a sample from each pin to the buffer.
+        for ADC in self.ADCs:
+            self.Analog_channel.put(ADC.read())
+
+
 class Analog_channel(IO_object):
     # Buffers analog data and streams it to computer in chunks.
+    # If channel names are specified, samples from the channels are put in turn and
+    # each chunk holds the same number of samples from every channel.
+    # Each chunk holds sampling_rate * chunk_latency / 1000 samples, up to max_chunk_bytes,
+    # and at least 4 samples.  Longer chunks reduce the header overhead per sample, shorter
+    # chunks the delay before data reaches the computer.  Samples are written to a ring of
+    # n_buffers chunk buffers, full buffers wait to be sent while the next is written, so
+    # more buffers absorb longer delays in sending.  If all buffers are full the chunk being
+    # written is discarded, overruns counts discarded chunks and is output as a warning when
+    # it reaches 1, 2, 4, 8... chunks.  If envelope_rate is specified, an Analog_envelope
+    # summarising the samples at envelope_rate bins per second is updated as each chunk is sent.
     # Data format is 13 byte header + data array:
     #     \x07 Message start byte (1 bytes)
     #     message checksum (2 bytes)
@@ -285,29 +478,72 @@ class Analog_channel(IO_object):
     #     ID of analog input (2 byte)
     #     data array bytes (variable)
 
-    def __init__(self, name, sampling_rate, data_type, plot=True):
+    def __init__(
+        self,
+        name,
+        sampling_rate,
+        data_type,
+        plot=True,
+        chunk_latency=None,
+        max_chunk_bytes=None,
+        n_buffers=2,
+        channels=None,
+        envelope_rate=None,
+    ):
+        global stream_data_queue
         assert data_type in ("b", "B", "h", "H", "i", "I"), "Invalid data_type."
+        assert n_buffers >= 2, "n_buffers must be at least 2."
+        used_names = []
+        for io in IO_dict.values():
+            if isinstance(io, Analog_channel):
+                used_names += io.channels if io.channels else [io.name]
         assert not any(
-            [name == io.name for io in IO_dict.values() if isinstance(io, Analog_channel)]
+            [n in used_names for n in (channels if channels else [name])]
         ), "Analog signals must have unique names."
         self.name = name
+        self.channels = channels
         assign_ID(self)
         self.sampling_rate = sampling_rate
         self.data_type = data_type
         self.plot = plot
         self.bytes_per_sample = {"b": 1, "B": 1, "h": 2, "H": 2, "i": 4, "I": 4}[data_type]
-        self.buffer_size = max(4, min(256 // self.bytes_per_sample, sampling_rate // 10))
-        self.buffers = (array(data_type, [0] * self.buffer_size), array(data_type, [0] * self.buffer_size))
-        self.buffers_mv = (memoryview(self.buffers[0]), memoryview(self.buffers[1]))
-        self.buffer_start_times = array("i", [0, 0])
-        self.data_header = array("B", b"\x07" + b"_" * 8 + b"A_" + self.ID.to_bytes(2, "little"))
+        self.signed_bytes = data_type == "b"
+        if chunk_latency is None:
+            chunk_latency = ANALOG_CHUNK_LATENCY
+        if max_chunk_bytes is None:
+            max_chunk_bytes = ANALOG_MAX_CHUNK_BYTES
+        n_channels = len(channels) if channels else 1
+        n_frames = max(
+            4, min(max_chunk_bytes // (self.bytes_per_sample * n_channels), sampling_rate * chunk_latency // 1000)
+        )
+        self.buffer_size = n_frames * n_channels
+        self.n_buffers = n_buffers
+        self.buffers = tuple(array(data_type, [0] * self.buffer_size) for i in range(n_buffers))
+        self.buffers_mv = tuple(memoryview(buffer) for buffer in self.buffers)
+        self.buffer_start_times = array("i", [0] * n_buffers)
+        self.data_header = bytearray(b"\x07" + b"_" * 8 + b"A_" + self.ID.to_bytes(2, "little"))
         self.write_buffer = 0  # Buffer to write new data to.
         self.write_index = 0  # Buffer index to write new data to.
+        self.read_buffer = 0  # Oldest full buffer waiting to be sent, equal to write_buffer if none.
+        self.overruns = 0  # Chunks discarded because all buffers were full.
+        self.overrun_warning = 1  # Overruns at which next warning is output.
+        self.block_threshold = False  # Analog_threshold checked for each full buffer before it is sent.
+        # Each full buffer waiting to be sent has an entry in stream_data_queue.
+        n_pending = sum([ac.n_buffers - 1 for ac in IO_dict.values() if isinstance(ac, Analog_channel)])
+        if n_pending >= stream_data_queue.buffer_length:
+            stream_data_queue = Ring_buffer(n_pending + 1)
+        self.envelope = Analog_envelope(self, envelope_rate, n_frames) if envelope_rate else False
 
     def _run_start(self):
-        self.write_index = 0  # Buffer index to write new data to.
+        self.write_buffer = 0
+        self.write_index = 0
+        self.read_buffer = 0
+        self.overruns = 0
+        self.overrun_warning = 1
 
     def _run_stop(self):
+        while self.read_buffer != self.write_buffer:
+            self.send_buffer()
         if self.write_index != 0:
             self.send_buffer(run_stop=True)
 
@@ -318,9 +554,13 @@ class Analog_channel(IO_object):
             self.buffer_start_times[self.write_buffer] = fw.current_time
         self.buffers[self.write_buffer][self.write_index] = sample
         self.write_index = (self.write_index + 1) % self.buffer_size
-        if self.write_index == 0:  # Buffer full, switch buffers.
-            self.write_buffer = 1 - self.write_buffer
-            stream_data_queue.put(self.ID)
+        if self.write_index == 0:  # Buffer full, switch to next buffer if it is not waiting to be sent.
+            next_buffer = (self.write_buffer + 1) % self.n_buffers
+            if next_buffer == self.read_buffer:  # All buffers full, discard chunk.
+                self.overruns += 1
+            else:
+                self.write_buffer = next_buffer
+                stream_data_queue.put(self.ID)
 
     @micropython.native
     def send_buffer(self, run_stop=False):
@@ -328,20 +568,103 @@ class Analog_channel(IO_object):
         if run_stop:  # Send the contents of the current write buffer.
             buffer_n = self.write_buffer
             n_samples = self.write_index
-        else:  # Send the buffer not currently being written to.
-            buffer_n = 1 - self.write_buffer
+        else:  # Send the oldest full buffer.
+            buffer_n = self.read_buffer
             n_samples = self.buffer_size
+            if self.block_threshold:
+                self.block_threshold.check_block(
+                    self.buffers[buffer_n], self.buffer_start_times[buffer_n], self.sampling_rate
+                )
         message_len = 8 + self.bytes_per_sample * n_samples
         self.data_header[3:5] = message_len.to_bytes(2, "little")
         self.data_header[5:9] = self.buffer_start_times[buffer_n].to_bytes(4, "little")
         checksum = sum(self.data_header[5:])
-        checksum += sum(self.buffers_mv[buffer_n][:n_samples] if run_stop else self.buffers[buffer_n])
+        if fw.viper_checksums:
+            checksum += sum_samples(self.buffers[buffer_n], n_samples, self.bytes_per_sample, self.signed_bytes)
+        else:
+            checksum += sum(self.buffers_mv[buffer_n][:n_samples] if run_stop else self.buffers[buffer_n])
         self.data_header[1:3] = (checksum & 0xFFFF).to_bytes(2, "little")
         fw.usb_serial.write(self.data_header)
         if run_stop:
             fw.usb_serial.send(self.buffers_mv[buffer_n][:n_samples])
         else:
             fw.usb_serial.send(self.buffers[buffer_n])
+        if self.envelope:
+            self.envelope.update(self.buffers[buffer_n], n_samples, self.buffer_start_times[buffer_n])
+        if not run_stop:
+            self.read_buffer = (buffer_n + 1) % self.n_buffers
+            if self.overruns >= self.overrun_warning:
+                self.overrun_warning = 2 * self.overruns
+                warning("{} has discarded {} data chunks as all buffers were full.".format(self.name, self.overruns))
+
+
+class Analog_envelope(IO_object):
+    # Summarises the samples of an Analog_channel in bins of sampling_rate // envelope_rate
+    # samples, and streams the minimum, maximum and mean of each bin to computer for plotting,
+    # so the computer does not have to plot every sample.  Bins are computed in the main loop
+    # by envelope_bins as the channel's chunks are sent, and the completed bins are sent after
+    # each chunk in a message with the same format as the channel's, with the envelope's ID and
+    # timestamp of first bin start.  The data array holds [min, max, mean] for each channel in
+    # turn for each bin.  Bins may span several chunks, chunks discarded due to overruns are skipped.
+
+    def __init__(self, analog_channel, envelope_rate, n_frames):
+        assert analog_channel.data_type in ("b", "B", "h", "H"), "Envelope requires 8 or 16 bit data_type."
+        assert 0 < envelope_rate <= analog_channel.sampling_rate, "envelope_rate must be between 0 and sampling_rate."
+        self.name = analog_channel.name
+        assign_ID(self)
+        self.n_channels = len(analog_channel.channels) if analog_channel.channels else 1
+        self.bin_size = analog_channel.sampling_rate // envelope_rate  # Frames per bin.
+        self.sampling_rate = analog_channel.sampling_rate / self.bin_size  # Bins per second.
+        self.channel_rate = analog_channel.sampling_rate
+        self.bytes_per_sample = analog_channel.bytes_per_sample
+        self.signed_bytes = analog_channel.signed_bytes
+        self.sign_bit = {"b": 0x80, "h": 0x8000}.get(analog_channel.data_type, 0)
+        n_bins = n_frames // self.bin_size + 1  # Bins in largest message.
+        self.buffer = array(analog_channel.data_type, [0] * 3 * self.n_channels * n_bins)
+        self.buffer_mv = memoryview(self.buffer)
+        self.bin_sums = array("i", [0] * self.n_channels * n_bins)
+        # envelope_bins state: bin_size, n_channels, bytes_per_sample, sign_bit, frames in current bin,
+        # frames in chunk, then min, max and sum of each channel's current bin.
+        self.bin_state = array("i", [self.bin_size, self.n_channels, self.bytes_per_sample, self.sign_bit, 0, 0])
+        self.bin_state.extend(array("i", [0] * 3 * self.n_channels))
+        self.data_header = bytearray(b"\x07" + b"_" * 8 + b"A_" + self.ID.to_bytes(2, "little"))
+        self.bin_start_time = 0  # Timestamp of current bin start.
+
+    def _run_start(self):
+        self.bin_state[4] = 0
+
+    @micropython.native
+    def update(self, buffer, n_samples: int, start_time: int):
+        # Add a chunk of samples starting at start_time to the current bins, send completed bins.
+        state = self.bin_state
+        if state[4] == 0:
+            self.bin_start_time = start_time
+        message_time = self.bin_start_time
+        n_frames = n_samples // self.n_channels
+        state[5] = n_frames
+        n_bins = envelope_bins(buffer, state, self.buffer, self.bin_sums)
+        if not n_bins:
+            return
+        # Means are computed from the bin sums, removing the sign_bit offset.
+        envelope, bin_sums, bin_size, sign_bit = self.buffer, self.bin_sums, self.bin_size, self.sign_bit
+        for k in range(n_bins * self.n_channels):
+            envelope[3 * k + 2] = bin_sums[k] // bin_size - sign_bit
+        self.bin_start_time = start_time + (n_frames - state[4]) * 1000 // self.channel_rate
+        self._send(3 * self.n_channels * n_bins, message_time)
+
+    def _send(self, n_values, timestamp):
+        # Send first n_values of envelope buffer to host computer.
+        message_len = 8 + self.bytes_per_sample * n_values
+        self.data_header[3:5] = message_len.to_bytes(2, "little")
+        self.data_header[5:9] = timestamp.to_bytes(4, "little")
+        checksum = sum(self.data_header[5:])
+        if fw.viper_checksums:
+            checksum += sum_samples(self.buffer, n_values, self.bytes_per_sample, self.signed_bytes)
+        else:
+            checksum += sum(self.buffer_mv[:n_values])
+        self.data_header[1:3] = (checksum & 0xFFFF).to_bytes(2, "little")
+        fw.usb_serial.write(self.data_header)
+        fw.usb_serial.send(self.buffer_mv[:n_values])
 
 
 class Analog_threshold(IO_object):
@@ -366,6 +689,8 @@ class Analog_threshold(IO_object):
 
     def run_start(self, sample):
         self.above_threshold = sample > self.threshold
+        self.discarded = 0  # Crossings discarded by check_block as they did not fit in the event queue.
+        self.discarded_warning = 1  # Discarded crossings at which next warning is output.
 
     def _process_interrupt(self):
         # Put event generated by threshold crossing in event queue.
@@ -384,6 +709,47 @@ class Analog_threshold(IO_object):
                 self.crossing_direction = self.above_threshold
                 interrupt_queue.put(self.ID)
 
+    @micropython.native
+    def check_block(self, buffer, start_time: int, sampling_rate: int):
+        # Check a buffer of samples for threshold crossings, putting an event in the event queue for
+        # each crossing, timestamped with the time of the sample at which the crossing occured.  If
+        # the crossings would fill more than half the free space in the event queue, only the net
+        # crossing is output, timestamped with the last crossing, and the others are discarded, so a
+        # noisy signal does not overflow the queue.  Discarded crossings are output as a warning when
+        # their count reaches 1, 2, 4, 8...
+        threshold = self.threshold
+        above_threshold = self.above_threshold
+        n_crossings = 0
+        last_crossing = 0
+        for i in range(len(buffer)):
+            if (buffer[i] > threshold) != above_threshold:  # Threshold crossing.
+                above_threshold = not above_threshold
+                n_crossings += 1
+                last_crossing = i
+        if not n_crossings:
+            return
+        if n_crossings <= (fw.event_queue.capacity - fw.event_queue.n_items) // 2:
+            above_threshold = self.above_threshold
+            for i in range(len(buffer)):
+                if (buffer[i] > threshold) != above_threshold:  # Threshold crossing.
+                    above_threshold = not above_threshold
+                    self._put_event(above_threshold, start_time + i * 1000 // sampling_rate)
+        else:  # Too many crossings to queue, output net crossing only.
+            net_crossing = above_threshold != self.above_threshold
+            if net_crossing:
+                self._put_event(above_threshold, start_time + last_crossing * 1000 // sampling_rate)
+            self.discarded += n_crossings - net_crossing
+            if self.discarded >= self.discarded_warning:
+                self.discarded_warning = 2 * self.discarded
+                warning("Analog threshold has discarded {} crossings of noisy signal.".format(self.discarded))
+        self.above_threshold = above_threshold
+
+    def _put_event(self, above_threshold, timestamp):
+        # Put rising or falling event in the event queue, if event ID assigned.
+        event_ID = self.rising_event_ID if above_threshold else self.falling_event_ID
+        if event_ID:
+            fw.event_queue.put(fw.Datatuple(timestamp, fw.EVENT_TYP, "i", event_ID))
+
 
 # Digital Output --------------------------------------------------------------
 
@@ -1,4 +1,5 @@
 from . import utility
+from . import handles
 from . import timer
 from . import framework as fw
 
@@ -12,13 +13,31 @@ events = {}  # Dictionary of {event_name: event_ID}
 
 ID2name = {}  # Dictionary of {ID: state_or_event_name}
 
+state_IDs = {}  # Dictionary of {state_name_or_ID: state_ID}, used to get the ID of a state given its name or ID.
+
+event_IDs = {}  # Dictionary of {event_name_or_ID: event_ID}, used to get the ID of an event given its name or ID.
+
 transition_in_progress = False  # Set to True during state transitions.
 
 variables = None  # User task variables object.
 
 event_dispatch_dict = {}  # {state_name: state behaviour function}
 
-current_state = None
+behaviour_functions = False  # True if task defines all_states or any state behaviour functions.
+
+state_functions = {}  # {state_ID: state behaviour function}
+
+all_states_function = None  # all_states behaviour function.
+
+dispatch_tables = {}  # {state_ID: {event_name_or_ID: handler}} compiled from handlers registered with @on.
+
+current_state = None  # Name of current state.
+
+current_state_ID = None
+
+state_function = None  # Behaviour function of current state.
+
+state_handlers = {}  # Dispatch table of current state.
 
 # State machine functions.
 
@@ -26,6 +45,7 @@ current_state = None
 def setup_state_machine(task_file):
     # Initialise the state machine using an imported task definition file.
     global user_task_file, variables, transition_in_progress, states, events, ID2name, event_dispatch_dict
+    global state_IDs, event_IDs, behaviour_functions, state_functions, all_states_function, dispatch_tables
 
     user_task_file = task_file
     variables = utility.v
@@ -38,53 +58,110 @@ def setup_state_machine(task_file):
     }
 
     ID2name = {ID: name for name, ID in list(states.items()) + list(events.items())}
+    state_IDs = {ID: ID for ID in states.values()}
+    state_IDs.update(states)
+    event_IDs = {ID: ID for ID in events.values()}
+    event_IDs.update(events)
+
+    # Set attributes of state and event handles used by task files to refer to states and events by ID.
+    for name, ID in states.items():
+        setattr(handles.S, name, ID)
+    for name, ID in events.items():
+        setattr(handles.E, name, ID)
 
     # Make dict mapping state names to state behaviour functions.
     user_task_file_methods = dir(user_task_file)
+
+    # Set event and data output queue capacities and overflow policy if specified in task file.
+    for setting in ("event_queue_capacity", "output_queue_capacity", "queue_overflow"):
+        if setting in user_task_file_methods:
+            setattr(fw, setting, getattr(user_task_file, setting))
     for state in list(user_task_file.states) + ["all_states", "run_start", "run_end"]:
         if state in user_task_file_methods:
             event_dispatch_dict[state] = getattr(user_task_file, state)
         else:
             event_dispatch_dict[state] = None
+    state_functions = {ID: event_dispatch_dict[name] for name, ID in states.items()}
+    all_states_function = event_dispatch_dict["all_states"]
+    behaviour_functions = bool(all_states_function) or any(state_functions.values())
+
+    # Compile handlers registered with @on into a dispatch table for each state, indexed by both
+    # event name and ID so events need not be converted from ID to name before lookup.
+    registered = {state: {} for state in list(states) + ["all_states"]}  # {state_name: {event_name: handler}}
+    for state, event, handler in utility._handlers:
+        if state not in registered:
+            raise fw.pyControlError("Invalid state name passed to @on: " + repr(state))
+        if not (event in events or event in ("entry", "exit")):
+            raise fw.pyControlError("Invalid event name passed to @on: " + repr(event))
+        registered[state][event] = handler
+    dispatch_tables = {}
+    for state, state_ID in states.items():
+        dispatch_tables[state_ID] = {}
+        for event in list(events) + ["entry", "exit"]:
+            handler = _chain(registered["all_states"].get(event), registered[state].get(event))
+            if handler:
+                dispatch_tables[state_ID][event] = handler
+                if event in events:
+                    dispatch_tables[state_ID][events[event]] = handler
+
+
+def _chain(all_states_handler, state_handler):
+    # Return function calling all_states_handler then, unless it returns True, state_handler.
+    if not (all_states_handler and state_handler):
+        return all_states_handler or state_handler
+    return lambda: all_states_handler() or state_handler()
 
 
 def goto_state(next_state):
-    # Transition to next state, calling exit action of old state and entry action of next state.
-    global transition_in_progress, current_state
-    if isinstance(next_state, int):  # ID passed in not name.
-        next_state = ID2name[next_state]
+    # Transition to next state, given its name or ID, calling exit action of old state and entry action of next state.
+    global transition_in_progress
     if transition_in_progress:
         raise fw.pyControlError("goto_state cannot not be called while processing 'entry' or 'exit' events.")
-    if next_state not in states.keys():
+    next_state_ID = state_IDs.get(next_state)
+    if not next_state_ID:
         raise fw.pyControlError("Invalid state name passed to goto_state: " + repr(next_state))
     transition_in_progress = True
     process_event("exit")
     timer.disarm_type(fw.STATE_TYP)  # Clear any timed_goto_states
-    fw.data_output_queue.put(fw.Datatuple(fw.current_time, fw.STATE_TYP, "", states[next_state]))
-    current_state = next_state
+    fw.data_output_queue.put(fw.Datatuple(fw.current_time, fw.STATE_TYP, "", next_state_ID))
+    _set_current_state(next_state_ID)
     process_event("entry")
     transition_in_progress = False
 
 
+def _set_current_state(state_ID):
+    # Make the state with the specified ID the current state.
+    global current_state, current_state_ID, state_function, state_handlers
+    current_state = ID2name[state_ID]
+    current_state_ID = state_ID
+    state_function = state_functions[state_ID]
+    state_handlers = dispatch_tables[state_ID]
+
+
 def process_event(event):
-    # Process event given event name by calling appropriate state event handler function.
-    if isinstance(event, int):  # ID passed in not name.
+    # Process event given event name or ID by calling the current state's @on handler for the event,
+    # then the all_states and state behaviour functions if the task defines them.
+    handler = state_handlers.get(event)
+    if handler and handler():  # Handler returned True, don't evaluate state behaviour functions.
+        return
+    if not behaviour_functions:
+        return
+    if isinstance(event, int):  # ID passed in not name, behaviour functions are called with event name.
         event = ID2name[event]
-    if event_dispatch_dict["all_states"]:  # If machine has all_states event handler function.
-        handled = event_dispatch_dict["all_states"](event)  # Evaluate all_states event handler function.
+    if all_states_function:  # If machine has all_states event handler function.
+        handled = all_states_function(event)  # Evaluate all_states event handler function.
         if handled:  # If all_states event handler returns True, don't evaluate state specific behaviour.
             return
-    if event_dispatch_dict[current_state]:  # If state machine has event handler function for current state.
-        event_dispatch_dict[current_state](event)  # Evaluate state event handler function.
+    if state_function:  # If state machine has event handler function for current state.
+        state_function(event)  # Evaluate state event handler function.
 
 
 def start():
-    global current_state
     # Called when run is started. Puts agent in initial state, and runs entry event.
     if event_dispatch_dict["run_start"]:
         event_dispatch_dict["run_start"]()
-    current_state = user_task_file.initial_state
-    fw.data_output_queue.put(fw.Datatuple(fw.current_time, fw.STATE_TYP, "", states[current_state]))
+    _set_current_state(states[user_task_file.initial_state])
+    fw.data_output_queue.put(fw.Datatuple(fw.current_time, fw.STATE_TYP, "", current_state_ID))
     process_event("entry")
 
 
@@ -1,10 +1,26 @@
 from . import framework as fw
 
+try:
+    import heapq
+except ImportError:  # Older micropython versions.
+    import uheapq as heapq
+
 # Timer variables
 
-active_timers = []  # list of event tuples: (trigger_time, event_type, data)
+# Active timers are stored in a binary heap ordered by trigger time.  Each heap entry is a
+# list: [trigger_time, event_type, subtype, content, active].  Cancelled timers have active
+# set to False and are discarded when they reach the top of the heap, so the top entry is
+# always an active timer.
+
+active_timers = []  # Heap of timer entries.
+
+event_timers = {}  # {event_ID: [entry, ...]} index of active user event timers.
+
+state_timers = []  # List of active timed_goto_state timer entries.
+
+paused_timers = {}  # {event_ID: [(remaining_time, event_type, subtype, content), ...]}
 
-paused_timers = []  # list of event tuples: (trigger_time, event_type, data)
+n_cancelled = 0  # Number of cancelled entries still in active_timers heap.
 
 elapsed = False  # Whether any timers have elapsed and need processing.
 
@@ -13,72 +29,124 @@ elapsed = False  # Whether any timers have elapsed and need processing.
 
 def reset():
     # Reset timer variables.
-    global active_timers, paused_timers, elapsed
+    global active_timers, event_timers, state_timers, paused_timers, n_cancelled, elapsed
     active_timers = []
-    paused_timers = []
+    event_timers = {}
+    state_timers = []
+    paused_timers = {}
+    n_cancelled = 0
     elapsed = False
 
 
 def set(interval, event_type, subtype, content):
     # Set a timer to trigger specified event after 'interval' ms has elapsed.
-    active_timers.append(fw.Datatuple(fw.current_time + int(interval), event_type, subtype, content))
-    active_timers.sort(reverse=True)
+    _push([fw.current_time + int(interval), event_type, subtype, content, True])
 
 
 def check():
     # Check whether timers have triggered.
     global elapsed
-    elapsed = bool(active_timers) and (active_timers[-1][0] <= fw.current_time)
+    elapsed = bool(active_timers) and (active_timers[0][0] <= fw.current_time)
     fw.check_timers = False
 
 
 def get():
     # Get first timer event.
     global elapsed
-    event_tuple = active_timers.pop()
-    elapsed = bool(active_timers) and (active_timers[-1][0] <= fw.current_time)
-    return event_tuple
+    entry = heapq.heappop(active_timers)
+    entry[4] = False
+    if entry[1] == fw.EVENT_TYP:
+        _remove_entry(event_timers[entry[3]], entry)
+        if not event_timers[entry[3]]:
+            del event_timers[entry[3]]
+    elif entry[1] == fw.STATE_TYP:
+        _remove_entry(state_timers, entry)
+    _discard_cancelled()
+    elapsed = bool(active_timers) and (active_timers[0][0] <= fw.current_time)
+    return fw.Datatuple(entry[0], entry[1], entry[2], entry[3])
 
 
 def disarm(event_ID):
     # Remove all user timers with specified event_ID.
-    global active_timers, paused_timers
-    active_timers = [t for t in active_timers if not (t.content == event_ID and t.type == fw.EVENT_TYP)]
-    paused_timers = [t for t in paused_timers if not t.content == event_ID]
+    _cancel(event_timers.pop(event_ID, ()))
+    paused_timers.pop(event_ID, None)
 
 
 def pause(event_ID):
     # Pause all user timers with specified event_ID.
-    global active_timers, paused_timers
-    paused_timers += [
-        fw.Datatuple(t.time - fw.current_time, *t[1:])
-        for t in active_timers
-        if (t.content == event_ID and t.type == fw.EVENT_TYP)
-    ]
-    active_timers = [t for t in active_timers if not (t.content == event_ID and t.type == fw.EVENT_TYP)]
+    entries = event_timers.pop(event_ID, ())
+    if entries:
+        paused = paused_timers.setdefault(event_ID, [])
+        for entry in entries:
+            paused.append((entry[0] - fw.current_time, entry[1], entry[2], entry[3]))
+        _cancel(entries)
 
 
 def unpause(event_ID):
     # Unpause user timers with specified event.
-    global active_timers, paused_timers
-    active_timers += [fw.Datatuple(t.time + fw.current_time, *t[1:]) for t in paused_timers if t.content == event_ID]
-    paused_timers = [t for t in paused_timers if not t.content == event_ID]
-    active_timers.sort(reverse=True)
+    for t in paused_timers.pop(event_ID, ()):
+        _push([t[0] + fw.current_time, t[1], t[2], t[3], True])
 
 
 def remaining(event_ID):
     # Return time until timer for specified event elapses, returns 0 if no timer set for event.
-    try:
-        return next(
-            t.time - fw.current_time
-            for t in reversed(active_timers)
-            if (t.type == fw.EVENT_TYP and t.content == event_ID)
-        )
-    except StopIteration:
+    entries = event_timers.get(event_ID)
+    if not entries:
         return 0
+    return min(entry[0] for entry in entries) - fw.current_time
 
 
 def disarm_type(event_type):
     # Disarm all active timers of a particular type.
-    global active_timers
-    active_timers = [t for t in active_timers if not t.type == event_type]
+    global state_timers
+    if event_type == fw.STATE_TYP:
+        _cancel(state_timers)
+        state_timers = []
+    else:
+        _cancel([entry for entry in active_timers if entry[4] and entry[1] == event_type])
+
+
+# Heap maintenance.
+
+
+def _push(entry):
+    # Add entry to heap and to the index for its type.
+    heapq.heappush(active_timers, entry)
+    if entry[1] == fw.EVENT_TYP:
+        if entry[3] in event_timers:
+            event_timers[entry[3]].append(entry)
+        else:
+            event_timers[entry[3]] = [entry]
+    elif entry[1] == fw.STATE_TYP:
+        state_timers.append(entry)
+
+
+def _cancel(entries):
+    # Mark entries as cancelled, rebuild the heap if it is mostly cancelled entries.
+    global active_timers, n_cancelled, elapsed
+    for entry in entries:
+        entry[4] = False
+        n_cancelled += 1
+    if n_cancelled > 16 and n_cancelled > len(active_timers) // 2:
+        active_timers = [entry for entry in active_timers if entry[4]]
+        heapq.heapify(active_timers)
+        n_cancelled = 0
+    else:
+        _discard_cancelled()
+    elapsed = bool(active_timers) and (active_timers[0][0] <= fw.current_time)
+
+
+def _discard_cancelled():
+    # Pop cancelled entries from the top of the heap.
+    global n_cancelled
+    while active_timers and not active_timers[0][4]:
+        heapq.heappop(active_timers)
+        n_cancelled -= 1
+
+
+def _remove_entry(entries, entry):
+    # Remove entry from list by identity, equal valued entries may be different timers.
+    for i in range(len(entries)):
+        if entries[i] is entry:
+            del entries[i]
+            return
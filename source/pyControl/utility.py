@@ -11,6 +11,8 @@ from . import framework as fw
 from . import state_machine as sm
 
 # State machine functions -----------------------------------------------------
+#  States and events can be specified by name, e.g. goto_state("reward"), or by the handles
+#  in pyControl.handles, e.g. goto_state(S.reward).
 
 
 def goto_state(next_state):
@@ -20,39 +22,57 @@ def goto_state(next_state):
 def timed_goto_state(next_state, interval):
     # Transition to next_state after interval milliseconds. timed_goto_state()
     # is cancelled if goto_state() occurs before interval elapses.
-    timer.set(interval, fw.STATE_TYP, "", sm.states[next_state])
+    timer.set(interval, fw.STATE_TYP, "", sm.state_IDs[next_state])
 
 
 def set_timer(event, interval, output_event=True):
     # Set a timer to return specified event after interval milliseconds.
-    timer.set(interval, fw.EVENT_TYP, "t" if output_event else "", sm.events[event])
+    timer.set(interval, fw.EVENT_TYP, "t" if output_event else "", sm.event_IDs[event])
 
 
 def disarm_timer(event):
     # Disable all timers due to return specified event.
-    timer.disarm(sm.events[event])
+    timer.disarm(sm.event_IDs[event])
 
 
 def reset_timer(event, interval, output_event=True):
     # Disarm all timers due to return specified event and set new timer
     # to return specified event after interval milliseconds.
-    timer.disarm(sm.events[event])
-    timer.set(interval, fw.EVENT_TYP, "t" if output_event else "", sm.events[event])
+    timer.disarm(sm.event_IDs[event])
+    timer.set(interval, fw.EVENT_TYP, "t" if output_event else "", sm.event_IDs[event])
 
 
 def pause_timer(event):
     # Pause all timers due to return specified event.
-    timer.pause(sm.events[event])
+    timer.pause(sm.event_IDs[event])
 
 
 def unpause_timer(event):
     # Unpause all timers due to return specified event.
-    timer.unpause(sm.events[event])
+    timer.unpause(sm.event_IDs[event])
 
 
 def timer_remaining(event):
     # Return time until timer for specified event elapses, returns 0 if no timer set for event.
-    return timer.remaining(sm.events[event])
+    return timer.remaining(sm.event_IDs[event])
+
+
+_handlers = []  # (state, event, function) tuples registered with the on decorator.
+
+
+def on(state, *events):
+    # Decorator which registers the decorated function to be called with no arguments when any of
+    # the specified events occurs in state, or in every state if state is "all_states".  Handlers are
+    # compiled into a dispatch table when the state machine is set up, so an event is processed with
+    # a single dict lookup.  If an all_states handler returns True, state specific handlers and state
+    # behaviour functions are not called for the event.  Can be used alongside state behaviour functions,
+    # handlers registered with on are called first.
+    def register(function):
+        for event in events:
+            _handlers.append((state, event, function))
+        return function
+
+    return register
 
 
 def print(print_string):
@@ -78,8 +98,8 @@ def warning(message):
 
 
 def publish_event(event):
-    # Put event with specified name in the event queue.
-    fw.event_queue.put(fw.Datatuple(fw.current_time, fw.EVENT_TYP, "p", sm.events[event]))
+    # Put specified event in the event queue.
+    fw.event_queue.put(fw.Datatuple(fw.current_time, fw.EVENT_TYP, "p", sm.event_IDs[event]))
 
 
 def stop_framework():
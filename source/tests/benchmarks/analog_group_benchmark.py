@@ -0,0 +1,66 @@
+# Benchmark comparing streaming several analog pins with a separate Analog_input for each
+# pin, as before Analog_group was added, and with one Analog_group sampling all the pins.
+# Each configuration samples its pins for a fixed number of sampling timer ticks, calling
+# the sampling ISRs and sending full buffers as the framework does, and reports hardware
+# timers used, bytes sent per sample and the host time per sample.
+
+import time
+from source.tests.benchmarks.board_stubs import load_pyControl
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+hw = pyControl.hardware
+
+sampling_rate = 1000
+n_ticks = 20000
+all_timers = list(hw.available_timers)
+
+
+def reset_hardware():
+    hw.IO_dict.clear()
+    hw.next_ID = 0
+    hw.available_timers[:] = all_timers
+    hw.stream_data_queue = hw.Ring_buffer()
+
+
+def setup_inputs(n_pins, grouped):
+    """Return the sampling objects for n_pins pins."""
+    reset_hardware()
+    pins = [f"X{i + 1}" for i in range(n_pins)]
+    names = [f"signal_{i}" for i in range(n_pins)]
+    if grouped:
+        return [hw.Analog_group(pins, names, sampling_rate)]
+    return [hw.Analog_input(pin, name, sampling_rate) for pin, name in zip(pins, names)]
+
+
+def run_workload(n_pins, grouped):
+    """Sample pins for n_ticks, return timers used, bytes sent and time taken."""
+    inputs = setup_inputs(n_pins, grouped)
+    n_timers = len(all_timers) - len(hw.available_timers)
+    fw.current_time = 0
+    for io in hw.IO_dict.values():
+        io._run_start()
+    fw.usb_serial.reset()
+    fw.usb_serial.record = False
+    t0 = time.perf_counter()
+    for tick in range(n_ticks):
+        fw.current_time = tick * 1000 // sampling_rate
+        for analog_input in inputs:
+            analog_input._timer_ISR(0)
+        while hw.stream_data_queue.available:
+            hw.IO_dict[hw.stream_data_queue.get()].send_buffer()
+    return n_timers, fw.usb_serial.n_bytes, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    print(f"{n_ticks} ticks at {sampling_rate} Hz, per sample: bytes sent and host time (us).")
+    print(f"{'pins':>5} {'timers':>13} {'bytes/sample':>16} {'time/sample':>16}")
+    print(f"{'':>5} {'inputs':>6} {'group':>6} {'inputs':>7} {'group':>8} {'inputs':>7} {'group':>8}")
+    for n_pins in (2, 4, 8):
+        n_samples = n_pins * n_ticks
+        inputs_timers, inputs_bytes, inputs_time = run_workload(n_pins, grouped=False)
+        group_timers, group_bytes, group_time = run_workload(n_pins, grouped=True)
+        print(
+            f"{n_pins:>5} {inputs_timers:>6} {group_timers:>6} {inputs_bytes / n_samples:>7.3f} "
+            f"{group_bytes / n_samples:>8.3f} {inputs_time / n_samples * 1e6:>7.2f} {group_time / n_samples * 1e6:>8.2f}"
+        )
@@ -0,0 +1,24 @@
+# Host side helpers shared by benchmarks which connect a Pycboard to a fake, emulated or
+# replayed board.
+
+
+class Data_collector:
+    """Data consumer that stores all Datatuples output by the board, also used in place of
+    the board's data logger."""
+
+    def __init__(self):
+        self.data = []
+
+    def process_data(self, new_data):
+        self.data.extend(new_data)
+
+    def write_data(self, new_data):
+        self.data.extend(new_data)
+
+    def print_data(self, new_data):
+        pass
+
+
+def no_print(*args, **kwargs):
+    """Print function passed to Pycboard to discard its messages."""
+    pass
@@ -0,0 +1,118 @@
+# Benchmark comparing Analog_input threshold crossing detection in the sampling interrupt,
+# as before block_threshold was added, with detection over each chunk of samples in the
+# main loop.  A noisy signal crossing the threshold is sampled for a fixed number of
+# sampling timer ticks, calling the sampling ISR each tick and running the main loop's
+# interrupt processing and buffer sending every few ticks, as the main loop is busy with
+# other work.  Reports the host time per sample spent in the ISR and in the main loop, and
+# the crossing events generated, which are compared with those expected from the signal.
+# When several crossings occur between main loop iterations, detection in the interrupt
+# gives each of their events the timestamp and direction of the last crossing.  Also checks
+# that a chunk alternating across the threshold every sample, with more crossings than fit
+# in the default event queue, generates only its net crossing rather than overflowing it.
+
+import time
+import random
+from collections import Counter
+from source.tests.benchmarks.board_stubs import load_pyControl
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+hw = pyControl.hardware
+
+sampling_rate = 1000
+n_ticks = 20000
+threshold = 2000
+all_timers = list(hw.available_timers)
+
+random.seed(1)
+signal = [threshold + (500 if (i // 50) % 2 else -500) + random.randint(-600, 600) for i in range(n_ticks)]
+
+
+def expected_events(rising_ID, falling_ID):
+    """Return (time, event ID) of each threshold crossing in signal."""
+    events = []
+    above_threshold = signal[0] > threshold
+    for i, sample in enumerate(signal):
+        if (sample > threshold) != above_threshold:
+            above_threshold = not above_threshold
+            events.append((i * 1000 // sampling_rate, rising_ID if above_threshold else falling_ID))
+    return events
+
+
+def setup_input(block_threshold):
+    """Return an Analog_input sampling signal with rising and falling events."""
+    hw.IO_dict.clear()
+    hw.next_ID = 0
+    hw.available_timers[:] = all_timers
+    hw.stream_data_queue = hw.Ring_buffer()
+    hw.interrupt_queue.reset()
+    analog_input = hw.Analog_input(
+        "X1", "signal", sampling_rate, threshold, "rise", "fall", block_threshold=block_threshold
+    )
+    analog_input.threshold.rising_event_ID = 1
+    analog_input.threshold.falling_event_ID = 2
+    tick = [0]
+    analog_input.read_sample = lambda: signal[tick[0]]
+    return analog_input, tick
+
+
+def run_workload(block_threshold, loop_interval):
+    """Sample signal for n_ticks, return ISR time, main loop time and events generated."""
+    analog_input, tick = setup_input(block_threshold)
+    fw.event_queue.reset()
+    fw.current_time = 0
+    analog_input._run_start()  # Acquires sample for tick 0.
+    fw.usb_serial.record = False
+    isr_time = loop_time = 0
+    events = []
+    for i in range(1, n_ticks):
+        tick[0] = i
+        fw.current_time = i * 1000 // sampling_rate
+        t0 = time.perf_counter()
+        analog_input._timer_ISR(0)
+        t1 = time.perf_counter()
+        if i % loop_interval == 0 or i == n_ticks - 1:
+            while hw.interrupt_queue.available:
+                hw.IO_dict[hw.interrupt_queue.get()]._process_interrupt()
+            while hw.stream_data_queue.available:
+                hw.IO_dict[hw.stream_data_queue.get()].send_buffer()
+            while fw.event_queue.available:
+                event = fw.event_queue.get()
+                events.append((event.time, event.content))
+        isr_time += t1 - t0
+        loop_time += time.perf_counter() - t1
+    return isr_time, loop_time, sorted(events)
+
+
+def check_noisy_block():
+    """Check a chunk with a crossing every sample does not overflow the event queue."""
+    analog_input, tick = setup_input(block_threshold=True)
+    fw.event_queue.configure(64, "raise")
+    fw.event_queue.reset()
+    fw.data_output_queue.reset()
+    analog_input.threshold.run_start(0)
+    buffer = [threshold + (1 if i % 2 else -1) for i in range(100)]  # 99 crossings, ends above.
+    analog_input.threshold.check_block(buffer, 0, sampling_rate)
+    events = [fw.event_queue.get() for i in range(fw.event_queue.n_items)]
+    assert [(e.time, e.content) for e in events] == [(99, 1)], "Noisy block did not give net crossing."
+    assert analog_input.threshold.discarded == 98
+    assert fw.data_output_queue.get().type == fw.WARNG_TYP, "No discarded crossings warning."
+
+
+if __name__ == "__main__":
+    check_noisy_block()
+    print("Noisy chunk gives net crossing without event queue overflow.")
+    expected = Counter(expected_events(1, 2))
+    print(f"{n_ticks} ticks at {sampling_rate} Hz, {len(expected)} threshold crossings.")
+    print("Host time per sample (us) in ISR and main loop, events generated and events with incorrect timestamp.")
+    print(f"{'loop interval':>13} {'mode':>10} {'ISR':>7} {'loop':>7} {'events':>7} {'incorrect':>10}")
+    for loop_interval in (1, 5, 20):
+        for mode, block_threshold in (("sample", False), ("block", True)):
+            isr_time, loop_time, events = run_workload(block_threshold, loop_interval)
+            incorrect = sum((Counter(events) - expected).values())
+            if block_threshold:
+                assert Counter(events) == expected, "Block threshold events differ from signal crossings."
+            print(
+                f"{loop_interval:>13} {mode:>10} {isr_time / n_ticks * 1e6:>7.2f} {loop_time / n_ticks * 1e6:>7.2f} "
+                f"{len(events):>7} {incorrect:>10}"
+            )
@@ -0,0 +1,227 @@
+# Board emulator which runs the pyControl framework on the host computer behind an emulated
+# raw REPL, so the unmodified Pycboard class can connect to it over a pseudo terminal, load
+# the framework, set up tasks and run them.  Each emulated board runs in its own process with
+# a folder on the host acting as the board's filesystem, the pyb module emulated by
+# emulated_pyb.py, and host side stand-ins for the other micropython modules used by the
+# framework.  Tasks run in real time or accelerated, set by the speed argument, and inputs
+# can be driven with random pulses.  Only available on platforms with pseudo terminals
+# (Linux, macOS).
+#
+# Usage:
+#     emulator = Board_emulator(speed=None, input_rates={"X17": 20})
+#     board = Pycboard(emulator.port)
+#     board.setup_state_machine("button", sm_dir="tasks/example")
+#     board.start_framework()
+
+import os
+import gc
+import sys
+import json
+import time
+import random
+import select
+import builtins
+import tempfile
+import subprocess
+import contextlib
+from source.communication import pycboard
+from source.tests.benchmarks import board_stubs
+from source.tests.benchmarks import emulated_pyb
+from source.tests.benchmarks.fake_board import Fake_board
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+# ----------------------------------------------------------------------------------------
+#  Host side interface.
+# ----------------------------------------------------------------------------------------
+
+
+class Board_emulator:
+    """Start an emulated board in a subprocess.  fs_dir is the folder used as the board's
+    filesystem, a temporary folder is used if not specified.  Keyword arguments are passed
+    to Emulated_board.  Connect to the board by opening a serial connection to the port
+    attribute.  Emulated boards get a new unique ID each run, so the first emulator started
+    redirects the board file manifest cache of this process to a temporary folder, rather
+    than adding entries to config/file_manifests.json."""
+
+    manifest_cache_dir = None
+
+    def __init__(self, fs_dir=None, **board_kwargs):
+        if Board_emulator.manifest_cache_dir is None:
+            Board_emulator.manifest_cache_dir = tempfile.TemporaryDirectory(prefix="pyControl_manifests_")
+            pycboard.MANIFEST_CACHE_PATH = os.path.join(Board_emulator.manifest_cache_dir.name, "file_manifests.json")
+        self.temp_dir = None
+        if fs_dir is None:
+            self.temp_dir = tempfile.TemporaryDirectory(prefix="pyControl_board_")
+            fs_dir = self.temp_dir.name
+        self.fs_dir = fs_dir
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "source.tests.benchmarks.board_emulator", fs_dir, json.dumps(board_kwargs)],
+            cwd=repo_root,
+            stdin=subprocess.PIPE,  # Closed when this process exits, ending the emulator process.
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.port = self.process.stdout.readline().strip()
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+        if self.temp_dir:
+            self.temp_dir.cleanup()
+
+
+# ----------------------------------------------------------------------------------------
+#  Emulated board.
+# ----------------------------------------------------------------------------------------
+
+
+class USB_VCP:
+    """USB serial port of emulated board, reads and writes the board's pseudo terminal."""
+
+    def __init__(self, board):
+        self.board = board
+        self.idle = False  # True if nothing was sent since any() last returned False.
+
+    def setinterrupt(self, chr):
+        pass
+
+    def any(self):
+        # Called by the framework main loop when no higher priority tasks are pending.  The
+        # clock is advanced, running any timer or input callbacks that are due.  If the loop
+        # has been idle since the previous call, wait for input or the next callback rather
+        # than spinning, so a board running in real time does not starve the host of CPU.
+        timeout = emulated_pyb.clock.wall_time_to_next() if self.idle else 0
+        if not self.board.input:
+            select.select([self.board.master_fd], [], [], timeout)
+        emulated_pyb.clock.advance()
+        available = bool(self.board.input) or bool(select.select([self.board.master_fd], [], [], 0)[0])
+        self.idle = not available
+        return available
+
+    def read(self, n=-1):
+        data = self.board.read(n if n > 0 else 4096, timeout=0)
+        return data if data else None
+
+    def recv(self, buf, timeout=5000):
+        """If buf is an int return up to buf bytes received within timeout ms, otherwise
+        read received bytes into buffer buf and return the number of bytes read."""
+        if isinstance(buf, int):
+            data = bytearray()
+            end_time = time.perf_counter() + timeout / 1000
+            while len(data) < buf and time.perf_counter() < end_time:
+                data += self.board.read(buf - len(data), timeout=max(0, end_time - time.perf_counter()))
+            return bytes(data)
+        data = self.board.read(len(buf), timeout=timeout / 1000)
+        if data and random.random() < self.board.corrupt_prob:  # Flip a bit in received data.
+            i = random.randrange(len(data))
+            data = data[:i] + bytes([data[i] ^ 1]) + data[i + 1 :]
+        buf[: len(data)] = data
+        return len(data)
+
+    def send(self, data, timeout=0):
+        self.idle = False
+        self.board.write(bytes(data))
+        return len(data)
+
+    write = send
+
+
+class Slow_file:
+    """File whose read method takes an additional delay seconds, other methods are those
+    of the wrapped file."""
+
+    def __init__(self, file, delay):
+        self.file = file
+        self.delay = delay
+
+    def read(self, *args):
+        end_time = time.perf_counter() + self.delay
+        while time.perf_counter() < end_time:  # Busy wait as sleep is too coarse.
+            pass
+        return self.file.read(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.file.close()
+
+
+_builtin_hasattr = builtins.hasattr
+
+
+def _hasattr(obj, name):
+    # hasattr as on micropython, where instances of built in types have no __init__ attribute.
+    if name == "__init__" and type(obj).__module__ == "builtins":
+        return False
+    return _builtin_hasattr(obj, name)
+
+
+class Emulated_board(Fake_board):
+    """Fake_board which executes code with stand-ins for the micropython modules
+    installed and the current directory acting as the board's filesystem.  Each read
+    by USB_VCP.recv, used for file transfer, is corrupted with probability corrupt_prob.
+    Each file read by code run in the REPL takes an additional read_delay seconds, to model
+    the time taken by the board to read files, e.g. when hashing them.  The board's clock
+    runs at speed times real time, or as fast as possible if speed is None.  Input pins in
+    dict input_rates {pin_name: rate} are driven with random pulses at rate pulses/second."""
+
+    def __init__(self, fs_dir, corrupt_prob=0, read_delay=0, speed=1, input_rates=None, **kwargs):
+        self.fs_dir = fs_dir
+        self.corrupt_prob = corrupt_prob
+        self.read_delay = read_delay
+        self.input_rates = input_rates or {}
+        self.pyb = emulated_pyb
+        self.pyb.clock.speed = speed
+        self.pyb.USB_VCP = lambda *args: USB_VCP(self)
+        self.pyb.unique_id = lambda: b"emulated" + os.path.basename(fs_dir).encode()[-4:]
+        self.pyb.usb_mode = lambda mode=None: "VCP"
+        self.pyb.hard_reset = self.soft_reset
+        self.pyb.bootloader = self.soft_reset
+        sys.modules["pyb"] = self.pyb
+        sys.modules["ujson"] = json
+        sys.modules["ucollections"] = board_stubs.ucollections
+        builtins.micropython = board_stubs.micropython
+        builtins.const = lambda x: x
+        for name, ptr in board_stubs.viper_ptrs.items():
+            setattr(builtins, name, ptr)
+        builtins.hasattr = _hasattr
+        sys.implementation.version = (1, 19, 1)  # Micropython version reported by board.
+        gc.mem_free = lambda: 100000
+        gc.mem_alloc = lambda: 100000
+        super().__init__(**kwargs)
+
+    def soft_reset(self):
+        """Remove modules imported from the board filesystem, reset the emulated hardware
+        and the REPL namespace."""
+        for name, module in list(sys.modules.items()):
+            if (getattr(module, "__file__", None) or "").startswith(self.fs_dir):
+                del sys.modules[name]
+        self.pyb.reset()
+        for pin_name, rate in self.input_rates.items():
+            emulated_pyb.Random_input(pin_name, rate)
+        super().soft_reset()
+        self.namespace = {"__name__": "__main__"}
+        if self.read_delay:
+            self.namespace["open"] = lambda *args: Slow_file(open(*args), self.read_delay)
+
+    def run_code(self, code):
+        self.pyb.clock.advance()
+        with contextlib.redirect_stdout(self.output):
+            super().run_code(code)
+
+
+if __name__ == "__main__":
+    fs_dir = os.path.abspath(sys.argv[1])
+    board_kwargs = json.loads(sys.argv[2])
+    os.chdir(fs_dir)
+    sys.path = [fs_dir] + [p for p in sys.path[1:] if os.path.abspath(p) != repo_root]
+    board = Emulated_board(fs_dir, **board_kwargs)
+    print(board.port, flush=True)
+    sys.stdin.read()  # Returns when the host process closes stdin or exits.
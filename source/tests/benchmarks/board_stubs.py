@@ -0,0 +1,89 @@
+# Minimal host side stand-ins for the micropython modules imported by the pyControl
+# framework, used to load and benchmark framework code without a pyboard.  The pyb module
+# is emulated_pyb.py, as used by Board_emulator, with a USB_VCP which records the data
+# written to it.  Only the functionality needed to import the framework and run the
+# benchmarked functions is provided.
+
+import os
+import sys
+import time
+import json
+import types
+import builtins
+import importlib
+import collections
+from source.tests.benchmarks import emulated_pyb
+
+source_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+class USB_VCP:
+    """Simulated USB serial port.  Each write busy-waits for write_overhead_us to model
+    the fixed per call cost of a USB write on the pyboard."""
+
+    write_overhead_us = 0
+    record = True
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.data = bytearray()
+        self.n_writes = 0
+        self.n_bytes = 0
+
+    def send(self, data, timeout=None):
+        if self.write_overhead_us:
+            t_end = time.perf_counter() + self.write_overhead_us * 1e-6
+            while time.perf_counter() < t_end:
+                pass
+        self.n_writes += 1
+        self.n_bytes += len(data)
+        if self.record:
+            self.data += data
+
+    write = send
+
+    def any(self):
+        return False
+
+    def setinterrupt(self, chr):
+        pass
+
+
+micropython = types.SimpleNamespace(native=lambda f: f, viper=lambda f: f)
+
+
+def _viper_ptr(buffer, item_format, item_size):
+    # Index buffer as unsigned integers, like viper pointers the buffer length need not be a
+    # multiple of the item size.
+    byte_view = memoryview(buffer).cast("B")
+    return byte_view[: len(byte_view) - len(byte_view) % item_size].cast(item_format)
+
+
+# Viper pointer casts, which index a buffer as unsigned 8, 16 or 32 bit integers.
+viper_ptrs = {
+    "ptr8": lambda buffer: memoryview(buffer).cast("B"),
+    "ptr16": lambda buffer: _viper_ptr(buffer, "H", 2),
+    "ptr32": lambda buffer: _viper_ptr(buffer, "I", 4),
+}
+
+ucollections = types.ModuleType("ucollections")
+ucollections.namedtuple = collections.namedtuple
+ucollections.OrderedDict = collections.OrderedDict
+
+
+def load_pyControl():
+    """Install the stand-in modules and import the pyControl framework package."""
+    if "pyb" not in sys.modules:
+        emulated_pyb.USB_VCP = USB_VCP
+        sys.modules["pyb"] = emulated_pyb
+    sys.modules.setdefault("ujson", json)
+    sys.modules.setdefault("ucollections", ucollections)
+    builtins.micropython = micropython
+    builtins.const = lambda x: x
+    for name, ptr in viper_ptrs.items():
+        setattr(builtins, name, ptr)
+    if source_dir not in sys.path:
+        sys.path.insert(0, source_dir)
+    return importlib.import_module("pyControl")
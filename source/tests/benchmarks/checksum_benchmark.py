@@ -0,0 +1,134 @@
+# Benchmark of analog data checksums for an Analog_group sampling 8 pins at 10 kHz.  On the
+# board, Analog_channel computes the checksum of each chunk with the viper function
+# hardware.sum_samples if the host sets fw.viper_checksums, which is checked against the sum()
+# over the buffer used otherwise for each data type, and streams recorded with and without
+# viper checksums are checked to be identical.  Viper functions are run as Python on the host,
+# so the board side speedup must be measured on a pyboard.  On the host, Pycboard verifies the
+# checksum of analog messages with at least NUMPY_CHECKSUM_MIN_SAMPLES samples with numpy
+# rather than sum() over the samples.  The time per message of each method is reported for a
+# range of message sizes, from which the threshold is set, then a recorded stream with the
+# default and a larger chunk size is parsed with sum() for all messages, as previously, and
+# with the current checksum verification.
+# Reports the host time per sample for each and checks no checksums fail.
+
+import time
+import timeit
+import random
+import numpy as np
+from array import array
+from source.communication import pycboard
+from source.communication.pycboard import MsgType
+from source.tests.benchmarks.board_stubs import load_pyControl
+from source.tests.benchmarks.serial_replay import replay_board
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+hw = pyControl.hardware
+
+sampling_rate = 10000
+n_pins = 8
+n_ticks = 20000
+all_timers = list(hw.available_timers)
+default_min_samples = pycboard.NUMPY_CHECKSUM_MIN_SAMPLES
+
+
+def check_sum_samples():
+    """Check sum_samples matches the checksum computed with sum() for each data type."""
+    rng = random.Random(0)
+    ranges = {"b": 7, "B": 8, "h": 15, "H": 16, "i": 31, "I": 32}
+    for data_type, bits in ranges.items():
+        low = -(2**bits) if data_type.islower() else 0
+        buffer = array(data_type, [rng.randint(low, 2**bits - 1) for i in range(1000)])
+        for n_samples in (0, 1, 999, 1000):
+            expected = sum(array(data_type, buffer[:n_samples])) & 0xFFFF
+            assert hw.sum_samples(buffer, n_samples, buffer.itemsize, data_type == "b") == expected, data_type
+
+
+def checksum_times(n_samples, dtype="H"):
+    """Return time (us) to sum the samples of an analog message with sum() and with numpy."""
+    message = bytes(8 + n_samples * np.dtype(dtype).itemsize)
+    data = np.frombuffer(message, dtype, offset=8)
+    sum_time = min(timeit.repeat(lambda: sum(memoryview(message)[8:].cast(dtype)), number=2000, repeat=7))
+    numpy_time = min(timeit.repeat(lambda: int(data.sum(dtype=np.int64)), number=2000, repeat=7))
+    return sum_time / 2000 * 1e6, numpy_time / 2000 * 1e6
+
+
+def record_stream(max_chunk_bytes, viper_checksums=True):
+    """Return bytes output by an Analog_group sampling for n_ticks, and the analog_inputs dict."""
+    fw.viper_checksums = viper_checksums
+    hw.IO_dict.clear()
+    hw.next_ID = 0
+    hw.available_timers[:] = all_timers
+    hw.stream_data_queue = hw.Ring_buffer()
+    rng = random.Random(1)
+    group = hw.Analog_group(
+        [f"X{i + 1}" for i in range(n_pins)],
+        [f"ch_{i}" for i in range(n_pins)],
+        sampling_rate,
+        max_chunk_bytes=max_chunk_bytes,
+    )
+    for ADC in group.ADCs:
+        ADC.read = lambda: rng.randint(0, 4095)
+    fw.current_time = 0
+    for io in hw.IO_dict.values():
+        io._run_start()
+    fw.usb_serial.reset()
+    fw.usb_serial.record = True
+    for tick in range(1, n_ticks):
+        fw.current_time = tick * 1000 // sampling_rate
+        group._timer_ISR(0)
+        while hw.stream_data_queue.available:
+            hw.IO_dict[hw.stream_data_queue.get()].send_buffer()
+    fw.output_data(fw.Datatuple(fw.current_time, fw.STOPF_TYP, "", ""))
+    analog_ID = group.Analog_channel.ID
+    analog_inputs = {analog_ID: {"name": group.name, "fs": sampling_rate, "dtype": "H", "plot": True}}
+    return bytes(fw.usb_serial.data), analog_inputs
+
+
+def parse(data, analog_inputs, numpy_checksum):
+    """Return analog messages parsed from data and time spent processing messages, verifying
+    checksums with numpy for long messages if numpy_checksum is True, else with sum()."""
+    pycboard.NUMPY_CHECKSUM_MIN_SAMPLES = default_min_samples if numpy_checksum else float("inf")
+    board = replay_board({}, {}, analog_inputs)
+    messages = []
+    i = 0
+    while i < len(data):  # Split stream into (message, checksum), framing is not benchmarked.
+        checksum = int.from_bytes(data[i + 1 : i + 3], "little")
+        message_len = int.from_bytes(data[i + 3 : i + 5], "little")
+        messages.append((data[i + 5 : i + 5 + message_len], checksum))
+        i += 5 + message_len
+    messages = [m for m in messages if m[0][4:5] == MsgType.ANLOG.value]
+    t0 = time.perf_counter()
+    parsed = [board._process_message(message, checksum) for message, checksum in messages]
+    return parsed, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    check_sum_samples()
+    print("sum_samples matches sum() for all data types.")
+    assert record_stream(256, viper_checksums=False) == record_stream(256), "Viper checksums change stream."
+    print("Streams with and without viper checksums are identical.\n")
+    print(f"Host time per message (us), numpy used from {default_min_samples} samples.")
+    print(f"{'samples/msg':>11} {'sum()':>7} {'numpy':>7}")
+    for n_samples in (64, 128, 256, 384, 512, 1024):
+        sum_time, numpy_time = checksum_times(n_samples)
+        print(f"{n_samples:>11} {sum_time:>7.2f} {numpy_time:>7.2f}")
+    print()
+    print(f"{n_pins} pins at {sampling_rate} Hz for {n_ticks} ticks, host message processing time per sample (ns).")
+    print(f"{'chunk bytes':>11} {'samples/msg':>12} {'sum()':>7} {'current':>8} {'speedup':>8}")
+    n_samples = n_pins * (n_ticks - 1)
+    for max_chunk_bytes in (256, 4096):
+        data, analog_inputs = record_stream(max_chunk_bytes)
+        old_time = new_time = float("inf")
+        for repeat in range(5):  # Fastest of 5 parses, alternating methods.
+            old_parsed, t = parse(data, analog_inputs, numpy_checksum=False)
+            old_time = min(old_time, t)
+            new_parsed, t = parse(data, analog_inputs, numpy_checksum=True)
+            new_time = min(new_time, t)
+        assert all(nd.type == MsgType.ANLOG for nd in old_parsed + new_parsed), "Checksum failed."
+        assert [nd.content[1].tolist() for nd in new_parsed] == [nd.content[1].tolist() for nd in old_parsed]
+        samples_per_message = n_samples / len(old_parsed)
+        print(
+            f"{max_chunk_bytes:>11} {samples_per_message:>12.0f} {old_time / n_samples * 1e9:>7.1f} "
+            f"{new_time / n_samples * 1e9:>8.1f} {old_time / new_time:>8.2f}"
+        )
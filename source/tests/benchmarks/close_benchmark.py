@@ -0,0 +1,76 @@
+# Benchmark comparing closing the analog data files at the end of a session with the current
+# Analog_writer, which updates the .npy header at the start of each data temp file and
+# renames it, and writes the sample times from the chunk index a chunk at a time to a memory
+# mapped .time.npy file, and with the previous Analog_writer, which read each channel's data
+# and time temp files into memory and saved them as .npy files.  Data for an Analog_group sampling 8
+# pins at 10 kHz is written for sessions of increasing duration, then the files are closed.
+# Reports the time and peak Python heap memory (measured with tracemalloc) used to close
+# the files, and the time for Data_logger.close_files, called by the GUI when a run stops,
+# to return, as it now closes analog files in a background thread.
+
+import os
+import time
+import shutil
+import tempfile
+import tracemalloc
+import numpy as np
+from source.communication import data_logger
+from source.tests.benchmarks.ingest_benchmark import Previous_writer
+
+n_pins = 8
+sampling_rate = 10000
+chunk_dur = 0.1  # Seconds.
+
+
+def write_session(writer_class, output_dir, duration):
+    """Return an analog writer which has written duration seconds of data."""
+    channels = [f"ch_{i}" for i in range(n_pins)]
+    writer = writer_class("group", sampling_rate, "H", os.path.join(output_dir, "session.tsv"), channels)
+    n_frames = int(sampling_rate * chunk_dur)
+    chunk = np.random.default_rng(0).integers(0, 4096, n_frames * n_pins).astype("H")
+    for i in range(int(duration / chunk_dur)):
+        writer.save_analog_chunk(int(i * chunk_dur * 1000), chunk)
+    return writer
+
+
+def measure_close(writer_class, duration):
+    """Return time (s) and peak heap memory (MB) to close the files of a session."""
+    output_dir = tempfile.mkdtemp()
+    writer = write_session(writer_class, output_dir, duration)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    writer.close_files()
+    close_time = time.perf_counter() - t0
+    peak_memory = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    shutil.rmtree(output_dir)
+    return close_time, peak_memory
+
+
+def measure_logger_close(duration):
+    """Return time (s) for Data_logger.close_files to return and for files to be complete."""
+    output_dir = tempfile.mkdtemp()
+    logger = data_logger.Data_logger(board=None)
+    logger.analog_writers = {0: write_session(data_logger.Analog_writer, output_dir, duration)}
+    t0 = time.perf_counter()
+    logger.close_files()
+    return_time = time.perf_counter() - t0
+    logger.wait_closed()
+    complete_time = time.perf_counter() - t0
+    shutil.rmtree(output_dir)
+    return return_time, complete_time
+
+
+if __name__ == "__main__":
+    print(f"{n_pins} pins at {sampling_rate} Hz, time (ms) and peak heap memory (MB) to close files.")
+    print(f"{'session (s)':>11} {'previous':>17} {'current':>17} {'close_files return':>19}")
+    for writer_class in (Previous_writer, data_logger.Analog_writer):  # Warm up, e.g. imports on first close.
+        measure_close(writer_class, 1)
+    for duration in (10, 60, 300):
+        previous_time, previous_memory = measure_close(Previous_writer, duration)
+        current_time, current_memory = measure_close(data_logger.Analog_writer, duration)
+        return_time, complete_time = measure_logger_close(duration)
+        print(
+            f"{duration:>11} {previous_time * 1000:>8.1f} {previous_memory:>8.1f} "
+            f"{current_time * 1000:>8.1f} {current_memory:>8.2f} {return_time * 1000:>19.2f}"
+        )
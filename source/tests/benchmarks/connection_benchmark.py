@@ -0,0 +1,74 @@
+# Benchmark of the time taken to connect to a board (Pycboard.__init__) and to set up a
+# state machine (Pycboard.setup_state_machine), which both make many raw REPL round trips.
+# Compares Pyboard.read_until, which blocks on the serial port and reads all available
+# bytes, with the previous implementation which read one byte at a time and slept for
+# 100ms whenever no bytes were waiting.  Boards are emulated by Board_emulator, with
+# delays modelling the time taken by the board to execute commands and soft reboot.
+
+import os
+import time
+import statistics
+from source.communication.pycboard import Pycboard
+from source.tests.benchmarks.board_emulator import Board_emulator
+from source.tests.benchmarks.benchmark_helpers import no_print
+
+task_dir = os.path.join("tasks", "example")
+task_name = "blinker"
+n_repeats = 5
+exec_delay = 0.002  # Seconds.
+reset_delay = 0.05  # Seconds.
+
+# Previous polling read_until ---------------------------------------------------------
+
+
+class Polling_pycboard(Pycboard):
+    def read_until(self, min_num_bytes, ending, timeout=10, data_consumer=None):
+        data = self.serial.read(min_num_bytes)
+        if data_consumer:
+            data_consumer(data)
+        timeout_count = 0
+        while True:
+            if data.endswith(ending):
+                break
+            elif self.serial.in_waiting > 0:
+                new_data = self.serial.read(1)
+                data = data + new_data
+                if data_consumer:
+                    data_consumer(new_data)
+                timeout_count = 0
+            else:
+                timeout_count += 1
+                if timeout is not None and timeout_count >= 10 * timeout:
+                    break
+                time.sleep(0.1)
+        return data
+
+
+# Benchmark ---------------------------------------------------------------------------
+
+
+def time_connection(board_class, port):
+    """Return times taken to connect to board and to setup state machine."""
+    t0 = time.perf_counter()
+    board = board_class(port, verbose=False, print_func=no_print)
+    t1 = time.perf_counter()
+    board.setup_state_machine(task_name, sm_dir=task_dir)
+    t2 = time.perf_counter()
+    assert board.status["framework"] and board.sm_info.states, "Board not set up correctly."
+    board.close()
+    return t1 - t0, t2 - t1
+
+
+if __name__ == "__main__":
+    emulator = Board_emulator(exec_delay=exec_delay, reset_delay=reset_delay)
+    board = Pycboard(emulator.port, verbose=False, print_func=no_print)
+    board.load_framework()
+    board.close()
+    print(f"Median of {n_repeats} connections to emulated board.")
+    print(f"{'read_until':>10} {'connect (s)':>12} {'setup task (s)':>15}")
+    for name, board_class in (("polling", Polling_pycboard), ("blocking", Pycboard)):
+        times = [time_connection(board_class, emulator.port) for i in range(n_repeats)]
+        connect_time = statistics.median(t[0] for t in times)
+        setup_time = statistics.median(t[1] for t in times)
+        print(f"{name:>10} {connect_time:>12.3f} {setup_time:>15.3f}")
+    emulator.close()
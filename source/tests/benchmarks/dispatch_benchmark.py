@@ -0,0 +1,79 @@
+# Benchmark comparing event dispatch in source/pyControl/state_machine.py for tasks whose
+# states are defined with behaviour functions containing chains of if statements comparing
+# event names, and the same tasks with handlers registered with the @on decorator, which are
+# compiled into a dispatch table for each state.  Each state handles a few of the task's
+# events, the workload processes random events and changes state every few events.
+
+import time
+import types
+import random
+from source.tests.benchmarks.board_stubs import load_pyControl
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+sm = pyControl.state_machine
+ut = pyControl.utility
+
+n_states = 10
+events_per_state = 4  # Events handled by each state.
+n_iterations = 50000
+transition_interval = 20  # Events processed between state transitions.
+
+
+def make_task_sources(n_events, seed=0):
+    """Return source code of task files with behaviour functions and with @on handlers,
+    which count handler calls in dict handled {(state, event): count}."""
+    rng = random.Random(seed)
+    states = [f"state_{i}" for i in range(n_states)]
+    events = [f"event_{i}" for i in range(n_events)]
+    header = [f"states = {states!r}", f"events = {events!r}", f"initial_state = {states[0]!r}"]
+    if_chain_lines, decorated_lines = header[:], header[:]
+    for state in states:
+        if_chain_lines.append(f"def {state}(event):")
+        for i, event in enumerate(rng.sample(events, events_per_state)):
+            count_line = f"handled[({state!r}, {event!r})] = handled.get(({state!r}, {event!r}), 0) + 1"
+            if_chain_lines.append(f"    {'if' if i == 0 else 'elif'} event == {event!r}:")
+            if_chain_lines.append(f"        {count_line}")
+            decorated_lines.append(f"@on({state!r}, {event!r})")
+            decorated_lines.append(f"def {state}_{event}():")
+            decorated_lines.append(f"    {count_line}")
+    return "\n".join(if_chain_lines), "\n".join(decorated_lines)
+
+
+def load_task(source, handled):
+    """Return task module executed from source, as when the task file is imported."""
+    ut._handlers.clear()
+    task = types.ModuleType("task_file")
+    task.on = ut.on
+    task.handled = handled
+    exec(source, task.__dict__)
+    return task
+
+
+def run_workload(task_source, n_events, seed=0):
+    """Process random events, return counts of handler calls and time taken."""
+    rng = random.Random(seed)
+    handled = {}
+    sm.setup_state_machine(load_task(task_source, handled))
+    sm.start()
+    fw.data_output_queue.reset()
+    event_IDs = [rng.choice(list(sm.events.values())) for i in range(transition_interval)]
+    next_states = [rng.choice(list(sm.states)) for i in range(n_iterations // transition_interval)]
+    t0 = time.perf_counter()
+    for next_state in next_states:
+        sm.goto_state(next_state)
+        fw.data_output_queue.get()  # Discard state transition output.
+        for event_ID in event_IDs:
+            sm.process_event(event_ID)
+    return handled, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    print(f"{n_iterations} events, {n_states} states each handling {events_per_state} events.")
+    print(f"{'events':>7} {'if chain (s)':>13} {'@on (s)':>9} {'speedup':>8}")
+    for n_events in (5, 20, 50):
+        if_chain_source, decorated_source = make_task_sources(n_events)
+        if_chain_handled, if_chain_time = run_workload(if_chain_source, n_events)
+        decorated_handled, decorated_time = run_workload(decorated_source, n_events)
+        assert if_chain_handled == decorated_handled, "Tasks handled different events."
+        print(f"{n_events:>7} {if_chain_time:>13.3f} {decorated_time:>9.3f} {if_chain_time / decorated_time:>8.1f}")
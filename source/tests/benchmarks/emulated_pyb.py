@@ -0,0 +1,385 @@
+# Emulation of the micropython pyb module used by Board_emulator to run the pyControl
+# framework and task files on the host computer, and by board_stubs.py to load framework
+# code into benchmark processes, where the clock is not advanced.  Timers, pin interrupts and ADC signals
+# are driven by a virtual clock which runs either in real time, at a multiple of real time,
+# or as fast as possible.  The clock is advanced each time the framework polls the USB
+# serial port for input, so timer and pin interrupt callbacks run between iterations of
+# the framework main loop, rather than at arbitrary points as on a pyboard.
+#
+# Only one emulated board can use this module in a process, Board_emulator runs each
+# emulated board in its own process.
+
+import math
+import time
+import heapq
+import random
+import itertools
+
+# ----------------------------------------------------------------------------------------
+#  Virtual clock.
+# ----------------------------------------------------------------------------------------
+
+
+class Virtual_clock:
+    """Microsecond clock which calls scheduled callbacks when advanced.  If speed is None
+    each call to advance moves the clock to the next scheduled callback, running tasks as
+    fast as possible, otherwise the clock follows wall clock time multiplied by speed."""
+
+    def __init__(self, speed=1):
+        self.speed = speed
+        self.time_us = 0
+        self.wall_start = time.perf_counter()
+        self.scheduled = []  # Heap of (time_us, sequence number, source, generation).
+        self.sequence = itertools.count()
+
+    def reset(self):
+        """Remove all scheduled callbacks."""
+        self.scheduled = []
+
+    def schedule(self, source, time_us):
+        """Call source.fire() when the clock reaches time_us, unless source.generation
+        has changed by then."""
+        heapq.heappush(self.scheduled, (time_us, next(self.sequence), source, source.generation))
+
+    def advance(self):
+        """Advance the clock, calling any scheduled callbacks that fall due in time order."""
+        if self.speed:
+            target_us = (time.perf_counter() - self.wall_start) * 1e6 * self.speed
+        elif self.scheduled:
+            target_us = self.scheduled[0][0]
+        else:
+            target_us = self.time_us + 1000
+        while self.scheduled and self.scheduled[0][0] <= target_us:
+            time_us, _, source, generation = heapq.heappop(self.scheduled)
+            if generation == source.generation:
+                self.time_us = max(self.time_us, time_us)
+                source.fire()
+        self.time_us = max(self.time_us, target_us)
+
+    def wall_time_to_next(self):
+        """Return the wall clock time in seconds until the next scheduled callback is due,
+        0 if the clock is not following wall clock time, or None if nothing is scheduled."""
+        if not self.speed:
+            return 0
+        if not self.scheduled:
+            return None
+        return max(0, self.wall_start + self.scheduled[0][0] / 1e6 / self.speed - time.perf_counter())
+
+    def sleep_us(self, us):
+        """Wait until the virtual clock has advanced by us microseconds."""
+        if self.speed:
+            time.sleep(us / 1e6 / self.speed)
+            self.advance()
+        else:
+            end_us = self.time_us + us
+            while self.scheduled and self.scheduled[0][0] <= end_us:
+                self.advance()
+            self.time_us = max(self.time_us, end_us)
+
+
+clock = Virtual_clock()
+
+
+def reset():
+    """Reset the emulated hardware, as done by a soft reset of the board."""
+    clock.reset()
+    Pin.pins.clear()
+
+
+def millis():
+    return int(clock.time_us // 1000)
+
+
+def micros():
+    return int(clock.time_us)
+
+
+def elapsed_millis(start):
+    return millis() - start
+
+
+def elapsed_micros(start):
+    return micros() - start
+
+
+def delay(ms):
+    clock.sleep_us(ms * 1000)
+
+
+def udelay(us):
+    clock.sleep_us(us)
+
+
+def rng():
+    return random.getrandbits(30)
+
+
+# ----------------------------------------------------------------------------------------
+#  Timers.
+# ----------------------------------------------------------------------------------------
+
+
+class Timer:
+    """Hardware timer, calls its callback function at the frequency it was initialised with.
+    Timers initialised with a prescaler and period, e.g. for quadrature encoder counting,
+    do not call callbacks."""
+
+    ENC_A = 9
+    ENC_B = 10
+    ENC_AB = 11
+
+    def __init__(self, n, freq=None, callback=None, **kwargs):
+        self.n = n
+        self.generation = 0
+        self.period_us = None
+        self._callback = None
+        self._counter = 0
+        if freq or kwargs:
+            self.init(freq=freq, **kwargs)
+        if callback:
+            self.callback(callback)
+
+    def init(self, freq=None, **kwargs):
+        self.generation += 1
+        self.period_us = 1e6 / freq if freq else None
+        self._start()
+
+    def deinit(self):
+        self.generation += 1
+        self.period_us = None
+        self._callback = None
+
+    def callback(self, func):
+        self.generation += 1
+        self._callback = func
+        self._start()
+
+    def _start(self):
+        # Schedule the first callback if the timer is running and has a callback.
+        if self.period_us and self._callback:
+            self.next_us = clock.time_us + self.period_us
+            clock.schedule(self, self.next_us)
+
+    def fire(self):
+        self._callback(self)
+        if self.period_us and self._callback:
+            self.next_us += self.period_us
+            clock.schedule(self, self.next_us)
+
+    def counter(self, value=None):
+        if value is None:
+            return self._counter
+        self._counter = value
+
+    def channel(self, *args, **kwargs):
+        return None
+
+
+# ----------------------------------------------------------------------------------------
+#  Pins and external interrupts.
+# ----------------------------------------------------------------------------------------
+
+
+class Pin:
+    """Board pin, pins with the same name are the same object.  Pins configured as inputs
+    are set by calling drive, which calls the pin's ExtInt callback on matching edges."""
+
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    AF_PP = 3
+    AF_OD = 4
+    ANALOG = 5
+    PULL_NONE = 0
+    PULL_UP = 1
+    PULL_DOWN = 2
+    AF1_TIM2 = 1
+
+    pins = {}  # {pin_name: Pin}
+
+    def __new__(cls, id, *args, **kwargs):
+        name = id.id if isinstance(id, Pin) else str(id)
+        if name not in cls.pins:
+            pin = super().__new__(cls)
+            pin.id = name
+            pin._value = 0
+            pin.ext_int = None
+            cls.pins[name] = pin
+        return cls.pins[name]
+
+    def __init__(self, id, mode=IN, pull=PULL_NONE, **kwargs):
+        self.init(mode, pull)
+
+    def init(self, mode=IN, pull=PULL_NONE, **kwargs):
+        self.mode = mode
+        if mode == Pin.IN and pull == Pin.PULL_UP:
+            self._value = 1
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = int(bool(value))
+
+    def name(self):
+        return self.id
+
+    def drive(self, value):
+        """Set the level of an input pin, calling its ExtInt callback if the edge matches."""
+        value = int(bool(value))
+        if value == self._value:
+            return
+        self._value = value
+        if self.ext_int and self.ext_int.enabled and self.ext_int.edges[value]:
+            self.ext_int.callback(self.ext_int.line)
+
+
+class ExtInt:
+    IRQ_RISING = 0x10110000
+    IRQ_FALLING = 0x10210000
+    IRQ_RISING_FALLING = 0x10310000
+
+    n_lines = 0
+
+    def __init__(self, pin, mode, pull, callback):
+        self.pin = Pin(pin)
+        self.pin.init(Pin.IN, pull)
+        self.callback = callback
+        self.edges = (mode != ExtInt.IRQ_RISING, mode != ExtInt.IRQ_FALLING)  # (falling, rising)
+        self.enabled = True
+        self._line = ExtInt.n_lines
+        ExtInt.n_lines += 1
+        self.pin.ext_int = self
+
+    @property
+    def line(self):
+        return self._line
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def swint(self):
+        self.callback(self._line)
+
+
+class Random_input:
+    """Drive an input pin with pulses of duration pulse_ms starting at random times, at an
+    average rate of rate pulses per second."""
+
+    def __init__(self, pin_name, rate, pulse_ms=10, seed=0):
+        self.pin = Pin(pin_name)
+        self.rate = rate
+        self.pulse_us = pulse_ms * 1000
+        self.random = random.Random(seed)
+        self.generation = 0
+        self.next_us = clock.time_us + self.random.expovariate(rate) * 1e6
+        clock.schedule(self, self.next_us)
+
+    def fire(self):
+        if self.pin.value():
+            self.pin.drive(0)
+            self.next_us += self.random.expovariate(self.rate) * 1e6
+        else:
+            self.pin.drive(1)
+            self.next_us += self.pulse_us
+        clock.schedule(self, self.next_us)
+
+
+# ----------------------------------------------------------------------------------------
+#  Analog input and output.
+# ----------------------------------------------------------------------------------------
+
+
+class ADC:
+    """12 bit ADC, reads a sine wave with frequency signal_freq Hz."""
+
+    signal_freq = 1
+
+    def __init__(self, pin):
+        self.pin = Pin(pin)
+
+    def read(self):
+        return int(2048 + 2047 * math.sin(2 * math.pi * ADC.signal_freq * clock.time_us / 1e6))
+
+
+class DAC:
+    NORMAL = 0
+    CIRCULAR = 256
+
+    def __init__(self, port, bits=8, **kwargs):
+        self.port = port
+        self.value = 0
+
+    def init(self, bits=8, **kwargs):
+        pass
+
+    def deinit(self):
+        pass
+
+    def write(self, value):
+        self.value = value
+
+    def write_timed(self, data, freq, mode=NORMAL):
+        self.value = data[-1] if mode == DAC.NORMAL else data[0]
+
+    def noise(self, freq):
+        pass
+
+    def triangle(self, freq):
+        pass
+
+
+# ----------------------------------------------------------------------------------------
+#  Other peripherals.
+# ----------------------------------------------------------------------------------------
+
+
+class I2C:
+    CONTROLLER = MASTER = 0
+    PERIPHERAL = SLAVE = 1
+
+    def __init__(self, bus, *args, **kwargs):
+        self.bus = bus
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def deinit(self):
+        pass
+
+    def scan(self):
+        return []
+
+    def mem_write(self, data, addr, memaddr, **kwargs):
+        pass
+
+    def mem_read(self, data, addr, memaddr, **kwargs):
+        return bytes(data if isinstance(data, int) else len(data))
+
+    def send(self, send, addr=0, **kwargs):
+        pass
+
+    def recv(self, recv, addr=0, **kwargs):
+        return bytes(recv if isinstance(recv, int) else len(recv))
+
+
+class LED:
+    def __init__(self, n):
+        self.n = n
+        self.state = 0
+
+    def on(self):
+        self.state = 255
+
+    def off(self):
+        self.state = 0
+
+    def toggle(self):
+        self.state = 0 if self.state else 255
+
+    def intensity(self, value=None):
+        if value is None:
+            return self.state
+        self.state = value
@@ -0,0 +1,64 @@
+# Benchmark of the Analog_envelope stream, which summarises analog samples on the board as
+# the minimum, maximum and mean of each bin so the GUI plots bins rather than every sample.
+# An Analog_input is sampled for a fixed number of sampling timer ticks without and with
+# an envelope, calling the sampling ISR and sending full buffers as the framework does.
+# Reports the bytes sent and host time in the main loop per sample, and the points per
+# channel the analog plot draws each update for the plotted history duration.  On the host
+# viper functions run as Python, so main loop times do not show their speed on the board.
+
+import time
+from source.tests.benchmarks.board_stubs import load_pyControl
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+hw = pyControl.hardware
+
+sampling_rate = 10000
+n_ticks = 50000
+history_dur = 10  # Seconds of data plotted, analog_history_dur setting default.
+all_timers = list(hw.available_timers)
+
+
+def setup_input(envelope_rate):
+    hw.IO_dict.clear()
+    hw.next_ID = 0
+    hw.available_timers[:] = all_timers
+    hw.stream_data_queue = hw.Ring_buffer()
+    analog_input = hw.Analog_input("X1", "signal", sampling_rate, envelope_rate=envelope_rate)
+    tick = [0]
+    analog_input.read_sample = lambda: (tick[0] * 37) % 4096
+    return analog_input, tick
+
+
+def run_workload(envelope_rate):
+    """Sample for n_ticks, return bytes sent and main loop time."""
+    analog_input, tick = setup_input(envelope_rate)
+    fw.current_time = 0
+    for io in hw.IO_dict.values():
+        io._run_start()
+    fw.usb_serial.reset()
+    fw.usb_serial.record = False
+    loop_time = 0
+    for i in range(n_ticks):
+        tick[0] = i
+        fw.current_time = i * 1000 // sampling_rate
+        analog_input._timer_ISR(0)
+        t0 = time.perf_counter()
+        while hw.stream_data_queue.available:
+            hw.IO_dict[hw.stream_data_queue.get()].send_buffer()
+        loop_time += time.perf_counter() - t0
+    return fw.usb_serial.n_bytes, loop_time
+
+
+if __name__ == "__main__":
+    print(f"{n_ticks} ticks at {sampling_rate} Hz, per sample: bytes sent and main loop host time (us).")
+    print(f"{'envelope rate':>13} {'bytes/sample':>13} {'time/sample':>12} {'plot points':>12}")
+    for envelope_rate in (None, 1000, 100):
+        n_bytes, loop_time = run_workload(envelope_rate)
+        if envelope_rate:  # Mean, min and max curves have one point per bin.
+            plot_points = 3 * history_dur * envelope_rate
+        else:
+            plot_points = history_dur * sampling_rate
+        print(
+            f"{str(envelope_rate):>13} {n_bytes / n_ticks:>13.3f} {loop_time / n_ticks * 1e6:>12.3f} {plot_points:>12}"
+        )
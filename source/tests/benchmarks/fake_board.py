@@ -0,0 +1,163 @@
+# Fake board which emulates the micropython raw REPL over a pseudo terminal, so that host
+# side communication code can be run without a pyboard.  Code sent to the raw REPL is
+# executed by the host Python interpreter in a namespace private to each board.  Only
+# available on platforms with pseudo terminals (Linux, macOS).
+
+import io
+import os
+import pty
+import tty
+import time
+import queue
+import select
+import threading
+
+RAW_REPL_PROMPT = b"raw REPL; CTRL-B to exit\r\n>"
+RAW_PASTE_WINDOW = 128  # Bytes host can send in raw-paste mode before waiting for flow control byte.
+
+
+class Fake_board:
+    """Emulated board, connect to it by opening a serial connection to the port attribute.
+    Each command executed takes an additional exec_delay seconds and each soft reset
+    reset_delay seconds, to model execution and reboot time on the board.  Bytes written
+    by the board reach the host link_latency seconds later, modelling the round trip
+    latency of the USB link without limiting its throughput."""
+
+    def __init__(self, exec_delay=0, reset_delay=0, link_latency=0):
+        self.exec_delay = exec_delay
+        self.reset_delay = reset_delay
+        self.link_latency = link_latency
+        if link_latency:
+            self.link_queue = queue.Queue()  # (send_time, data) tuples.
+            threading.Thread(target=self._link, daemon=True).start()
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.input = bytearray()  # Bytes received from host not yet processed.
+        self.raw_repl = False
+        self.n_execs = 0
+        self.soft_reset()
+        self.thread = threading.Thread(target=self._run, name=f"Fake board {self.port}", daemon=True)
+        self.thread.start()
+
+    def soft_reset(self):
+        self.namespace = {"print": self._print}
+        self.output = io.StringIO()
+
+    def close(self):
+        os.close(self.slave_fd)
+        os.close(self.master_fd)
+
+    def write(self, data):
+        if self.link_latency:
+            self.link_queue.put((time.perf_counter() + self.link_latency, data))
+        else:
+            os.write(self.master_fd, data)
+
+    def _link(self):
+        while True:
+            send_time, data = self.link_queue.get()
+            delay = send_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                os.write(self.master_fd, data)
+            except OSError:  # Board closed.
+                return
+
+    def read(self, n, timeout=None):
+        """Return up to n bytes received from host, waiting up to timeout seconds for
+        bytes to arrive if none are buffered, None waits indefinitely."""
+        if not self.input:
+            readable, _, _ = select.select([self.master_fd], [], [], timeout)
+            if readable:
+                self.input += os.read(self.master_fd, 4096)
+        data = bytes(self.input[:n])
+        del self.input[:n]
+        return data
+
+    def _print(self, *args, sep=" ", end="\n"):
+        self.output.write(sep.join(str(arg) for arg in args) + end)
+
+    def _run(self):
+        code = bytearray()
+        while True:
+            try:
+                c = self.read(1)
+            except OSError:  # Board closed.
+                return
+            if not self.raw_repl:
+                if c == b"\x01":  # ctrl-A: enter raw REPL.
+                    self.raw_repl = True
+                    self.write(b"\r\n" + RAW_REPL_PROMPT)
+                elif c == b"\x03":  # ctrl-C: interrupt.
+                    self.write(b"\r\n>>> ")
+            elif c == b"\x01":
+                code = bytearray()
+                self.write(b"\r\n" + RAW_REPL_PROMPT)
+            elif c == b"\x02":  # ctrl-B: exit raw REPL.
+                self.raw_repl = False
+                self.write(b"\r\n>>> ")
+            elif c == b"\x03":
+                code = bytearray()
+            elif c == b"\x05" and not code:  # ctrl-E: raw-paste mode if followed by b"A\x01".
+                if self.read(2) == b"A\x01":
+                    self.write(b"R\x01" + RAW_PASTE_WINDOW.to_bytes(2, "little"))
+                    code = self._raw_paste()
+                    if code:
+                        self.write(self.execute(bytes(code)) + b">")
+                    code = bytearray()
+            elif c == b"\x04":  # ctrl-D: execute code or soft reset if no code.
+                if code:
+                    self.write(b"OK")
+                    self.write(self.execute(bytes(code)) + b">")
+                else:
+                    self.write(b"OK\r\nMPY: soft reboot\r\n")
+                    self.soft_reset()
+                    time.sleep(self.reset_delay)
+                    self.write(RAW_REPL_PROMPT)
+                code = bytearray()
+            else:
+                code += c
+
+    def _raw_paste(self):
+        """Receive code in raw-paste mode, return None if aborted."""
+        code = bytearray()
+        window_remain = RAW_PASTE_WINDOW
+        while True:
+            c = self.read(1)
+            if c == b"\x04":  # End of data.
+                self.write(b"\x04")
+                return code
+            elif c == b"\x03":  # Abort.
+                self.write(b"\x04")
+                return None
+            code += c
+            window_remain -= 1
+            if window_remain == 0:
+                self.write(b"\x01")
+                window_remain = RAW_PASTE_WINDOW
+
+    def execute(self, code):
+        """Execute code and return its output in the raw REPL format."""
+        self.n_execs += 1
+        if self.exec_delay:
+            time.sleep(self.exec_delay)
+        self.output = io.StringIO()
+        error = ""
+        try:
+            self.run_code(code)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException as e:  # Includes pyControlError, which is not an Exception subclass.
+            error = "Traceback (most recent call last):\n" + self.error_message(e) + "\n"
+        return (self.output.getvalue() + "\x04" + error + "\x04").replace("\n", "\r\n").encode()
+
+    def run_code(self, code):
+        exec(compile(code.decode(), "<stdin>", "exec"), self.namespace)
+
+    def error_message(self, e):
+        """Format exception message as micropython does."""
+        if isinstance(e, ImportError):
+            return f"ImportError: no module named '{e.name}'"
+        return f"{type(e).__name__}: {e}"
@@ -0,0 +1,68 @@
+# Benchmark comparing task functions called with state and event names, e.g.
+# goto_state("state_1"), with the same calls using handles, e.g. goto_state(S.state_1).
+# Handles are state and event IDs, which are looked up in the same dicts as names, so the
+# calls are expected to take the same time.  Reports the fastest of several repeats of each
+# call, as the calls are short.
+
+import types
+import timeit
+from source.tests.benchmarks.board_stubs import load_pyControl
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+sm = pyControl.state_machine
+ut = pyControl.utility
+handles = pyControl.handles
+
+n_calls = 20000
+n_repeats = 7
+
+
+def setup_task():
+    """Set up and start a state machine with no behaviour functions."""
+    task = types.ModuleType("task_file")
+    task.states = [f"state_{i}" for i in range(10)]
+    task.events = [f"event_{i}" for i in range(20)]
+    task.initial_state = task.states[0]
+    ut._handlers.clear()
+    sm.setup_state_machine(task)
+    fw.current_time = 0
+    sm.start()
+
+
+def goto_state(state):
+    ut.goto_state(state)
+    fw.data_output_queue.get()  # Discard state transition output.
+
+
+def set_and_disarm_timer(event):
+    ut.set_timer(event, 100)
+    ut.disarm_timer(event)
+
+
+def publish_event(event):
+    ut.publish_event(event)
+    fw.event_queue.get()
+
+
+def time_calls(function, argument):
+    """Return time (us) per call of function(argument)."""
+    pyControl.timer.reset()
+    fw.data_output_queue.reset()
+    fw.event_queue.reset()
+    times = timeit.repeat(lambda: function(argument), number=n_calls, repeat=n_repeats)
+    return min(times) / n_calls * 1e6
+
+
+if __name__ == "__main__":
+    setup_task()
+    print(f"Time per call (us), fastest of {n_repeats} repeats of {n_calls} calls.")
+    print(f"{'function':>21} {'names':>7} {'handles':>8} {'ratio':>8}")
+    for function, name, handle in (
+        (goto_state, "state_3", handles.S.state_3),
+        (set_and_disarm_timer, "event_3", handles.E.event_3),
+        (publish_event, "event_3", handles.E.event_3),
+    ):
+        names_time = time_calls(function, name)
+        handles_time = time_calls(function, handle)
+        print(f"{function.__name__:>21} {names_time:>7.2f} {handles_time:>8.2f} {names_time / handles_time:>8.2f}")
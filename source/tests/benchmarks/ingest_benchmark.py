@@ -0,0 +1,147 @@
+# Benchmark comparing the host path analog data takes from a received message to disk, for an
+# Analog_group sampling 8 pins at 10 kHz.  Previously each message's samples were copied into
+# an array, and Analog_writer copied each channel's samples to a bytes object and wrote it to
+# a temp file along with a float64 time for every sample.  Now the message content is a numpy
+# view of the samples in the message, Analog_writer copies each channel's samples straight
+# into a memory mapped temp file and writes one chunk index entry per chunk.  A recorded
+# stream with the default and a larger chunk size is ingested by both paths.  Reports the
+# host time per sample, and the bytes per sample written to temp files and saved when the
+# files are closed, where a .timebase.npz file holding the chunk index is saved as well as the
+# .time.npy file of sample times, saved once for the group rather than for each channel.  Checks
+# the saved .data.npy files and each channel's .time.npy file from the previous path are
+# identical to those from the current path.
+
+import os
+import time
+import tempfile
+import numpy as np
+from array import array
+from source.communication import data_logger
+from source.communication.pycboard import MsgType
+from source.tests.benchmarks.serial_replay import replay_board
+from source.tests.benchmarks.checksum_benchmark import record_stream, n_pins, n_ticks
+
+# Previous implementation ------------------------------------------------------------
+
+
+def previous_process_message(board, message, checksum):
+    content_bytes = message[6:]
+    ID = int.from_bytes(content_bytes[:2], "little")
+    data = array(board.sm_info.analog_inputs[ID]["dtype"], content_bytes[2:])
+    assert checksum == (sum(message[:8]) + sum(data)) & 0xFFFF, "Bad data checksum."
+    return int.from_bytes(message[:4], "little"), (ID, data)
+
+
+class Previous_writer(data_logger.Analog_writer):
+    def open_data_files(self, session_filepath):
+        ses_path_stem, file_ext = os.path.splitext(session_filepath)
+        self.path_stems = [ses_path_stem + f"_{channel}" for channel in self.channels]
+        self.t_tempfile_paths = [path_stem + ".time.temp" for path_stem in self.path_stems]
+        self.d_tempfile_paths = [path_stem + f".data-1{self.data_type}.temp" for path_stem in self.path_stems]
+        self.time_tempfiles = [open(path, "wb") for path in self.t_tempfile_paths]
+        self.data_tempfiles = [open(path, "wb") for path in self.d_tempfile_paths]
+        self.next_chunk_start_time = 0
+
+    def temp_bytes(self):
+        return sum(os.path.getsize(path) for path in self.t_tempfile_paths + self.d_tempfile_paths)
+
+    def close_files(self):
+        for path_stem, t_tempfile_path, d_tempfile_path, time_tempfile, data_tempfile in zip(
+            self.path_stems, self.t_tempfile_paths, self.d_tempfile_paths, self.time_tempfiles, self.data_tempfiles
+        ):
+            time_tempfile.close()
+            data_tempfile.close()
+            with open(t_tempfile_path, "rb") as f:
+                np.save(path_stem + ".time.npy", np.frombuffer(f.read(), dtype="float64"))
+            with open(d_tempfile_path, "rb") as f:
+                np.save(path_stem + ".data.npy", np.frombuffer(f.read(), dtype=self.data_type))
+            os.remove(t_tempfile_path)
+            os.remove(d_tempfile_path)
+
+    def save_analog_chunk(self, timestamp, data_array):
+        if np.abs(self.next_chunk_start_time - timestamp / 1000) < 0.001:
+            chunk_start_time = self.next_chunk_start_time
+        else:
+            chunk_start_time = timestamp / 1000
+        n_samples = len(data_array) // len(self.channels)
+        times = (np.arange(n_samples, dtype="float64") / self.sampling_rate) + chunk_start_time
+        channel_data = np.frombuffer(data_array, dtype=self.data_type).reshape(n_samples, len(self.channels))
+        for i, (time_tempfile, data_tempfile) in enumerate(zip(self.time_tempfiles, self.data_tempfiles)):
+            time_tempfile.write(times.tobytes())
+            data_tempfile.write(channel_data[:, i].tobytes())
+            time_tempfile.flush()
+            data_tempfile.flush()
+        self.next_chunk_start_time = chunk_start_time + n_samples / self.sampling_rate
+
+
+# Current implementation -------------------------------------------------------------
+
+
+def current_process_message(board, message, checksum):
+    nd = board._process_message(message, checksum)
+    assert nd.type == MsgType.ANLOG, "Bad data checksum."
+    return nd.time, nd.content
+
+
+def current_temp_bytes(writer):
+    item_bytes = np.dtype(writer.data_type).itemsize
+    chunk_bytes = sum(os.path.getsize(path) for path in writer.c_tempfile_paths)
+    return writer.n_samples * item_bytes * len(writer.channels) + chunk_bytes
+
+
+# Benchmark --------------------------------------------------------------------------
+
+
+def ingest(data, analog_inputs, process_message, writer_class, temp_bytes, output_dir):
+    """Ingest analog messages from data, return time taken, bytes written to temp files and bytes saved."""
+    board = replay_board({}, {}, analog_inputs)
+    messages = []
+    i = 0
+    while i < len(data):
+        checksum = int.from_bytes(data[i + 1 : i + 3], "little")
+        message_len = int.from_bytes(data[i + 3 : i + 5], "little")
+        messages.append((data[i + 5 : i + 5 + message_len], checksum))
+        i += 5 + message_len
+    messages = [m for m in messages if m[0][4:5] == MsgType.ANLOG.value]
+    ID, info = next(iter(analog_inputs.items()))
+    channels = [f"ch_{i}" for i in range(n_pins)]
+    writer = writer_class(info["name"], info["fs"], info["dtype"], os.path.join(output_dir, "session.tsv"), channels)
+    t0 = time.perf_counter()
+    for message, checksum in messages:
+        timestamp, (ID, samples) = process_message(board, message, checksum)
+        writer.save_analog_chunk(timestamp, samples)
+    ingest_time = time.perf_counter() - t0
+    n_temp_bytes = temp_bytes(writer)
+    writer.close_files()
+    n_saved_bytes = sum(os.path.getsize(os.path.join(output_dir, file_name)) for file_name in os.listdir(output_dir))
+    return ingest_time, n_temp_bytes, n_saved_bytes
+
+
+if __name__ == "__main__":
+    print(f"{n_pins} pins at 10 kHz for {n_ticks} ticks, per sample: host time (ns), temp file and saved bytes.")
+    print(f"{'':>11} {'host time':^26} {'temp bytes':^18} {'saved bytes':^18}")
+    print(
+        f"{'chunk bytes':>11} {'previous':>9} {'current':>8} {'speedup':>7} "
+        f"{'previous':>9} {'current':>8} {'previous':>9} {'current':>8}"
+    )
+    n_samples = n_pins * (n_ticks - 1)
+    for max_chunk_bytes in (256, 4096):
+        data, analog_inputs = record_stream(max_chunk_bytes)
+        previous_dir, current_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        previous_time, previous_bytes, previous_saved = ingest(
+            data, analog_inputs, previous_process_message, Previous_writer, Previous_writer.temp_bytes, previous_dir
+        )
+        current_time, current_bytes, current_saved = ingest(
+            data, analog_inputs, current_process_message, data_logger.Analog_writer, current_temp_bytes, current_dir
+        )
+        group_times_name = "session_" + next(iter(analog_inputs.values()))["name"] + ".time.npy"
+        for file_name in os.listdir(previous_dir):  # .data.npy and .time.npy files.
+            previous_array = np.load(os.path.join(previous_dir, file_name))
+            current_name = group_times_name if file_name.endswith(".time.npy") else file_name
+            current_array = np.load(os.path.join(current_dir, current_name))
+            assert np.array_equal(previous_array, current_array), f"{file_name} differs."
+        print(
+            f"{max_chunk_bytes:>11} {previous_time / n_samples * 1e9:>9.1f} {current_time / n_samples * 1e9:>8.1f} "
+            f"{previous_time / current_time:>7.2f} {previous_bytes / n_samples:>9.2f} {current_bytes / n_samples:>8.2f} "
+            f"{previous_saved / n_samples:>9.2f} {current_saved / n_samples:>8.2f}"
+        )
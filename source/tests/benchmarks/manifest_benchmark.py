@@ -0,0 +1,109 @@
+# Benchmark of the time taken and number of raw REPL commands used to connect to a board
+# with the framework already loaded, load a hardware definition and set up a state machine,
+# as when a board is reconnected to run a task in a new session, and to reload the framework,
+# as when the framework is loaded on all boards from the setups tab.  Without a saved manifest
+# cache, files on the board must be hashed to check whether they need transferring.  With the
+# manifest cache saved by the previous session, hashes of files whose size and modification
+# time are unchanged are reused, so only new or changed files are hashed.  Also checks that a
+# file edited on the board outside pyControl, keeping its size, is transferred again.  Boards
+# are emulated by Board_emulator, with delays modelling the time taken by the board to execute
+# commands, soft reboot and read files.
+
+import os
+import time
+from source.communication import pycboard
+from source.communication.pycboard import Pycboard, _djb2_file
+from source.tests.benchmarks.board_emulator import Board_emulator
+from source.tests.benchmarks.benchmark_helpers import no_print
+
+task_dir = os.path.join("tasks", "example")
+task_name = "blinker"
+hwd_path = os.path.join("hardware_definitions", "example_hardware_definition.py")
+exec_delay = 0.002  # Seconds.
+reset_delay = 0.05  # Seconds.
+read_delay = 20e-6  # Seconds per file read, hashing reads 4 bytes at a time.
+
+
+class Counting_pycboard(Pycboard):
+    """Pycboard which counts the commands sent to the raw REPL."""
+
+    n_commands = 0
+
+    def exec_raw_no_follow(self, command):
+        Counting_pycboard.n_commands += 1
+        super().exec_raw_no_follow(command)
+
+
+def time_session(port):
+    """Return times taken and commands used to connect to board, load the hardware
+    definition and set up a state machine."""
+    times, commands = [], []
+    Counting_pycboard.n_commands = 0
+    t0 = time.perf_counter()
+    board = Counting_pycboard(port, verbose=False, print_func=no_print)
+    for step in (
+        lambda: None,
+        lambda: board.load_hardware_definition(hwd_path),
+        lambda: board.setup_state_machine(task_name, sm_dir=task_dir),
+    ):
+        step()
+        times.append(time.perf_counter() - t0)
+        commands.append(Counting_pycboard.n_commands)
+        Counting_pycboard.n_commands = 0
+        t0 = time.perf_counter()
+    assert board.status["framework"] and board.sm_info.states, "Board not set up correctly."
+    board.close()
+    return times, commands
+
+
+def time_load_framework(port):
+    """Return time taken and commands used to connect to board and reload the framework."""
+    Counting_pycboard.n_commands = 0
+    t0 = time.perf_counter()
+    board = Counting_pycboard(port, verbose=False, print_func=no_print)
+    board.load_framework()
+    run_time = time.perf_counter() - t0
+    assert board.status["framework"], "Framework not loaded correctly."
+    board.close()
+    return run_time, Counting_pycboard.n_commands
+
+
+def edit_file_on_board(file_path):
+    """Change a byte of file on the board's filesystem, keeping its size, as if edited over USB
+    mass storage, and advance its modification time."""
+    with open(file_path, "r+b") as f:
+        first_byte = f.read(1)
+        f.seek(0)
+        f.write(b"#" if first_byte != b"#" else b" ")
+    file_mtime = os.stat(file_path).st_mtime + 10
+    os.utime(file_path, (file_mtime, file_mtime))
+
+
+if __name__ == "__main__":
+    emulator = Board_emulator(exec_delay=exec_delay, reset_delay=reset_delay, read_delay=read_delay)
+    board = Pycboard(emulator.port, verbose=False, print_func=no_print)
+    board.load_framework()
+    board.close()
+    time_session(emulator.port)  # Transfer hardware definition, device and task files to board.
+    print("Time (s) and raw REPL commands for each step of a new session, all files already on board.")
+    print(f"{'manifest cache':>15} {'connect':>12} {'hardware':>12} {'task':>12}")
+    for name in ("none", "saved"):
+        if name == "none":
+            os.remove(pycboard.MANIFEST_CACHE_PATH)
+        Pycboard.manifest_cache = None  # New session, cache is loaded from disk.
+        times, commands = time_session(emulator.port)
+        print(f"{name:>15}" + "".join(f" {t:>7.3f} {n:>4}" for t, n in zip(times, commands)))
+    board_hwd_path = os.path.join(emulator.fs_dir, "hardware_definition.py")
+    edit_file_on_board(board_hwd_path)
+    Pycboard.manifest_cache = None
+    time_session(emulator.port)
+    assert _djb2_file(board_hwd_path) == _djb2_file(hwd_path), "File edited on board not transferred again."
+    print("\nTime (s) and raw REPL commands to connect and reload the framework in a new session.")
+    print(f"{'manifest cache':>15} {'framework':>12}")
+    for name in ("none", "saved"):
+        if name == "none":
+            os.remove(pycboard.MANIFEST_CACHE_PATH)
+        Pycboard.manifest_cache = None
+        run_time, n_commands = time_load_framework(emulator.port)
+        print(f"{name:>15} {run_time:>7.3f} {n_commands:>4}")
+    emulator.close()
@@ -0,0 +1,47 @@
+# Benchmark comparing output of framework data one message per serial write (output_data)
+# with batched output that packs several messages into each write (output_data_batch).
+# Messages are sent to a simulated USB_VCP which models a fixed cost per write call.
+
+import time
+from source.tests.benchmarks.board_stubs import load_pyControl
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+
+
+def fill_output_queue(n_messages):
+    """Put a mix of event, state and print messages in the data output queue."""
+    fw.data_output_queue = fw.Event_queue("Data output queue", capacity=n_messages)
+    for i in range(n_messages):
+        if i % 10 == 0:
+            fw.data_output_queue.put(fw.Datatuple(i, fw.PRINT_TYP, "t", f"trial {i} reward"))
+        elif i % 3 == 0:
+            fw.data_output_queue.put(fw.Datatuple(i, fw.STATE_TYP, "", 3))
+        else:
+            fw.data_output_queue.put(fw.Datatuple(i, fw.EVENT_TYP, "i", 12))
+
+
+def run_output(batch, n_messages):
+    """Return bytes sent, number of serial writes and time taken to output n_messages."""
+    fill_output_queue(n_messages)
+    fw.usb_serial.reset()
+    t0 = time.perf_counter()
+    while fw.data_output_queue.available:
+        if batch:
+            fw.output_data_batch()
+        else:
+            fw.output_data(fw.data_output_queue.get())
+    return bytes(fw.usb_serial.data), fw.usb_serial.n_writes, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    n_messages = 20000
+    print(f"{n_messages} messages")
+    print(f"{'write cost (us)':>16} {'mode':>8} {'writes':>8} {'messages/s':>12}")
+    for write_overhead_us in (0, 20, 100):
+        fw.usb_serial.write_overhead_us = write_overhead_us
+        single_data, single_writes, single_time = run_output(False, n_messages)
+        batch_data, batch_writes, batch_time = run_output(True, n_messages)
+        assert single_data == batch_data, "Batched output differs from single message output."
+        print(f"{write_overhead_us:>16} {'single':>8} {single_writes:>8} {n_messages / single_time:>12.0f}")
+        print(f"{write_overhead_us:>16} {'batch':>8} {batch_writes:>8} {n_messages / batch_time:>12.0f}")
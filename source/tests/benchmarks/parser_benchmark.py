@@ -0,0 +1,77 @@
+# Benchmark comparing host side parsing of event and state messages sent with text encoded
+# IDs (framework versions < 2.1) and binary encoded IDs.  Message streams are generated
+# by the framework output code running on the host, then parsed by Pycboard.process_data.
+
+import time
+import random
+from source.tests.benchmarks.board_stubs import load_pyControl
+from source.tests.benchmarks.serial_replay import replay_board
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+
+n_states = 20
+n_events = 100
+states = {f"state_{i}": i for i in range(1, n_states + 1)}
+events = {f"event_{i}": i for i in range(n_states + 1, n_states + n_events + 1)}
+
+
+def board_output(binary_IDs, n_messages, seed=0):
+    """Return the bytes output by the framework for n_messages event and state messages."""
+    rng = random.Random(seed)
+    fw.binary_IDs = binary_IDs
+    fw.data_output_queue = fw.Event_queue("Data output queue", capacity=n_messages)
+    for i in range(n_messages):
+        if i % 4 == 0:
+            fw.data_output_queue.put(fw.Datatuple(i, fw.STATE_TYP, "", rng.choice(list(states.values()))))
+        else:
+            fw.data_output_queue.put(fw.Datatuple(i, fw.EVENT_TYP, "i", rng.choice(list(events.values()))))
+    fw.usb_serial.reset()
+    while fw.data_output_queue.available:
+        fw.output_data_batch()
+    return bytes(fw.usb_serial.data)
+
+
+def parse(data, binary_IDs):
+    """Parse data with Pycboard.process_data, return parsed Datatuples and time taken."""
+    board = replay_board(states, events)
+    board.binary_IDs = binary_IDs
+    board.serial.load(data)
+    t0 = time.perf_counter()
+    board.process_data()
+    return board.data_collector.data, time.perf_counter() - t0
+
+
+def decode_contents(data, binary_IDs):
+    """Time decoding of just the ID content of each message."""
+    contents = []
+    i = 0
+    while i < len(data):
+        message_len = int.from_bytes(data[i + 3 : i + 5], "little")
+        contents.append(data[i + 11 : i + 5 + message_len])
+        i += 5 + message_len
+    t0 = time.perf_counter()
+    if binary_IDs:
+        IDs = [int.from_bytes(c, "little") for c in contents]
+    else:
+        IDs = [int(c.decode()) for c in contents]
+    return IDs, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    n_messages = 100000
+    text_data = board_output(False, n_messages)
+    binary_data = board_output(True, n_messages)
+    text_parsed, text_time = parse(text_data, False)
+    binary_parsed, binary_time = parse(binary_data, True)
+    assert text_parsed == binary_parsed, "Text and binary encoded messages parsed differently."
+    text_IDs, text_decode_time = decode_contents(text_data, False)
+    binary_IDs, binary_decode_time = decode_contents(binary_data, True)
+    assert text_IDs == binary_IDs
+    print(f"{n_messages} event and state messages")
+    print(f"{'encoding':>10} {'bytes':>10} {'process_data (msg/s)':>22} {'ID decode (msg/s)':>20}")
+    for name, data, parse_time, decode_time in (
+        ("text", text_data, text_time, text_decode_time),
+        ("binary", binary_data, binary_time, binary_decode_time),
+    ):
+        print(f"{name:>10} {len(data):>10} {n_messages / parse_time:>22.0f} {n_messages / decode_time:>20.0f}")
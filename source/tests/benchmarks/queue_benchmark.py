@@ -0,0 +1,52 @@
+# Check that the fixed capacity event and data output queues lose no records under the
+# workloads of task_benchmark.py, which ran with queues that grew without limit before
+# Event_queue became a ring buffer.  Example tasks run on boards emulated by Board_emulator
+# with the board's clock going as fast as possible, the default queue capacities, the "raise"
+# overflow policy rather than the default "grow", and main loop profiling on.  The run fails with an error if
+# either queue overflows, so the check asserts that no error was received, that the profile
+# report shows no dropped items, and that every record put in the data output queue was
+# received by the host.  Reports the high water mark of each queue against its capacity.
+
+import json
+from source.communication.message import MsgType
+from source.tests.benchmarks.task_benchmark import connect, stop_run, task_dir, run_ms
+
+workloads = {  # {name: (task_name, input_rates)}
+    "button 100 Hz": ("button", {"X17": 100}),
+    "button 1 kHz": ("button", {"X17": 1000}),
+    "running_wheel": ("running_wheel", {}),
+}
+
+
+def run_workload(task_name, input_rates):
+    """Run task for run_ms of task time, return the data received and the profile report."""
+    emulator, board = connect(speed=None, input_rates=input_rates)
+    board.setup_state_machine(task_name, sm_dir=task_dir)
+    collector = board.data_consumers[0]
+    board.start_framework(profile=True, queue_overflow="raise")
+    while not (collector.data and collector.data[-1].time >= run_ms):
+        board.process_data()
+    stop_run(board)
+    capacities = (int(board.eval("fw.event_queue.capacity")), int(board.eval("fw.data_output_queue.capacity")))
+    board.close()
+    emulator.close()
+    report = next(json.loads(nd.content) for nd in collector.data if nd.type == MsgType.PROFL)
+    return collector.data, report, capacities
+
+
+if __name__ == "__main__":
+    print(f"{run_ms/1000:.0f} s of task time, queue high water mark / capacity.")
+    print(f"{'workload':>14} {'messages':>9} {'event queue':>12} {'output queue':>13} {'dropped':>8}")
+    for name, (task_name, input_rates) in workloads.items():
+        data, report, (event_capacity, output_capacity) = run_workload(task_name, input_rates)
+        event_report, output_report = report["event_queue"], report["data_output_queue"]
+        assert not [nd for nd in data if nd.type == MsgType.ERROR], "Error during framework run."
+        assert event_report["dropped"] == 0 and output_report["dropped"] == 0, "Queue items dropped."
+        # Items put in data output queue after the profile report is made are the report and stop messages.
+        n_received = sum(nd.type != MsgType.ANLOG for nd in data)
+        assert n_received == output_report["puts"] + 2, "Data output records lost."
+        print(
+            f"{name:>14} {len(data):>9} {event_report['high_water_mark']:>5} / {event_capacity:<4} "
+            f"{output_report['high_water_mark']:>6} / {output_capacity:<4} "
+            f"{event_report['dropped'] + output_report['dropped']:>8}"
+        )
@@ -0,0 +1,185 @@
+# Benchmark comparing the Pycboard.process_data parser, which reads all available bytes in
+# one call and frames messages incrementally, with the previous parser which read the
+# serial line one byte at a time.  A recorded stream of framework output containing
+# events, states, prints, variables and analog data is replayed through both parsers, and
+# through the new parser in randomly sized chunks to check that messages split across
+# reads are handled correctly.
+
+import time
+import json
+import random
+from array import array
+from source.communication.pycboard import MsgType, Datatuple, PyboardError
+from source.tests.benchmarks.board_stubs import load_pyControl
+from source.tests.benchmarks.serial_replay import replay_board, Replay_serial
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+
+states = {f"state_{i}": i for i in range(1, 11)}
+events = {f"event_{i}": i for i in range(11, 51)}
+
+# Previous byte at a time parser ------------------------------------------------------
+
+
+def process_data_bytewise(self):
+    new_data = []
+    error_message = None
+    unexpected_input = []
+    while self.serial.in_waiting > 0:
+        new_byte = self.serial.read(1)
+        if new_byte == b"\x07":  # Start of pyControl message.
+            if unexpected_input:
+                new_data.append(
+                    Datatuple(
+                        time=self.get_timestamp(),
+                        type=MsgType.WARNG,
+                        content="Unexpected input received from board: " + "".join(unexpected_input),
+                    )
+                )
+                unexpected_input = []
+            checksum = int.from_bytes(self.serial.read(2), "little")
+            message_len = int.from_bytes(self.serial.read(2), "little")
+            message = self.serial.read(message_len)
+            msg_type = MsgType.from_byte(message[4:5])
+            subtype_byte = message[5:6]
+            msg_subtype = msg_type.get_subtype(subtype_byte.decode())
+            content_bytes = message[6:]
+            if msg_type == MsgType.ANLOG:
+                ID = int.from_bytes(content_bytes[:2], "little")
+                data = array(self.sm_info.analog_inputs[ID]["dtype"], content_bytes[2:])
+                content = (ID, data)
+                msg_sum = sum(message[:8]) + sum(data)
+            else:
+                msg_sum = sum(message)
+            if checksum == (msg_sum & 0xFFFF):
+                msg_timestamp = int.from_bytes(message[:4], "little")
+                if msg_timestamp > self.timestamp:
+                    self.last_message_time = time.time()
+                    self.timestamp = msg_timestamp
+                if msg_type in (MsgType.EVENT, MsgType.STATE):
+                    if self.binary_IDs:
+                        content = int.from_bytes(content_bytes, "little")
+                    else:
+                        content = int(content_bytes.decode())
+                elif msg_type in (MsgType.PRINT, MsgType.WARNG):
+                    content = content_bytes.decode()
+                elif msg_type == MsgType.VARBL:
+                    content = content_bytes.decode()
+                    self.sm_info.variables.update(json.loads(content))
+                new_data.append(Datatuple(time=msg_timestamp, type=msg_type, subtype=msg_subtype, content=content))
+            else:
+                new_data.append(Datatuple(time=self.get_timestamp(), type=MsgType.WARNG, content="Bad data checksum."))
+        elif new_byte == b"\x04":
+            self.framework_running = False
+            data_err = self.read_until(2, b"\x04>", timeout=10)
+            if len(data_err) > 2:
+                error_message = data_err[:-3].decode()
+                new_data.append(Datatuple(time=self.get_timestamp(), type=MsgType.ERROR, content=error_message))
+            break
+        else:
+            unexpected_input.append(new_byte.decode())
+    if new_data:
+        self.data_logger.process_data(new_data)
+        if self.data_consumers:
+            for data_consumer in self.data_consumers:
+                data_consumer.process_data(new_data)
+    if error_message:
+        raise PyboardError(error_message)
+
+
+# Recorded stream ---------------------------------------------------------------------
+
+
+def analog_message(ID, timestamp, samples, data_type):
+    """Return analog data message in the format sent by Analog_channel.send_buffer."""
+    data = array(data_type, samples).tobytes()
+    message = timestamp.to_bytes(4, "little") + b"A_" + ID.to_bytes(2, "little")
+    checksum = (sum(message) + sum(samples)) & 0xFFFF
+    message_len = len(message) + len(data)
+    return b"\x07" + checksum.to_bytes(2, "little") + message_len.to_bytes(2, "little") + message + data
+
+
+def record_stream(n_messages, seed=0):
+    """Return bytes output by the framework for a session with n_messages framework
+    messages and an analog input sampled at 1kHz, plus the analog_inputs dict."""
+    rng = random.Random(seed)
+    fw.usb_serial.reset()
+    fw.usb_serial.write(b"MPY: sync filesystems\r\n")  # Unexpected input.
+    analog_ID = 1
+    samples = []
+    for i in range(n_messages):
+        fw.current_time = i
+        r = rng.random()
+        if r < 0.5:
+            event = fw.Datatuple(i, fw.EVENT_TYP, "i", rng.choice(list(events.values())))
+        elif r < 0.8:
+            event = fw.Datatuple(i, fw.STATE_TYP, "", rng.choice(list(states.values())))
+        elif r < 0.95:
+            event = fw.Datatuple(i, fw.PRINT_TYP, "t", f"trial {i} outcome {rng.randint(0, 1)}")
+        else:
+            event = fw.Datatuple(i, fw.VARBL_TYP, "s", json.dumps({"reward_prob": rng.random()}))
+        fw.output_data(event)
+        samples.append(rng.randint(0, 4095))
+        if len(samples) == 100:
+            fw.usb_serial.write(analog_message(analog_ID, i - 99, samples, "H"))
+            samples = []
+    fw.output_data(fw.Datatuple(n_messages, fw.STOPF_TYP, "", ""))
+    fw.usb_serial.write(b"\x04\x04>")
+    analog_inputs = {analog_ID: {"name": "signal", "fs": 1000, "dtype": "H", "plot": True}}
+    return bytes(fw.usb_serial.data), analog_inputs
+
+
+def parse(data, analog_inputs, parser, chunk_sizes=None):
+    """Return Datatuples output by parser for data and time taken. If chunk_sizes is
+    a (min, max) tuple, data is delivered in randomly sized chunks between calls."""
+    board = replay_board(states, events, analog_inputs)
+    board.serial.load(data, available=chunk_sizes is None)
+    rng = random.Random(1)
+    t0 = time.perf_counter()
+    while board.framework_running:
+        if chunk_sizes:
+            board.serial.deliver(rng.randint(*chunk_sizes))
+        parser(board)
+    return board.data_collector.data, time.perf_counter() - t0
+
+
+def comparable(data):
+    # Warnings generated on the host are timestamped with the host clock so ignore their time.
+    # The previous parser set the content of stop framework messages to that of the preceding
+    # message, the new parser sets it to None, so ignore their content.  Analog data is an
+    # array from the previous parser and a numpy array from the new parser, so compare as lists.
+    comparable_data = []
+    for nd in data:
+        if nd.type == MsgType.WARNG:
+            nd = nd._replace(time=None)
+        elif nd.type == MsgType.STOPF:
+            nd = nd._replace(content=None)
+        elif nd.type == MsgType.ANLOG:
+            nd = nd._replace(content=(nd.content[0], nd.content[1].tolist()))
+        comparable_data.append(nd)
+    return comparable_data
+
+
+if __name__ == "__main__":
+    n_messages = 50000
+    data, analog_inputs = record_stream(n_messages)
+    print(f"{len(data)} bytes")
+    print(f"{'read cost (us)':>15} {'parser':>16} {'time (s)':>10} {'messages/s':>12} {'MB/s':>8}")
+    for read_overhead_us in (0, 5):
+        Replay_serial.read_overhead_us = read_overhead_us
+        bytewise_data, bytewise_time = parse(data, analog_inputs, process_data_bytewise)
+        bulk_data, bulk_time = parse(data, analog_inputs, lambda board: board.process_data())
+        chunked_data, chunked_time = parse(data, analog_inputs, lambda board: board.process_data(), (1, 4096))
+        assert comparable(bytewise_data) == comparable(bulk_data), "Parsers output different data."
+        assert comparable(bytewise_data) == comparable(chunked_data), "Chunked parsing output different data."
+        n_parsed = len(bulk_data)
+        for name, parse_time in (
+            ("byte at a time", bytewise_time),
+            ("bulk", bulk_time),
+            ("bulk, chunked", chunked_time),
+        ):
+            print(
+                f"{read_overhead_us:>15} {name:>16} {parse_time:>10.3f} "
+                f"{n_parsed / parse_time:>12.0f} {len(data) / parse_time / 1e6:>8.2f}"
+            )
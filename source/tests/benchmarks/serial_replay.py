@@ -0,0 +1,77 @@
+# Helpers for feeding recorded board output through the host side Pycboard parser without
+# a serial connection.
+
+import time
+from source.communication.pycboard import Pycboard, State_machine_info
+from source.tests.benchmarks.benchmark_helpers import Data_collector, no_print
+
+
+class Replay_serial:
+    """Stand in for serial.Serial that returns bytes from a recorded stream.  If
+    load is called with available=False, bytes are only readable after they have been
+    made available by calling deliver, to simulate data arriving in chunks.  Each read
+    busy-waits for read_overhead_us to model the fixed cost of a serial read call."""
+
+    read_overhead_us = 0
+    timeout = None
+
+    def __init__(self, data=b""):
+        self.load(data)
+
+    def load(self, data, available=True):
+        self.data = bytes(data)
+        self.position = 0
+        self.available = len(self.data) if available else 0
+
+    def deliver(self, n_bytes):
+        self.available = min(len(self.data), self.available + n_bytes)
+
+    @property
+    def in_waiting(self):
+        return self.available - self.position
+
+    def read(self, size=1):
+        if self.read_overhead_us:
+            t_end = time.perf_counter() + self.read_overhead_us * 1e-6
+            while time.perf_counter() < t_end:
+                pass
+        chunk = self.data[self.position : min(self.position + size, self.available)]
+        self.position += len(chunk)
+        return chunk
+
+    def write(self, data):
+        return len(data)
+
+    def reset_input_buffer(self):
+        self.position = self.available
+
+
+def replay_board(states, events, analog_inputs={}):
+    """Return a Pycboard that reads from a Replay_serial, with its data logger
+    bypassed and a Data_collector as its only data consumer."""
+    board = Pycboard.__new__(Pycboard)
+    board.serial = Replay_serial()
+    board.print = no_print
+    board.data_collector = Data_collector()
+    board.data_logger = Data_collector()
+    board.data_consumers = [board.data_collector]
+    board.framework_running = True
+    board.binary_IDs = False
+    board.rx_buffer = bytearray()
+    board.read_buffer = bytearray()
+    board.reader = None
+    board.serial_port = "replay"
+    board.timestamp = 0
+    board.last_message_time = time.time()
+    board.sm_info = State_machine_info(
+        name="replay",
+        task_hash=0,
+        states=states,
+        events=events,
+        ID2name={ID: name for name, ID in {**states, **events}.items()},
+        analog_inputs=analog_inputs,
+        variables={},
+        framework_version="",
+        micropython_version=0,
+    )
+    return board
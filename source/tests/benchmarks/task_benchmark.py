@@ -0,0 +1,88 @@
+# End to end benchmark which runs example tasks from tasks/example on boards emulated by
+# Board_emulator, connected to an unmodified Pycboard.  Throughput: tasks run with the
+# board's clock going as fast as possible and inputs driven by random pulses, measuring
+# the task time and data messages processed by the board and host per second.  Latency:
+# the button task runs in real time and events triggered from the host are timed from
+# sending the event to receiving it back in the board's data output.
+
+import time
+import statistics
+from source.communication.pycboard import Pycboard
+from source.communication.message import MsgType
+from source.tests.benchmarks.board_emulator import Board_emulator
+from source.tests.benchmarks.benchmark_helpers import Data_collector, no_print
+
+task_dir = "tasks/example"
+run_ms = 60000  # Task time of each throughput run (ms).
+throughput_tasks = {  # {task_name: input_rates}
+    "button": {"X17": 100},
+    "running_wheel": {},
+}
+n_latency_trials = 200
+
+
+def connect(**board_kwargs):
+    """Start an emulated board, load the framework and return the emulator and board."""
+    emulator = Board_emulator(**board_kwargs)
+    board = Pycboard(emulator.port, verbose=False, print_func=no_print, data_consumers=[Data_collector()])
+    board.load_framework()
+    return emulator, board
+
+
+def stop_run(board):
+    """Stop framework and process data until the stop framework message is received."""
+    board.stop_framework()
+    collector = board.data_consumers[0]
+    while not (collector.data and collector.data[-1].type == MsgType.STOPF):
+        board.process_data()
+
+
+def run_throughput(task_name, input_rates):
+    """Run task for run_ms of task time, return wall time taken and messages received."""
+    emulator, board = connect(speed=None, input_rates=input_rates)
+    board.setup_state_machine(task_name, sm_dir=task_dir)
+    collector = board.data_consumers[0]
+    t0 = time.perf_counter()
+    board.start_framework()
+    while not (collector.data and collector.data[-1].time >= run_ms):
+        board.process_data()
+    run_time = time.perf_counter() - t0
+    stop_run(board)
+    board.close()
+    emulator.close()
+    return run_time, len(collector.data)
+
+
+def run_latency():
+    """Return list of times (ms) from triggering an event on the host to receiving it."""
+    emulator, board = connect(speed=1)
+    board.setup_state_machine("button", sm_dir=task_dir)
+    collector = board.data_consumers[0]
+    event_ID = board.sm_info.events["button_press"]
+    board.start_framework()
+    latencies = []
+    for i in range(n_latency_trials):
+        collector.data.clear()
+        t0 = time.perf_counter()
+        board.trigger_event("button_press")
+        while not any(d.type == MsgType.EVENT and d.content == event_ID for d in collector.data):
+            time.sleep(0.0005)  # Poll serial line without monopolising the CPU.
+            board.process_data()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        time.sleep(0.01)
+    stop_run(board)
+    board.close()
+    emulator.close()
+    return latencies
+
+
+if __name__ == "__main__":
+    print(f"Throughput, {run_ms/1000:.0f} s of task time with board clock running as fast as possible.")
+    print(f"{'task':>14} {'time (s)':>9} {'x real time':>12} {'messages/s':>11}")
+    for task_name, input_rates in throughput_tasks.items():
+        run_time, n_messages = run_throughput(task_name, input_rates)
+        print(f"{task_name:>14} {run_time:>9.3f} {run_ms / 1000 / run_time:>12.1f} {n_messages / run_time:>11.0f}")
+    latencies = sorted(run_latency())
+    print(f"\nLatency from triggering event on host to receiving it, {n_latency_trials} events, real time.")
+    print(f"{'median (ms)':>12} {'95% (ms)':>9} {'max (ms)':>9}")
+    print(f"{statistics.median(latencies):>12.2f} {latencies[int(0.95 * len(latencies))]:>9.2f} {latencies[-1]:>9.2f}")
@@ -0,0 +1,92 @@
+# Benchmark comparing the heap based timer scheduler in source/pyControl/timer.py with the
+# sorted list implementation it replaced.  The workload mimics a task with many pending
+# timers: each iteration sets a timer, disarms a timer for a random event, and advances
+# the clock processing any elapsed timers.
+
+import time
+import random
+from source.tests.benchmarks.board_stubs import load_pyControl
+
+pyControl = load_pyControl()
+fw = pyControl.framework
+heap_timer = pyControl.timer
+
+# Previous list based implementation -------------------------------------------------
+
+
+class List_timer:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.active_timers = []
+        self.paused_timers = []
+        self.elapsed = False
+
+    def set(self, interval, event_type, subtype, content):
+        self.active_timers.append(fw.Datatuple(fw.current_time + int(interval), event_type, subtype, content))
+        self.active_timers.sort(reverse=True)
+
+    def check(self):
+        self.elapsed = bool(self.active_timers) and (self.active_timers[-1][0] <= fw.current_time)
+
+    def get(self):
+        event_tuple = self.active_timers.pop()
+        self.elapsed = bool(self.active_timers) and (self.active_timers[-1][0] <= fw.current_time)
+        return event_tuple
+
+    def disarm(self, event_ID):
+        self.active_timers = [t for t in self.active_timers if not (t.content == event_ID and t.type == fw.EVENT_TYP)]
+        self.paused_timers = [t for t in self.paused_timers if not t.content == event_ID]
+
+    def remaining(self, event_ID):
+        try:
+            return next(
+                t.time - fw.current_time
+                for t in reversed(self.active_timers)
+                if (t.type == fw.EVENT_TYP and t.content == event_ID)
+            )
+        except StopIteration:
+            return 0
+
+    def disarm_type(self, event_type):
+        self.active_timers = [t for t in self.active_timers if not t.type == event_type]
+
+
+# Benchmark --------------------------------------------------------------------------
+
+
+def run_workload(timer, n_pending, n_iterations=20000, n_events=50, seed=0):
+    """Keep approximately n_pending timers active while setting, disarming and
+    processing timers. Return the sequence of fired timers and the time taken."""
+    rng = random.Random(seed)
+    fw.current_time = 0
+    timer.reset()
+    for i in range(n_pending):
+        timer.set(rng.randint(1, 2 * n_pending), fw.EVENT_TYP, "t", rng.randint(1, n_events))
+    fired = []
+    t0 = time.perf_counter()
+    for i in range(n_iterations):
+        event_ID = rng.randint(1, n_events)
+        timer.set(rng.randint(1, 2 * n_pending), fw.EVENT_TYP, "t", event_ID)
+        timer.set(5, fw.HARDW_TYP, "", event_ID)
+        if i % 10 == 0:
+            timer.disarm(rng.randint(1, n_events))
+            timer.remaining(rng.randint(1, n_events))
+        if i % 25 == 0:
+            timer.set(rng.randint(1, 100), fw.STATE_TYP, "", 1)
+            timer.disarm_type(fw.STATE_TYP)
+        fw.current_time += 1
+        timer.check()
+        while timer.elapsed:
+            fired.append(tuple(timer.get()))
+    return fired, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    print(f"{'pending':>8} {'list (s)':>10} {'heap (s)':>10} {'speedup':>8}")
+    for n_pending in (10, 100, 500, 2000):
+        list_fired, list_time = run_workload(List_timer(), n_pending)
+        heap_fired, heap_time = run_workload(heap_timer, n_pending)
+        assert list_fired == heap_fired, "Heap and list timers fired different events."
+        print(f"{n_pending:>8} {list_time:>10.3f} {heap_time:>10.3f} {list_time / heap_time:>8.1f}")
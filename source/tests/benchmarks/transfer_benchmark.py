@@ -0,0 +1,65 @@
+# Benchmark of file transfer throughput from the host to a board, comparing the stop-and-wait
+# transfer of 512 byte chunks, with commands sent to the raw REPL in 256 byte chunks every
+# 10ms, against windowed transfer of CRC checked blocks with commands sent in raw-paste mode.
+# Boards are emulated by Board_emulator, with a simulated USB link with round trip latency
+# and optionally corruption of received data.
+
+import os
+import time
+import tempfile
+from source.communication.pycboard import Pycboard, PyboardError, _djb2_file
+from source.tests.benchmarks.board_emulator import Board_emulator
+from source.tests.benchmarks.benchmark_helpers import no_print
+
+link_latency = 0.001  # Seconds.
+framework_dir = os.path.join("source", "pyControl")
+
+
+def transfer_files(board, file_paths, windowed):
+    """Transfer files to an empty folder on the board, return time taken or None if
+    the transfer failed."""
+    board.exec(
+        "if 'test' in os.listdir():\n [os.remove('test/' + f) for f in os.listdir('test')]\nelse:\n os.mkdir('test')"
+    )
+    board.update_file_manifest()
+    if not windowed:
+        board.transfer_block_size = None
+        board.use_raw_paste = False
+    t0 = time.perf_counter()
+    try:
+        for file_path in file_paths:
+            board.transfer_file(file_path, "test/" + os.path.basename(file_path))
+    except PyboardError:
+        return None
+    transfer_time = time.perf_counter() - t0
+    for file_path in file_paths:
+        assert board.get_file_hash("test/" + os.path.basename(file_path)) == _djb2_file(file_path)
+    return transfer_time
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as temp_dir:
+        large_file = os.path.join(temp_dir, "large_file.bin")
+        with open(large_file, "wb") as f:
+            f.write(os.urandom(200000))
+        file_sets = {
+            "framework": [os.path.join(framework_dir, f) for f in os.listdir(framework_dir) if f.endswith(".py")],
+            "200kB file": [large_file],
+        }
+        print(f"Simulated link round trip latency {link_latency*1000:.0f}ms.")
+        print(f"{'files':>11} {'corruption':>11} {'transfer':>14} {'time (s)':>9} {'kB/s':>8}")
+        for corrupt_prob in (0, 0.01):
+            emulator = Board_emulator(link_latency=link_latency, corrupt_prob=corrupt_prob)
+            for files_name, file_paths in file_sets.items():
+                n_bytes = sum(os.path.getsize(file_path) for file_path in file_paths)
+                for windowed in (False, True):
+                    board = Pycboard(emulator.port, verbose=False, print_func=no_print)
+                    transfer_time = transfer_files(board, file_paths, windowed)
+                    board.close()
+                    result = (
+                        f"{transfer_time:>9.3f} {n_bytes / transfer_time / 1000:>8.1f}" if transfer_time else "failed"
+                    )
+                    print(
+                        f"{files_name:>11} {corrupt_prob:>11} {'windowed' if windowed else 'stop-and-wait':>14} {result}"
+                    )
+            emulator.close()
@@ -0,0 +1,52 @@
+# Identical to the button example but with the behaviour of each state defined by event handler
+# functions registered with the @on decorator, rather than a state behaviour function containing
+# 'if event == ...' statements.  Handlers are looked up directly from the state and event, so
+# events which have no handler in the current state are skipped without calling any task code.
+# States are referred to by handle, e.g. S.LED_on, which can be used wherever the state name can,
+# imported from pyControl.handles.
+
+from pyControl.utility import *
+from pyControl.handles import S
+from devices import *
+
+# Define hardware
+
+button = Digital_input("X17", rising_event="button_press", pull="up")  # pyboard usr button.
+LED = Digital_output("B4")
+
+# States and events.
+
+states = [
+    "LED_on",
+    "LED_off",
+]
+
+events = ["button_press"]
+
+initial_state = "LED_off"
+
+# Variables
+
+v.press_n = 0
+
+# Event handler functions.
+
+
+@on("LED_off", "button_press")
+def count_press():
+    v.press_n = v.press_n + 1
+    print("Press number {}".format(v.press_n))
+    if v.press_n == 3:
+        goto_state(S.LED_on)
+
+
+@on("LED_on", "entry")
+def LED_on_entry():
+    LED.on()
+    timed_goto_state(S.LED_off, 1 * second)
+    v.press_n = 0
+
+
+@on("LED_on", "exit")
+def LED_on_exit():
+    LED.off()
@@ -1,5 +1,9 @@
 import os
 import numpy as np
+from data_import import save_sample_times
+
+NPY_HEADER_LEN = 128  # Bytes, length of .npy header at the start of analog data temp files.
+CHUNK_INDEX_HEADER_LEN = 8  # Bytes, length of sampling rate (float64) at the start of chunk index temp files.
 
 
 def find_files_with_extension(folder_path, extension):
@@ -13,25 +17,62 @@ def find_files_with_extension(folder_path, extension):
     return file_paths
 
 
+def load_chunk_index(file_path):
+    """Load a chunk index temp file, return (sampling_rate, chunk_index) where chunk_index is an
+    array with a row (sample_offset, start_ms, n_samples) for each chunk, ignoring any partially
+    written row."""
+    with open(file_path, "rb") as f:
+        sampling_rate = np.frombuffer(f.read(CHUNK_INDEX_HEADER_LEN), dtype="<f8").item()
+        index_bytes = f.read()
+    return sampling_rate, np.frombuffer(index_bytes[: len(index_bytes) // 24 * 24], dtype="<i8").reshape(-1, 3)
+
+
 def tempfile2npy(file_path):
-    """Convert a single temp file to a .npy file."""
+    """Convert a single temp file to a .npy file, or .timebase.npz and .time.npy files for chunk index files."""
     file_type = file_path.split(".")[-2]
     path_stem = file_path.rsplit(".", 2)[0]
-    with open(file_path, "rb") as f:
-        if file_type == "time":  # Timestamp file
+    if file_type == "time":  # Timestamp file written by versions without a chunk index.
+        with open(file_path, "rb") as f:
             times = np.frombuffer(f.read(), dtype="float64")
-            np.save(path_stem + ".time.npy", times)
-        else:  # Data samples file.
-            data_type = file_type[-1]
+        np.save(path_stem + ".time.npy", times)
+    elif file_type == "chunks":  # Chunk index file.
+        sampling_rate, chunk_index = load_chunk_index(file_path)
+        n_samples = int(chunk_index[:, 2].sum())
+        np.savez(
+            path_stem + ".timebase.npz",
+            chunk_index=chunk_index[:, :2],
+            sampling_rate=sampling_rate,
+            n_samples=n_samples,
+        )
+        save_sample_times(path_stem + ".time.npy", chunk_index[:, :2], sampling_rate, n_samples)
+    else:  # Data samples file.
+        data_type = file_type[-1]
+        with open(file_path, "rb") as f:
+            has_header = f.read(6) == b"\x93NUMPY"
+        if has_header:  # Preallocated file starting with .npy header, set number of samples in header and trim.
+            chunk_path = path_stem + ".chunks.temp"
+            if os.path.exists(chunk_path):  # Only samples in chunk index were written.
+                n_samples = int(load_chunk_index(chunk_path)[1][:, 2].sum())
+            else:
+                n_samples = (os.path.getsize(file_path) - NPY_HEADER_LEN) // np.dtype(data_type).itemsize
+            with open(file_path, "r+b") as f:
+                header = {"descr": np.dtype(data_type).str, "fortran_order": False, "shape": (n_samples,)}
+                np.lib.format.write_array_header_1_0(f, header)  # Padded to NPY_HEADER_LEN for a 1D array.
+                assert f.tell() == NPY_HEADER_LEN, "Unexpected .npy header length."
+                f.truncate(NPY_HEADER_LEN + n_samples * np.dtype(data_type).itemsize)
+            os.replace(file_path, path_stem + ".data.npy")
+            return
+        with open(file_path, "rb") as f:  # File written by versions without .npy header.
             data = np.frombuffer(f.read(), dtype=data_type)
-            np.save(path_stem + ".data.npy", data)
+        np.save(path_stem + ".data.npy", data)
     os.remove(file_path)
 
 
 def all_tempfile2numpy(folder_path):
-    """Convert all .temp files in specified folder to .npy"""
+    """Convert all .temp files in specified folder to .npy, chunk index files are converted
+    after the data files whose length they give."""
     file_paths = find_files_with_extension(folder_path, ".temp")
-    for file_path in file_paths:
+    for file_path in sorted(file_paths, key=lambda file_path: file_path.endswith(".chunks.temp")):
         tempfile2npy(file_path)
 
 
@@ -522,3 +522,97 @@ def load_analog_data(file_path):
     a numpy array whose first column is timestamps (ms) and second data values."""
     with open(file_path, "rb") as f:
         return np.fromfile(f, dtype="<i").reshape(-1, 2)
+
+
+class Analog_signal:
+    """Import analog data for one channel saved by pyControl version >=2.0 and represent it as
+    an object with attributes:
+      - data
+          Numpy array of samples, loaded from the .data.npy file whose path is specified.  If
+          mmap is True the file is memory mapped rather than read into memory.
+      - sampling_rate
+          Samples per second.  None for data saved by earlier versions with only a .time.npy file.
+      - chunk_index
+          Numpy array with a row (sample_offset, start_ms) for each chunk of samples sent by the
+          board, loaded from the .timebase.npz file.  None for data saved by earlier versions.
+      - times
+          Numpy array with the time (seconds) of each sample.  Computed from the chunk index when
+          first accessed, or loaded from the .time.npy file saved by earlier versions.
+    """
+
+    def __init__(self, file_path, mmap=False):
+        path_stem = file_path[: -len(".data.npy")]
+        self.data = np.load(file_path, mmap_mode="r" if mmap else None)
+        self._times = None
+        if os.path.exists(path_stem + ".timebase.npz"):
+            self.chunk_index, self.sampling_rate, n_samples = load_timebase(path_stem + ".timebase.npz")
+        else:  # Per sample times saved by earlier versions.
+            self.chunk_index = None
+            self._times = np.load(path_stem + ".time.npy", mmap_mode="r" if mmap else None)
+            self.sampling_rate = None
+
+    @property
+    def times(self):
+        if self._times is None:
+            self._times = timebase_to_times(self.chunk_index, self.sampling_rate, len(self.data))
+        return self._times
+
+
+def load_timebase(file_path):
+    """Load a .timebase.npz file, return (chunk_index, sampling_rate, n_samples)."""
+    with np.load(file_path) as timebase:
+        return timebase["chunk_index"], timebase["sampling_rate"].item(), timebase["n_samples"].item()
+
+
+def chunk_times(chunk_index, sampling_rate, n_samples):
+    """Return (chunk_lengths, chunk_starts), the number of samples and start time (seconds) of
+    each chunk, from a chunk index with a row (sample_offset, start_ms) for each chunk.  Chunks
+    which start within 1ms of the end of the previous chunk are treated as continuous with it,
+    so sample times are not affected by the rounding of chunk timestamps to ms."""
+    chunk_lengths = np.diff(chunk_index[:, 0], append=n_samples)
+    chunk_starts = np.zeros(len(chunk_index))
+    next_chunk_start_time = 0
+    for i, (start_ms, chunk_length) in enumerate(zip(chunk_index[:, 1].tolist(), chunk_lengths.tolist())):
+        if np.abs(next_chunk_start_time - start_ms / 1000) < 0.001:
+            chunk_starts[i] = next_chunk_start_time
+        else:
+            chunk_starts[i] = start_ms / 1000
+        next_chunk_start_time = chunk_starts[i] + chunk_length / sampling_rate
+    return chunk_lengths, chunk_starts
+
+
+def timebase_to_times(chunk_index, sampling_rate, n_samples):
+    """Return the time (seconds) of each of n_samples samples from a chunk index with a row
+    (sample_offset, start_ms) for each chunk."""
+    chunk_lengths, chunk_starts = chunk_times(chunk_index, sampling_rate, n_samples)
+    sample_numbers = np.arange(n_samples, dtype="float64") - np.repeat(chunk_index[:, 0], chunk_lengths)
+    return sample_numbers / sampling_rate + np.repeat(chunk_starts, chunk_lengths)
+
+
+def save_sample_times(file_path, chunk_index, sampling_rate, n_samples):
+    """Save a .npy file with the time (seconds) of each of n_samples samples from a chunk index,
+    as timebase_to_times.  Times are written a chunk at a time to a memory mapped file, so memory
+    use does not grow with n_samples."""
+    times = np.lib.format.open_memmap(file_path, mode="w+", dtype="float64", shape=(n_samples,))
+    chunk_lengths, chunk_starts = chunk_times(chunk_index, sampling_rate, n_samples)
+    for sample_offset, chunk_length, chunk_start in zip(
+        chunk_index[:, 0].tolist(), chunk_lengths.tolist(), chunk_starts.tolist()
+    ):
+        times[sample_offset : sample_offset + chunk_length] = (
+            np.arange(chunk_length, dtype="float64") / sampling_rate + chunk_start
+        )
+    times.flush()
+
+
+def timebase_to_time_npy(file_path):
+    """Convert a .timebase.npz file to a .time.npy file with the time (seconds) of each sample,
+    as saved by earlier versions of pyControl."""
+    save_sample_times(file_path[: -len(".timebase.npz")] + ".time.npy", *load_timebase(file_path))
+
+
+def all_timebase_to_time_npy(folder_path):
+    """Convert all .timebase.npz files in specified folder and sub-folders to .time.npy files."""
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            if file.endswith(".timebase.npz"):
+                timebase_to_time_npy(os.path.join(root, file))